@@ -1,6 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
+import json
+import sys
+
+# Все расчёты — в библиотеке war_economy.py, рядом со скриптом:
+import war_economy
+
 #-------------------------------------------------------------------------
 # Опции:
 
@@ -12,6 +19,9 @@ AGE_END = 100
 # Переменные геометрической прогрессии роста населения:
 # Численность населения в год начала отсчёта:
 POPULATION = 120000000
+# Год, к которому относятся POPULATION и GDP_RATE, если не YEAR_START
+# (тогда при смене YEAR_START население и ВВП пересчитываются по прогрессиям):
+POPULATION_YEAR = None
 # Уровень рождаемости (например: 0.03 значит 3%
 # или 30 новорожденных на 1000 населения в год):
 FERTILITY_RATE = 0.03
@@ -43,6 +53,11 @@ COMPONENT_A = 0.003
 COEFFICIENT_B = 0.000350
 # Коэффициент c:
 COEFFICIENT_C = 1.08
+# Другой закон смертности населения, None — Гомпертц-Мейкхам с параметрами выше.
+# Например: ('weibull', k, lambda), ('siler', a1, b1, a2, a3, b3),
+# ('heligman-pollard', A, B, C, D, E, F, G, H) или ('table', 'qx.csv') —
+# таблица вероятностей смерти qx по возрастам из файла:
+MORTALITY_LAW = None
 
 # Распределение полов.
 MALE_NAME = 'Жеребцы'
@@ -57,6 +72,9 @@ prof_percent = 0.5
 # Профессиональный риск, изменение компонента Мейкхама:
 # (0.01 = 1% риск смерти каждый год)
 prof_hazard = 0.01
+# Другой закон смертности профессии (от возраста призыва), как MORTALITY_LAW,
+# None — Гомпертц-Мейкхам, где компонент Мейкхама заменён на prof_hazard:
+prof_law = None
 # Призывники обоих полов? 0 - нет; 1 - да
 prof_male_switch = 1
 prof_female_switch = 1
@@ -70,6 +88,9 @@ prof_name_apprentice = 'Срочники'
 prof_name_expert = 'Резервисты'
 prof_name_retiree = 'Отставники'
 
+# Вычислять таблицы с помощью NumPy (если модуль установлен)? 0 - нет; 1 - да
+NUMPY_SWITCH = 1
+
 
 #-------------------------------------------------------------------------
 # Список видов войск. Используется базой данных военной техники,
@@ -164,6 +185,8 @@ dict_wpn = {
         # Строка 'wpn_a':0.03 значит 3% вероятность потери в год.
         # wpn_b и wpn_c корректируют вероятность по возрасту оружия,
         # Чем выше эти параметры, тем быстрее растут потери.
+        # Можно задать и другой закон потерь, как MORTALITY_LAW:
+        # 'wpn_law':('weibull', 2, 15),
         'wpn_a':0.03,
         'wpn_b':0.0002,
         'wpn_c':1.4,
@@ -190,6 +213,12 @@ dict_wpn = {
         'wpn_fuel_consumption':25,
         # Годовой расход топлива (на 10 000 км, ресурс ходовой):
         'wpn_fuel_expense':250000,
+        # Вместо пронумерованных строк боеприпасы и топливо можно дать
+        # списком любой длины, без ограничения в 9 видов вооружения:
+        # 'wpn_ammo':[
+        #     {'name':'Патроны 15x120', 'capacity':500, 'expense':10000},
+        #     {'name':'Маховики (МДж)', 'capacity':10000, 'expense':250000},
+        #     ],
         }
 # Данные записываются в общий словарь, как столбец двумерного массива.
 metadict_wpn[dict_wpn_key] = dict_wpn
@@ -2433,461 +2462,143 @@ dict_wpn = {
 metadict_wpn[dict_wpn_key] = dict_wpn
 
 #-------------------------------------------------------------------------
-# Внутренние переменные.
-
-# Создаём рабочие переменные на основе данных из опций (для удобства):
-year_real = YEAR_START
-age_real = AGE_END
-pop = POPULATION
-fert = FERTILITY_RATE
-mort = MORTALITY_RATE
-a = COMPONENT_A
-b = COEFFICIENT_B
-c = COEFFICIENT_C
-
-
-#-------------------------------------------------------------------------
-# Функции, подпрограммы. Последующие вызывают предыдущие.
-
-def population_size(year):
-    """Вычисляем численность популяции.
-
-    Рост популяции, это геометрическая прогрессия, например:
-    100000*1.002^(100-1)=121872
-    Начальная численность, годовой прирост, период в сто лет.
-    Функция вычисляет исходную численность, зная конечную:
-    121872*1.002^(1-100)=100000
-    """
-    population = POPULATION * ((FERTILITY_RATE - MORTALITY_RATE + 1) ** (-year))
-    # Округляем число
-    population = round (population)
-    return population
- 
-def generation_size(year, percent):
-    """Определяем численность поколения.
-
-    Поколение, это процент от популяции, например, если рождаемость 0.02:
-    121872*1.002^(1-100)*0.02=2000 (2% новорожденных в популяции)
-    Точно так же можно определить число умерших, прирост населения, состав:
-    121872*1.002^(1-100)*0.02*0.5=1000 (50% новорожденных мужского пола)
-    """
-    generation = round(population_size(year) * percent)
-    return generation
-
-def GDP_size(year):
-    """ВВП страны в определённый год.
-
-    Рост благосостояния, это та же геометрическая прогрессия:
-    10000*1.03^(1-100)=536
-    В данном случае от 536$ за столетие ВВП вырос до 10 000$
-    """
-    GDP_in_year = GDP_RATE * ((GDP_GROWTH + 1) ** (-year)) * population_size(year)
-    GDP_in_year = round (GDP_in_year)
-    return GDP_in_year
-
-def gompertz_distribution(a, b, c, age):
-    """Распределение Гомпертца. Риск смерти в зависимости от возраста.
-
-    Распределение Гомпертца-Мейкхама неплохо работает в
-    демографических расчётах для самых разных популяций.
-    Единственный недостаток — оно склонно занижать
-    смертность в начале и завышать в конце (экспонента, что поделать).
-    Для популяции людей даёт хорошие результаты в диапазоне — 30-70 лет.
-    Формула: p=a+b*(c^x)
-    Где:
-    p — вероятность смерти в процентах
-    a — независимый от возраста риск (0.002%)
-    b — коэффициент 2 (0.000350)
-    c — коэффициент 3 (1.08)
-    x — возраст в годах
-    Коэффициенты подобраны с учётом исследования:
-    "Parametric models for life insurance mortality data: gompertz's law over time".
-    """
-    chance_of_dying = a + b * (c ** age)
-    # Проверка. Если получилось больше 1, значит 100% смерть.
-    if (chance_of_dying > 1):
-        chance_of_dying = 1
-    return chance_of_dying
-
-
-def generation_alive(generation, a, b, c, age_real):
-    """Число живых в поколении.
-
-    Каждый год умирает некий процент из поколения.
-    Этот цикл вычисляет точное число живых в определённый год.
-    """
-    # Задаём рабочую переменную для цикла:
-    age = 0
-    # Из численности поколения вычитаем число погибших в первый год:
-    generation_survivors = generation - \
-            generation * \
-            gompertz_distribution(a, b , c, age)
-    # Далее это вычитание продолжается циклично.
-    while (age <= age_real):
-        age = age + 1
-        generation_survivors = generation_survivors - \
-                generation_survivors * \
-                gompertz_distribution(a, b, c, age)
-        # Проверка. Если число выживших уходит в минус, значит все мертвы.
-        if (generation_survivors <= 0):
-            generation_survivors = 0
-            break
-    # Округляем число
-    generation_survivors = round(generation_survivors)
-    return generation_survivors
-
-
-def generation_profession(prof_percent, prof_hazard):
-    """Число представителей определённой профессии, с учётом риска."""
-    prof_number = 0
-    if (prof_male_switch != 0):
-        # Берём из словаря численность живых в нужном поколении
-        # и пропускаем через ещё один цикл, чтобы учесть риск профессии.
-        prof_number = prof_number + \
-                generation_alive(dict_population['generation_alive'] * MALE_PERCENT * prof_percent,
-                        # Отчёт начинается с возраста профессии.
-                        prof_hazard, b, c, age_real - prof_age_apprentice)
-    if (prof_female_switch != 0):
-        prof_number = prof_number + \
-                generation_alive(dict_population['generation_alive'] * FEMALE_PERCENT * prof_percent,
-                        prof_hazard, b, c, age_real - prof_age_apprentice)
-    return prof_number
-
-
-
-#-------------------------------------------------------------------------
-# Главный цикл скрипта.
-
-# Эта база данных станет индексом для словарей.
-metadict = {}
-
-# Рабочие переменные:
-progression_year = 0
-year = 0
-
-# Цикл перебирает годы, уходя в прошлое,
-# пока возраст популяции не сравняется с возрастом конца исследования.
-while (progression_year <= AGE_END):
-    # Определяем текущий год (для прогрессии роста населения).
-    year = AGE_END - progression_year
-    year_real = YEAR_START - year
-
-    # Создаём основной словарь (базу данных) для этого возраста:
-    dict_population = {
-            'age_real':age_real,
-            'year_real':year_real,
-            'population_size':population_size(year),
-            'generation_size':generation_size(year, fert),
-            'generation_alive':generation_alive(generation_size(year, fert), a, b, c, age_real),
-            'GDP_size':GDP_size(year)
-            }
-
-    # Определяем численность призывников:
-    prof_number_apprentice = 0
-    if (prof_age_apprentice <= age_real < prof_age_expert):
-        prof_number_apprentice = prof_number_apprentice + \
-                generation_profession(prof_percent, prof_hazard)
-    # Определяем численность резервистов:
-    prof_number_expert = 0
-    if (prof_age_expert <= age_real < prof_age_retiree):
-        prof_number_expert = prof_number_expert + \
-                generation_profession(prof_percent, prof_hazard)
-    # И, наконец, пенсионеры:
-    prof_number_retiree = 0
-    if (prof_age_retiree <= age_real):
-        prof_number_retiree = prof_number_retiree + \
-                generation_profession(prof_percent, prof_hazard)
-
-    # Создаём временный словарь гендеров и профессий:
-    dict_demography = {
-            MALE_NAME:generation_alive(generation_size(year, fert * MALE_PERCENT), a, b, c, age_real),
-            FEMALE_NAME:generation_alive(generation_size(year, fert * FEMALE_PERCENT), a, b, c, age_real),
-            prof_name_apprentice:prof_number_apprentice,
-            prof_name_expert:prof_number_expert,
-            prof_name_retiree:prof_number_retiree,
-            }
- 
-    # Дополняем первый словарь вторым
-    dict_population.update(dict_demography)
-    # Создаём объединённый словарь,
-    # он будет пополняться при каждом проходе цикла:
-    metadict[age_real] = dict_population
-
-    # Завершение главного цикла:
-    progression_year = progression_year + 1
-    age_real = age_real - 1
-
-
-#-------------------------------------------------------------------------
-# Модуль. Вычисляет производство и количество оружия в войсках.
-
-# Произведённое оружие:
-metadict_equipment_create = {}
-# Уцелевшее оружие:
-metadict_equipment_alive = {}
-
-# Исследование объединённого словаря. Создание баз данных оружия.
-# Перебираем вложенные словари начиная с последнего:
-for meta_key in sorted(metadict.keys(), reverse=True):
-    # Временный словарь вооружений (за один год):
-    dict_equipment_create = {}
-    dict_equipment_alive = {}
-    # Перебираем опции из базы данных вооружений:
-    for wpn_key in sorted(metadict_wpn.keys()):
-        # Количество созданных машин, это бюджет на них, делённый на стоимость.
-        wpn_create = round(metadict[meta_key]['GDP_size'] * GDP_ARMY * \
-                metadict_wpn[wpn_key]['wpn_budget'] / metadict_wpn[wpn_key]['wpn_cost'])
-        wpn_alive = generation_alive(wpn_create,
-                metadict_wpn[wpn_key]['wpn_a'],
-                metadict_wpn[wpn_key]['wpn_b'],
-                metadict_wpn[wpn_key]['wpn_c'],
-                metadict[meta_key]['age_real'])
-        # Создаём временный словарь:
-        dict_equipment_create[metadict_wpn[wpn_key]['wpn_name']] = wpn_create
-        dict_equipment_alive[metadict_wpn[wpn_key]['wpn_name']] = wpn_alive
-    # Объединяем временные словари в базу данных:
-    metadict_equipment_create[meta_key] = dict_equipment_create
-    metadict_equipment_alive[meta_key] = dict_equipment_alive
-
-# Далее, вычисляем общее число вооружений на складах:
-dict_equipment_all = {}
-for wpn_key in sorted(metadict_wpn.keys()):
-    equipment_all = 0
-    for meta_key in sorted(metadict_equipment_alive.keys()):
-        equipment_all = equipment_all + metadict_equipment_alive[meta_key][metadict_wpn[wpn_key]['wpn_name']]
-    dict_equipment_all[metadict_wpn[wpn_key]['wpn_name']] = equipment_all
-
-
-#-------------------------------------------------------------------------
-# Вывод результатов.
-
-# Вывод по годам:
-for meta_key in sorted(metadict.keys(), reverse=True):
-    # Вывод данных о населении:
-    print('Год:', metadict[meta_key]['year_real'],
-            'Возраст:', metadict[meta_key]['age_real'],
-            'Родившиеся:', metadict[meta_key]['generation_size'],
-            'Живые:', metadict[meta_key]['generation_alive'])
-    print(MALE_NAME, metadict[meta_key][MALE_NAME],
-            FEMALE_NAME, metadict[meta_key][FEMALE_NAME])
-    # Вывод данных о солдатах:
-    if (prof_age_apprentice <= metadict[meta_key]['age_real'] < prof_age_expert):
-        print(prof_name_apprentice, metadict[meta_key][prof_name_apprentice])
-    if (prof_age_expert <= metadict[meta_key]['age_real'] < prof_age_retiree):
-        print(prof_name_expert, metadict[meta_key][prof_name_expert])
-    if (prof_age_retiree <= metadict[meta_key]['age_real']):
-        print(prof_name_retiree, metadict[meta_key][prof_name_retiree])
-    # Вывод данных о вооружении:
-    for wpn_key in sorted(metadict_wpn.keys()):
-        # Отмена вывода, если число машинок по нулям.
-        if (metadict_equipment_alive[meta_key][metadict_wpn[wpn_key]['wpn_name']] != 0):
-            if (metadict[meta_key]['age_real'] < metadict_wpn[wpn_key]['wpn_age_mid']):
-                print(metadict_wpn[wpn_key]['wpn_name_new'],
-                        ' (Создано: ',
-                        # Обращение аж к двум словарям, одно вложено в другое.
-                        metadict_equipment_create[meta_key][metadict_wpn[wpn_key]['wpn_name']], ')',
-                        ' Уцелело: ',
-                        metadict_equipment_alive[meta_key][metadict_wpn[wpn_key]['wpn_name']], sep='')
-            if (metadict_wpn[wpn_key]['wpn_age_mid'] <= metadict[meta_key]['age_real'] <
-                    metadict_wpn[wpn_key]['wpn_age_old']):
-                print(metadict_wpn[wpn_key]['wpn_name_mid'],
-                        ' (Создано: ',
-                        metadict_equipment_create[meta_key][metadict_wpn[wpn_key]['wpn_name']], ')',
-                        ' Уцелело: ',
-                        metadict_equipment_alive[meta_key][metadict_wpn[wpn_key]['wpn_name']], sep='')
-            if (metadict_wpn[wpn_key]['wpn_age_old'] <= metadict[meta_key]['age_real']):
-                print(metadict_wpn[wpn_key]['wpn_name_old'],
-                        ' (Создано: ',
-                        metadict_equipment_create[meta_key][metadict_wpn[wpn_key]['wpn_name']], ')',
-                        ' Уцелело: ',
-                        metadict_equipment_alive[meta_key][metadict_wpn[wpn_key]['wpn_name']], sep='')
-    print('------------------------------------------------------------')
-
-# Подведение итогов:
-print('Ожидаемая численность:', POPULATION)
-population_alive = 0
-army_soldiers= 0
-army_reservists = 0
-for meta_key in sorted(metadict.keys()):
-    population_alive = population_alive + metadict[meta_key]['generation_alive']
-    army_soldiers = army_soldiers + metadict[meta_key][prof_name_apprentice]
-    army_reservists = army_reservists + metadict[meta_key][prof_name_expert]
-print('Численность популяции:', population_alive)
-print(prof_name_apprentice, 'и', prof_name_expert, 'по видам войск:')
-for troop_key in sorted(dict_troops_types.keys()):
-    print('    ', troop_key, ' (', round(dict_troops_types[troop_key] * 100), '%) ',
-            round(army_soldiers * dict_troops_types[troop_key]),
-            ' — ', round((army_soldiers + army_reservists) * dict_troops_types[troop_key]), sep='')
-print('Несчастные случаи (в год):', round(POPULATION * COMPONENT_A))
-print('Военные потери: ', round(army_soldiers * prof_hazard),
-        ' (', round(army_soldiers * prof_hazard / (POPULATION * COMPONENT_A) * 100),
-        '% от несчастных случаев)', sep='')
-print('------------------------------------------------------------')
-
-
-#-------------------------------------------------------------------------
-# И наконец, суммируем всё вооружение, вычисляем отношение единиц оружия к числу солдат,
-# потребность армии в боеприпасаха, а также суммарный бюджет на вооружения и бюджеты по видам войск:
-
-budget_percent = 0
-budget_troops_percent = 0
-# База данных потребностей в боеприпасах:
-ammunition_needs = {}
-# Названия боеприпасов превращаем в ключи базы данных:
-for wpn_key in sorted(metadict_wpn.keys()):
-    if metadict_wpn[wpn_key].get('wpn_ammo_1_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_1_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_ammo_2_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_2_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_ammo_3_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_3_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_ammo_4_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_4_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_ammo_5_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_5_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_ammo_6_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_6_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_ammo_7_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_7_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_ammo_8_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_8_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_ammo_9_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_9_name']] = 0
-    if metadict_wpn[wpn_key].get('wpn_fuel_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_fuel_name']] = 0
-# База данных бюджета по видам войск:
-# Создаётся рабочий словарь, обнуляются значения:
-budget_troops_types = {}
-budget_troops_types.update(dict_troops_types)
-for troop_key in budget_troops_types:
-    budget_troops_types[troop_key] = 0
-# База данных стоимости обслуживания по видам войск:
-# Создаётся рабочий словарь, обнуляются значения:
-maintenance_troops_types = {}
-maintenance_troops_types.update(dict_troops_types)
-for troop_key in budget_troops_types:
-    maintenance_troops_types[troop_key] = 0
-
-# Перебор столбцов в базе данных оружия:
-for wpn_key in sorted(metadict_wpn.keys()):
-    equipment_all = 0
-    # Затем перебор по годам:
-    for meta_key in sorted(metadict_equipment_alive.keys()):
-        equipment_all = equipment_all + metadict_equipment_alive[meta_key][metadict_wpn[wpn_key]['wpn_name']]
-    # Если есть проект, значит есть оружие, хотя бы один экземпляр:
-    if (equipment_all < 1):
-        equipment_all = 1
-        print('Не хватает бюджета на',metadict_wpn[wpn_key]['wpn_name'])
-    # Вывод суммы оружия, сохранившегося за все годы:
-    print(metadict_wpn[wpn_key]['wpn_troops_type'], metadict_wpn[wpn_key]['wpn_name'], '—' , equipment_all, end=' ')
-    # Вывод отношения числа вооружений к числу солдат определённых видов войск:
-    army_type_percent = dict_troops_types[metadict_wpn[wpn_key]['wpn_troops_type']]
-    print('на', round(army_soldiers * army_type_percent / equipment_all),
-            prof_name_apprentice, metadict_wpn[wpn_key]['wpn_troops_type'],
-            'или на', round((army_reservists + army_soldiers) * army_type_percent / equipment_all),
-            prof_name_apprentice, '+',
-            prof_name_expert, metadict_wpn[wpn_key]['wpn_troops_type'])
-    # Вывод описания вооружения:
-    print('    ', metadict_wpn[wpn_key]['wpn_name_comment'])
-    # Подсчитываем, сколько оружия создано за год:
-    wpn_create = round(GDP_size(0) * GDP_ARMY * \
-                metadict_wpn[wpn_key]['wpn_budget'] / metadict_wpn[wpn_key]['wpn_cost'])
-    # Расходы на проект:
-    print('        Расходы: ',
-            round(metadict_wpn[wpn_key]['wpn_budget'] * 100, 3),'% бюджета ',
-            '(', metadict_wpn[wpn_key]['wpn_cost'] * wpn_create / (10 ** 9),
-            ' млрд ', metadict_wpn[wpn_key]['wpn_cost_currency'], ') ', sep='')
-    # Подсчитываем потери (без учёта старения оружия):
-    print('        Создано:', wpn_create)
-    print('        Потери:', round(wpn_create * metadict_wpn[wpn_key]['wpn_a'] + \
-            equipment_all * metadict_wpn[wpn_key]['wpn_a']))
-    print('        ---')
-    # Считаем потребность в боеприпасах (максимум 9 видов оружия) и топливо:
-    if metadict_wpn[wpn_key].get('wpn_ammo_1_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_1_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_1_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_1_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_ammo_2_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_2_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_2_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_2_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_ammo_3_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_3_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_3_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_3_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_ammo_4_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_4_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_4_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_4_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_ammo_5_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_5_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_5_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_5_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_ammo_6_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_6_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_6_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_6_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_ammo_7_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_7_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_7_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_7_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_ammo_8_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_8_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_8_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_8_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_ammo_9_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_9_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_ammo_9_name']] + \
-                metadict_wpn[wpn_key]['wpn_ammo_9_expense'] * equipment_all
-    if metadict_wpn[wpn_key].get('wpn_fuel_name'):
-        ammunition_needs[metadict_wpn[wpn_key]['wpn_fuel_name']] = \
-                ammunition_needs[metadict_wpn[wpn_key]['wpn_fuel_name']] + \
-                metadict_wpn[wpn_key]['wpn_fuel_expense'] * equipment_all
-    # Считаем общий бюджет и бюджет по родам войск:
-    budget_percent = budget_percent + metadict_wpn[wpn_key]['wpn_budget']
-    for troop_key in budget_troops_types:
-        if troop_key == metadict_wpn[wpn_key]['wpn_troops_type']:
-            budget_troops_types[troop_key] = budget_troops_types[troop_key] + \
-                    metadict_wpn[wpn_key]['wpn_budget'] * 100
-    # Считаем расходы на обслуживание данного вида оружия:
-    # Стоимость оружия * процент обслуживания * штук на складах
-    # Если строка 'wpn_maintenance' не указана, тогда обслуживание бесплатно
-    wpn_maintenance_all = metadict_wpn[wpn_key]['wpn_cost'] * \
-            metadict_wpn.get(wpn_key, 0).get('wpn_maintenance', 0)  * \
-            dict_equipment_all.get(metadict_wpn[wpn_key]['wpn_name'])
-    # Теперь распределяем расходы на обслуживание по родам войск:
-    for troop_key in maintenance_troops_types:
-        if troop_key == metadict_wpn[wpn_key]['wpn_troops_type']:
-            maintenance_troops_types[troop_key] = maintenance_troops_types[troop_key] + \
-                    wpn_maintenance_all
-
-# Сумма бюджета всех проектов из базы данных оружия:
-print('Расходы военного бюджета на закупки и производство:')
-for troop_key in sorted(budget_troops_types.keys()):
-    print('    ', troop_key, ' (', round(dict_troops_types[troop_key] * 100), '%)',
-            ' — ', round(budget_troops_types[troop_key], 2), '%', sep='')
-print('Использовано ', round(budget_percent * 100, 2), '% бюджета армии',
-        ' (или ', round(GDP_ARMY * budget_percent * 100, 2), '% ВВП страны)',
-        sep='')
-print('        ---')
-
-# Расходы на обслуживание оружия по видам войск:
-maintenance_percent_sum = 0
-print('Расходы военного бюджета на техническое обслуживание:')
-for troop_key in sorted(maintenance_troops_types.keys()):
-    maintenance_percent = maintenance_troops_types[troop_key] / (GDP_size(0) * GDP_ARMY)
-    maintenance_percent_sum = maintenance_percent_sum + maintenance_percent
-    print('    ', troop_key, ' (', round(dict_troops_types[troop_key] * 100), '%)',
-            ' — ', round(maintenance_percent * 100, 2), '%', sep='')
-print('Использовано ', round(maintenance_percent_sum * 100, 2), '% бюджета армии',
-        ' (или ', round(maintenance_percent_sum * GDP_ARMY * 100, 2), '% ВВП страны)',
-        sep='')
-print('        ---')
-
-# Соотношение производства боеприпасов и потребности в них:
-print('Боеприпасы на складах (на год войны):')
-for ammo_key in sorted(ammunition_needs.keys()):
-    # (ammo_key, 0) — значит, если нет ключа, брать ноль.
-    print('   ', ammo_key, ' — ', dict_equipment_all.get(ammo_key, 0), ' (',
-            round(dict_equipment_all.get(ammo_key, ammunition_needs[ammo_key]) / \
-                    ammunition_needs[ammo_key] * 100), '%)', sep='')
+# Запуск скрипта.
+
+def script_scenario():
+    """Сценарий из опций, видов войск и базы данных оружия этого скрипта."""
+    return war_economy.script_scenario(globals())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Демография, армия и военная экономика государства.')
+    parser.add_argument('--sweep', metavar='FILE',
+            help='JSON-файл сценариев: список словарей с опциями или сетка значений')
+    parser.add_argument('--linear', action='store_true',
+            help='для --sweep: считать по линейному отклику (только GDP_ARMY, GDP_RATE, POPULATION и wpn_*)')
+    parser.add_argument('--workers', type=int, default=None,
+            help='число процессов для сценариев (по умолчанию — все ядра)')
+    parser.add_argument('--wpn-database', metavar='FILE',
+            help='двоичная база данных оружия вместо блоков dict_wpn (смотри war-economy-import.py)')
+    parser.add_argument('--output', metavar='FILE',
+            help='записать отчёт в файл, а не на экран')
+    parser.add_argument('--summary-only', action='store_true',
+            help='только итоги, без вывода по годам')
+    parser.add_argument('--tables', metavar='DIR',
+            help='записать разделы отчёта таблицами в каталог, по файлу на раздел')
+    parser.add_argument('--format', choices=sorted(war_economy.REPORT_FORMATS), default='csv',
+            help='формат таблиц: csv, jsonl или columns (двоичный файл столбцов)')
+    parser.add_argument('--start-years', metavar='FROM:TO',
+            help='итоги для каждого YEAR_START от FROM до TO включительно, например 1950:2020')
+    parser.add_argument('--forecast', metavar='YEARS', type=int,
+            help='прогноз на YEARS лет вперёд от YEAR_START, таблицей по годам')
+    parser.add_argument('--sensitivity', metavar='METRIC', nargs='?', const='',
+            help='чувствительность итогов к параметрам оружия и GDP_ARMY (можно указать итог)')
+    parser.add_argument('--solve-budgets', action='store_true',
+            help='подобрать wpn_budget боеприпасов под нужную обеспеченность (и оружия под --target)')
+    parser.add_argument('--coverage', metavar='PERCENT', type=float, default=100,
+            help='нужная обеспеченность боеприпасами для --solve-budgets и --optimize, в процентах')
+    parser.add_argument('--target', metavar='NAME=N', action='append', default=[],
+            help='нужные запасы оружия для --solve-budgets, например --target "Бронетранспортёры=100000"')
+    parser.add_argument('--optimize', metavar='OBJECTIVE', nargs='?', const='capability',
+            choices=['capability', 'ratio'],
+            help='перераспределить wpn_budget: capability (по умолчанию) или ratio (под --ratio)')
+    parser.add_argument('--ratio', metavar='NAME=N', action='append', default=[],
+            help='солдат на единицу оружия для --optimize ratio, например --ratio "Бронетранспортёры=10"')
+    parser.add_argument('--calibrate', metavar='TARGET=N', action='append', default=[],
+            help='подобрать опции демографии под итоги: population_alive, life_expectancy, '
+                'army_soldiers или долю возрастов, например --calibrate population_alive=120000000 '
+                '--calibrate 0-14=0.25')
+    parser.add_argument('--vary', metavar='OPTION', action='append',
+            choices=war_economy.CALIBRATION_PARAMETERS,
+            help='опция для --calibrate (можно несколько раз), по умолчанию все: '
+                + ', '.join(war_economy.CALIBRATION_PARAMETERS))
+    parser.add_argument('--monte-carlo', metavar='N', type=int,
+            help='N повторов со случайными потерями, процентили итогов (нужен NumPy)')
+    parser.add_argument('--seed', type=int, default=None,
+            help='зерно случайных чисел для --monte-carlo')
+    parser.add_argument('--cache', metavar='DIR', nargs='?', const=war_economy.CACHE_DIR,
+            help='кэш результатов на диске (по умолчанию ' + war_economy.CACHE_DIR + ')')
+    parser.add_argument('--profile', metavar='FILE', nargs='?', const='',
+            help='время и вызовы по этапам и функциям: таблицей в stderr или JSON в FILE')
+    args = parser.parse_args()
+
+    if args.profile is None:
+        run(args)
+        return
+    with war_economy.Profiler() as profiler:
+        run(args)
+    if args.profile:
+        with open(args.profile, 'w', encoding='utf-8') as profile_file:
+            json.dump(profiler.profile(), profile_file, ensure_ascii=False, indent=1)
+    else:
+        war_economy.print_profile(profiler.profile(), sys.stderr)
+
+
+def run(args):
+    """Расчёт и вывод по аргументам командной строки."""
+    scenario = script_scenario()
+    if args.wpn_database:
+        scenario = scenario.replace(metadict_wpn=war_economy.WeaponDatabase(args.wpn_database))
+    cache = war_economy.ResultCache(args.cache) if args.cache else None
+    if args.sweep:
+        with open(args.sweep, encoding='utf-8') as sweep_file:
+            scenarios = war_economy.sweep_scenarios(json.load(sweep_file))
+        if args.linear:
+            war_economy.print_sweep(scenarios, war_economy.linear_sweep(scenario, scenarios))
+            return
+        war_economy.print_sweep(scenarios,
+                war_economy.sweep(scenario, scenarios, args.workers, cache))
+        return
+    if args.sensitivity is not None:
+        war_economy.print_sensitivity(scenario.sensitivity(), args.sensitivity)
+        return
+    if args.solve_budgets:
+        targets = {}
+        for target in args.target:
+            wpn_name, _, number = target.rpartition('=')
+            targets[wpn_name] = float(number)
+        war_economy.print_budget_solution(scenario,
+                scenario.solve_budgets(targets, args.coverage / 100))
+        return
+    if args.optimize:
+        ratios = {}
+        for ratio in args.ratio:
+            wpn_name, _, number = ratio.rpartition('=')
+            ratios[wpn_name] = float(number)
+        war_economy.print_optimization(scenario, scenario.optimize_budgets(args.optimize,
+            ratios=ratios, coverage=args.coverage / 100))
+        return
+    if args.calibrate:
+        targets = {}
+        for target in args.calibrate:
+            name, _, number = target.rpartition('=')
+            targets[name] = float(number)
+        war_economy.print_calibration(scenario, scenario.calibrate(targets, args.vary))
+        return
+    if args.monte_carlo:
+        war_economy.print_monte_carlo(war_economy.monte_carlo(scenario, args.monte_carlo,
+            args.seed, args.workers))
+        return
+    if args.start_years:
+        year_from, _, year_to = args.start_years.partition(':')
+        years = range(int(year_from), int(year_to or year_from) + 1)
+        war_economy.print_sweep([{'YEAR_START':year} for year in years], scenario.start_years(years))
+        return
+    if args.forecast is not None:
+        war_economy.print_forecast(scenario.forecast(args.forecast))
+        return
+    results = scenario.compute(cache)
+    if args.tables:
+        war_economy.write_report_tables(scenario, args.tables, args.format, results)
+        return
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            war_economy.print_report(scenario, results, output_file, args.summary_only)
+    else:
+        war_economy.print_report(scenario, results, summary_only=args.summary_only)
+
+
+if __name__ == '__main__':
+    main()
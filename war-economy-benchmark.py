@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Замеры скорости расчёта, по этапам и в разных масштабах.
+
+Каждый этап расчёта (поколения и профессии, матрицы оружия, словари
+оружия и склады, армия, экономика, отчёт) замеряется отдельно
+для всех сочетаний AGE_END и базы данных оружия: Эквестрия
+(war-economy-analyser.py), Арулько (old-versions/) и синтетические
+базы (war_economy.synthetic_scenario). Старые версии скрипта из old-versions/
+прогоняются целиком, для сравнения. Результаты пишутся в JSON:
+
+    python war-economy-benchmark.py --output benchmark.json
+    python war-economy-benchmark.py --age-end 100 --catalog equestria --compare benchmark.json
+
+Слишком большие сочетания (больше BENCHMARK_CELLS клеток матрицы
+возраст × оружие) пропускаются, если не указано --all.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import runpy
+import statistics
+import sys
+import time
+
+import war_economy
+
+#-------------------------------------------------------------------------
+# Опции:
+
+# Каталог скрипта, базы данных ищутся рядом с ним:
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+# Базы данных оружия: название — скрипт с блоками dict_wpn
+# или размер синтетической базы:
+BENCHMARK_CATALOGS = {
+        'equestria':'war-economy-analyser.py',
+        'arulco':os.path.join('old-versions', 'military_economic_analiser-v2.05-Arulco.py'),
+        'synthetic-10000':10000,
+        }
+BENCHMARK_AGE_END = [100, 500, 2000]
+# Повторов каждого замера, берутся минимум и медиана:
+BENCHMARK_REPEAT = 3
+# Зерно синтетических баз, чтобы замеры были сравнимы:
+BENCHMARK_SEED = 1
+# Предел клеток матрицы (возраст × оружие), больше — пропускаем:
+BENCHMARK_CELLS = 5000000
+# Этапы расчёта по порядку:
+BENCHMARK_STAGES = [
+        'cohorts',
+        'equipment_matrices',
+        'equipment_tables',
+        'army',
+        'economy',
+        'report',
+        ]
+
+#-------------------------------------------------------------------------
+# Сценарии:
+
+def catalog_scenario(catalog):
+    """Сценарий базы данных оружия catalog из BENCHMARK_CATALOGS."""
+    source = BENCHMARK_CATALOGS[catalog]
+    if isinstance(source, int):
+        return war_economy.synthetic_scenario(source, BENCHMARK_SEED)
+    return war_economy.load_script(os.path.join(BENCHMARK_DIR, source))
+
+#-------------------------------------------------------------------------
+# Замеры:
+
+def timings(seconds):
+    """Минимум и медиана времени повторов."""
+    return {
+            'min':min(seconds),
+            'median':statistics.median(seconds),
+            'repeat':len(seconds),
+            }
+
+
+def benchmark_stages(scenario, repeat=BENCHMARK_REPEAT):
+    """Время каждого этапа расчёта сценария, в секундах.
+
+    Перед каждым повтором очищаются кэши таблиц выживаемости,
+    поэтому замер включает их вычисление.
+    """
+    stage_seconds = dict((stage, []) for stage in BENCHMARK_STAGES)
+    stage_seconds['total'] = []
+    wpn_columns = sorted(scenario.metadict_wpn.keys())
+    for number in range(repeat):
+        war_economy.clear_caches()
+        time_start = time.perf_counter()
+        metadict, metadict_columns = scenario.cohort_table()
+        time_cohorts = time.perf_counter()
+        equipment_create, equipment_alive = scenario.equipment_matrices(wpn_columns, metadict, metadict_columns)
+        time_matrices = time.perf_counter()
+        equipment = scenario.equipment_from_matrices(wpn_columns, metadict, equipment_create, equipment_alive)
+        time_tables = time.perf_counter()
+        population_alive, army_soldiers, army_reservists = scenario.army_summary(metadict)
+        time_army = time.perf_counter()
+        economy = scenario.economy_summary(equipment['dict_equipment_all'])
+        time_economy = time.perf_counter()
+        results = {
+                'metadict':metadict,
+                'metadict_columns':metadict_columns,
+                'equipment':equipment,
+                'population_alive':population_alive,
+                'army_soldiers':army_soldiers,
+                'army_reservists':army_reservists,
+                'economy':economy,
+                }
+        war_economy.print_report(scenario, results, io.StringIO())
+        time_report = time.perf_counter()
+        time_marks = [time_start, time_cohorts, time_matrices, time_tables,
+                time_army, time_economy, time_report]
+        for stage, time_begin, time_end in zip(BENCHMARK_STAGES, time_marks, time_marks[1:]):
+            stage_seconds[stage].append(time_end - time_begin)
+        stage_seconds['total'].append(time_report - time_start)
+    return dict((stage, timings(seconds)) for stage, seconds in stage_seconds.items())
+
+
+def benchmark_script(path, repeat=BENCHMARK_REPEAT):
+    """Время прогона скрипта целиком (вывод подавляется)."""
+    seconds = []
+    error = None
+    argv = sys.argv
+    # Скрипт запускается как главный, без аргументов замеров:
+    sys.argv = [path]
+    try:
+        for number in range(repeat):
+            time_start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    runpy.run_path(path, run_name='__main__')
+            except (Exception, SystemExit) as exc:
+                error = repr(exc)
+                break
+            seconds.append(time.perf_counter() - time_start)
+    finally:
+        sys.argv = argv
+    result = {'script':os.path.relpath(path, BENCHMARK_DIR)}
+    if seconds:
+        result.update(timings(seconds))
+    if error:
+        result['error'] = error
+    return result
+
+
+def run_benchmark(catalogs, age_ends, backends, repeat=BENCHMARK_REPEAT,
+        cells_max=BENCHMARK_CELLS, baselines=True):
+    """Все замеры, словарь для записи в JSON."""
+    results = []
+    for catalog in catalogs:
+        scenario_catalog = catalog_scenario(catalog)
+        for age_end in age_ends:
+            for numpy_switch in backends:
+                scenario = scenario_catalog.replace(AGE_END=age_end, NUMPY_SWITCH=numpy_switch)
+                result = {
+                        'catalog':catalog,
+                        'items':len(scenario.metadict_wpn),
+                        'age_end':age_end,
+                        'backend':'numpy' if scenario.numpy_backend() else 'python',
+                        }
+                if (cells_max and len(scenario.metadict_wpn) * (age_end + 1) > cells_max):
+                    result['skipped'] = 'больше ' + str(cells_max) + ' клеток'
+                else:
+                    result['stages'] = benchmark_stages(scenario, repeat)
+                results.append(result)
+                print_result(result, sys.stderr)
+    scripts = []
+    if baselines:
+        old_versions = os.path.join(BENCHMARK_DIR, 'old-versions')
+        paths = [os.path.join(old_versions, name) for name in sorted(os.listdir(old_versions))
+                if name.endswith('.py')]
+        paths.append(os.path.join(BENCHMARK_DIR, 'war-economy-analyser.py'))
+        for path in paths:
+            scripts.append(benchmark_script(path, repeat))
+            print_script(scripts[-1], sys.stderr)
+    benchmark = {
+            'date':datetime.datetime.now().isoformat(),
+            'python':sys.version.split()[0],
+            'numpy':war_economy.numpy.__version__ if war_economy.numpy is not None else None,
+            'platform':platform.platform(),
+            'results':results,
+            'scripts':scripts,
+            }
+    return benchmark
+
+#-------------------------------------------------------------------------
+# Вывод:
+
+def print_result(result, stream=sys.stdout, previous=None):
+    """Строка замера: сценарий и медианы этапов (с прошлым замером — отношение)."""
+    line = [result['catalog'], str(result['items']), 'AGE_END=' + str(result['age_end']), result['backend']]
+    if 'skipped' in result:
+        line.append('пропущено: ' + result['skipped'])
+    else:
+        for stage in BENCHMARK_STAGES + ['total']:
+            median = result['stages'][stage]['median']
+            value = stage + '=' + str(round(median, 4))
+            if previous and 'stages' in previous:
+                median_old = previous['stages'][stage]['median']
+                value = value + ' (x' + str(round(median / median_old, 2) if median_old else '-') + ')'
+            line.append(value)
+    print('\t'.join(line), file=stream)
+
+
+def print_script(result, stream=sys.stdout, previous=None):
+    """Строка замера скрипта целиком."""
+    line = [result['script']]
+    if 'median' in result:
+        value = str(round(result['median'], 4))
+        if previous and previous.get('median'):
+            value = value + ' (x' + str(round(result['median'] / previous['median'], 2)) + ')'
+        line.append(value)
+    if 'error' in result:
+        line.append('ошибка: ' + result['error'])
+    print('\t'.join(line), file=stream)
+
+
+def print_benchmark(benchmark, previous=None, stream=sys.stdout):
+    """Все замеры; previous — прошлые замеры для сравнения (из JSON)."""
+    previous_results = {}
+    previous_scripts = {}
+    if previous:
+        for result in previous['results']:
+            previous_results[(result['catalog'], result['age_end'], result['backend'])] = result
+        for result in previous['scripts']:
+            previous_scripts[result['script']] = result
+    for result in benchmark['results']:
+        print_result(result, stream,
+                previous_results.get((result['catalog'], result['age_end'], result['backend'])))
+    for result in benchmark['scripts']:
+        print_script(result, stream, previous_scripts.get(result['script']))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Замеры скорости расчёта по этапам и в разных масштабах.')
+    parser.add_argument('--output', metavar='FILE',
+            help='записать замеры в JSON-файл')
+    parser.add_argument('--compare', metavar='FILE',
+            help='прошлые замеры (JSON) для сравнения, в скобках — во сколько раз дольше')
+    parser.add_argument('--catalog', action='append', choices=sorted(BENCHMARK_CATALOGS),
+            help='база данных оружия (можно несколько раз), по умолчанию все')
+    parser.add_argument('--age-end', metavar='N', type=int, action='append',
+            help='AGE_END (можно несколько раз), по умолчанию ' + \
+                    ', '.join(str(age_end) for age_end in BENCHMARK_AGE_END))
+    parser.add_argument('--backend', choices=['numpy', 'python', 'both'], default='both',
+            help='NumPy, чистый Python или оба (по умолчанию)')
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT,
+            help='повторов каждого замера')
+    parser.add_argument('--all', action='store_true',
+            help='не пропускать большие сочетания')
+    parser.add_argument('--no-scripts', action='store_true',
+            help='не прогонять скрипты из old-versions/')
+    args = parser.parse_args()
+
+    backends = {'numpy':[1], 'python':[0], 'both':[1, 0]}[args.backend]
+    if war_economy.numpy is None:
+        backends = [0]
+    benchmark = run_benchmark(args.catalog or sorted(BENCHMARK_CATALOGS),
+            args.age_end or BENCHMARK_AGE_END, backends, args.repeat,
+            None if args.all else BENCHMARK_CELLS, not args.no_scripts)
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as compare_file:
+            previous = json.load(compare_file)
+    print_benchmark(benchmark, previous)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(benchmark, output_file, ensure_ascii=False, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Проверка, что быстрые движки считают так же, как эталонный цикл.
+
+Эталон — главный цикл первой версии скрипта: число живых в каждом
+поколении, в профессиях и в выпуске оружия вычитается год за годом
+(reference_generation_alive), без таблиц выживаемости, без отсечки
+вымерших возрастов и без NumPy, с округлениями как в population_size(),
+generation_size() и при выпуске оружия. Движки-кандидаты (библиотека
+без NumPy, NumPy, пересчёт по изменениям) прогоняются на тех же
+сценариях: сценарий
+скрипта (его отчёт — example.txt), он же с другими законами
+смертности (EQUIVALENCE_LAWS), сценарии из old-versions/
+и случайные синтетические. Сравнивается каждая клетка каждой
+таблицы: поколения, выпуск и остаток оружия, склады, армия, экономика.
+
+    python war-economy-equivalence.py
+    python war-economy-equivalence.py --engine numpy --random 50 --tolerance 1e-9
+
+Код возврата 1, если хоть одна клетка не совпала.
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+import war_economy
+
+#-------------------------------------------------------------------------
+# Опции:
+
+EQUIVALENCE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Скрипт со сценарием и его отчёт:
+EQUIVALENCE_SCRIPT = 'war-economy-analyser.py'
+EQUIVALENCE_EXAMPLE = 'example.txt'
+# Случайных сценариев, их размеры (оружия) и AGE_END, от и до:
+EQUIVALENCE_RANDOM = 20
+EQUIVALENCE_SIZE = (2, 200)
+EQUIVALENCE_AGE_END = (20, 300)
+# Сколько несовпадений показывать для каждой таблицы:
+EQUIVALENCE_EXAMPLES = 3
+# Законы смертности для сценария скрипта с другими законами:
+# населения, профессии и (по кругу) оружия.
+EQUIVALENCE_LAWS = {
+        'MORTALITY_LAW':('siler', 0.05, 1.0, 0.002, 0.0001, 0.09),
+        'prof_law':('weibull', 1.5, 60),
+        'wpn_law':[
+            ('weibull', 2, 15),
+            ('heligman-pollard', 0.0005, 0.01, 0.1, 0.0005, 10, 20, 0.00005, 1.1),
+            None,
+            ],
+        }
+
+#-------------------------------------------------------------------------
+# Эталон: главный цикл первой версии скрипта.
+
+def reference_hazard(law, age):
+    """Вероятность умереть в возрасте age по закону смертности law.
+
+    Для Гомпертца — gompertz_distribution(), как в первой версии,
+    для прочих законов — ядро из MORTALITY_KERNELS, по одному возрасту.
+    """
+    if (law[0] == 'gompertz'):
+        a, b, c = law[1:]
+        return war_economy.gompertz_distribution(a, b, c, age)
+    kernel = war_economy.MORTALITY_KERNELS[law[0]]
+    chance_of_dying = kernel['hazard'](law[1:], float(age), war_economy.ScalarMath)
+    # Переполнение (NaN) и больше 1 — это 100% смерть.
+    if (chance_of_dying != chance_of_dying or chance_of_dying > 1):
+        chance_of_dying = 1
+    return chance_of_dying
+
+
+def reference_generation_alive(generation, law, age_real):
+    """Число живых в поколении, вычитанием год за годом (как в первой версии)."""
+    # Задаём рабочую переменную для цикла:
+    age = 0
+    # Из численности поколения вычитаем число погибших в первый год:
+    generation_survivors = generation - \
+            generation * \
+            reference_hazard(law, age)
+    # Далее это вычитание продолжается циклично.
+    while (age <= age_real):
+        age = age + 1
+        generation_survivors = generation_survivors - \
+                generation_survivors * \
+                reference_hazard(law, age)
+        # Проверка. Если число выживших уходит в минус, значит все мертвы.
+        if (generation_survivors <= 0):
+            generation_survivors = 0
+            break
+    # Округляем число
+    generation_survivors = round(generation_survivors)
+    return generation_survivors
+
+
+def reference_profession(scenario, dict_population):
+    """Число представителей профессии в поколении, с учётом риска."""
+    law = scenario.profession_law()
+    age_prof = dict_population['age_real'] - scenario.prof_age_apprentice
+    prof_number = 0
+    if (scenario.prof_male_switch != 0):
+        prof_number = prof_number + reference_generation_alive(
+                dict_population['generation_alive'] * scenario.MALE_PERCENT * scenario.prof_percent,
+                law, age_prof)
+    if (scenario.prof_female_switch != 0):
+        prof_number = prof_number + reference_generation_alive(
+                dict_population['generation_alive'] * scenario.FEMALE_PERCENT * scenario.prof_percent,
+                law, age_prof)
+    return prof_number
+
+
+def engine_reference(scenario):
+    """Эталон: главный цикл и цикл оружия первой версии скрипта.
+
+    Таблица поколений и матрицы оружия считаются каждая клетка
+    отдельно, reference_generation_alive(). Армия и экономика —
+    суммы по готовым таблицам, они берутся из библиотеки.
+    """
+    scenario = scenario.replace(NUMPY_SWITCH=0)
+    fert = scenario.FERTILITY_RATE
+    law = scenario.population_law()
+    # Цикл перебирает поколения, от старших к младшим (год — это возраст):
+    metadict = {}
+    for age_real in range(scenario.AGE_END, -1, -1):
+        generation = scenario.generation_size(age_real, fert)
+        dict_population = {
+                'age_real':age_real,
+                'year_real':scenario.YEAR_START - age_real,
+                'population_size':scenario.population_size(age_real),
+                'generation_size':generation,
+                'generation_alive':reference_generation_alive(generation, law, age_real),
+                'GDP_size':scenario.GDP_size(age_real),
+                }
+        prof_number = reference_profession(scenario, dict_population)
+        dict_population.update({
+                scenario.MALE_NAME:reference_generation_alive(
+                    scenario.generation_size(age_real, fert * scenario.MALE_PERCENT), law, age_real),
+                scenario.FEMALE_NAME:reference_generation_alive(
+                    scenario.generation_size(age_real, fert * scenario.FEMALE_PERCENT), law, age_real),
+                scenario.prof_name_apprentice:prof_number if \
+                        scenario.prof_age_apprentice <= age_real < scenario.prof_age_expert else 0,
+                scenario.prof_name_expert:prof_number if \
+                        scenario.prof_age_expert <= age_real < scenario.prof_age_retiree else 0,
+                scenario.prof_name_retiree:prof_number if \
+                        scenario.prof_age_retiree <= age_real else 0,
+                })
+        metadict[age_real] = dict_population
+    metadict_columns = dict((key, [metadict[age][key] for age in range(scenario.AGE_END + 1)])
+            for key in metadict[scenario.AGE_END])
+    # Производство и уцелевшее оружие, строки — возраст, столбцы — оружие:
+    metadict_wpn = scenario.metadict_wpn
+    wpn_columns = sorted(metadict_wpn.keys())
+    wpn_laws = scenario.wpn_laws(wpn_columns)
+    equipment_create = []
+    equipment_alive = []
+    for age in range(scenario.AGE_END + 1):
+        row_create = []
+        row_alive = []
+        for wpn_key, wpn_law in zip(wpn_columns, wpn_laws):
+            wpn_create = round(metadict[age]['GDP_size'] * scenario.GDP_ARMY * \
+                    metadict_wpn[wpn_key]['wpn_budget'] / metadict_wpn[wpn_key]['wpn_cost'])
+            row_create.append(wpn_create)
+            row_alive.append(reference_generation_alive(wpn_create, wpn_law, age))
+        equipment_create.append(row_create)
+        equipment_alive.append(row_alive)
+    equipment = scenario.equipment_from_matrices(wpn_columns, metadict,
+            equipment_create, equipment_alive)
+    population_alive, army_soldiers, army_reservists = scenario.army_summary(metadict)
+    results = {
+            'metadict':metadict,
+            'metadict_columns':metadict_columns,
+            'equipment':equipment,
+            'population_alive':population_alive,
+            'army_soldiers':army_soldiers,
+            'army_reservists':army_reservists,
+            'economy':scenario.economy_summary(equipment['dict_equipment_all']),
+            }
+    return results
+
+#-------------------------------------------------------------------------
+# Движки-кандидаты. Каждый получает сценарий и возвращает таблицы, как Scenario.compute().
+
+def engine_python(scenario):
+    """Библиотека без NumPy: таблицы выживаемости и отсечка вымерших возрастов."""
+    return scenario.replace(NUMPY_SWITCH=0).compute()
+
+
+def engine_numpy(scenario):
+    """Столбцы и матрицы NumPy."""
+    return scenario.replace(NUMPY_SWITCH=1).compute()
+
+
+def engine_incremental(scenario):
+    """Пересчёт по этапам (IncrementalScenario), с NumPy."""
+    return war_economy.IncrementalScenario(scenario.replace(NUMPY_SWITCH=1)).compute()
+
+
+def engine_incremental_python(scenario):
+    """Пересчёт по этапам (IncrementalScenario), без NumPy."""
+    return war_economy.IncrementalScenario(scenario.replace(NUMPY_SWITCH=0)).compute()
+
+
+EQUIVALENCE_ENGINES = {
+        'python':engine_python,
+        'numpy':engine_numpy,
+        'incremental':engine_incremental,
+        'incremental-python':engine_incremental_python,
+        }
+
+#-------------------------------------------------------------------------
+# Сценарии:
+
+def laws_scenario(scenario):
+    """Тот же сценарий с законами смертности из EQUIVALENCE_LAWS."""
+    wpn_laws = EQUIVALENCE_LAWS['wpn_law']
+    metadict_wpn = {}
+    for number, wpn_key in enumerate(sorted(scenario.metadict_wpn.keys())):
+        dict_wpn = dict(scenario.metadict_wpn[wpn_key])
+        if wpn_laws[number % len(wpn_laws)] is not None:
+            dict_wpn['wpn_law'] = wpn_laws[number % len(wpn_laws)]
+        metadict_wpn[wpn_key] = dict_wpn
+    return scenario.replace(MORTALITY_LAW=EQUIVALENCE_LAWS['MORTALITY_LAW'],
+            prof_law=EQUIVALENCE_LAWS['prof_law'], metadict_wpn=metadict_wpn)
+
+
+def equivalence_scenarios(random_number, seed=None):
+    """Сценарии для проверки: (название, сценарий, файл отчёта или None)."""
+    scenario_script = war_economy.load_script(os.path.join(EQUIVALENCE_DIR, EQUIVALENCE_SCRIPT))
+    scenarios = [(EQUIVALENCE_SCRIPT, scenario_script,
+        os.path.join(EQUIVALENCE_DIR, EQUIVALENCE_EXAMPLE))]
+    scenarios.append((EQUIVALENCE_SCRIPT + ' с законами смертности', laws_scenario(scenario_script), None))
+    old_versions = os.path.join(EQUIVALENCE_DIR, 'old-versions')
+    for name in sorted(os.listdir(old_versions)):
+        if name.endswith('.py'):
+            scenarios.append(('old-versions/' + name,
+                war_economy.load_script(os.path.join(old_versions, name)), None))
+    rng = random.Random(seed)
+    for number in range(random_number):
+        size = rng.randint(*EQUIVALENCE_SIZE)
+        age_end = rng.randint(*EQUIVALENCE_AGE_END)
+        scenario_seed = rng.randrange(1 << 32)
+        scenario = war_economy.synthetic_scenario(size, scenario_seed, {'AGE_END':age_end})
+        scenarios.append(('synthetic ' + str(size) + ' AGE_END=' + str(age_end) + ' seed=' + str(scenario_seed),
+            scenario, None))
+    return scenarios
+
+#-------------------------------------------------------------------------
+# Сравнение:
+
+def result_cells(scenario, results):
+    """Все клетки таблиц: словарь (таблица, строка, столбец) -> число."""
+    cells = {}
+    metadict = results['metadict']
+    for age in metadict:
+        for key, value in metadict[age].items():
+            cells[('metadict', age, key)] = value
+    equipment = results['equipment']
+    wpn_names = scenario.wpn_values(equipment['wpn_columns'], 'wpn_name')
+    for table in ('equipment_create_matrix', 'equipment_alive_matrix'):
+        matrix = equipment[table]
+        if (war_economy.numpy is not None and isinstance(matrix, war_economy.numpy.ndarray)):
+            matrix = matrix.tolist()
+        for age, row in enumerate(matrix):
+            for wpn_name, value in zip(wpn_names, row):
+                cells[(table, age, wpn_name)] = value
+    for wpn_name, value in equipment['dict_equipment_all'].items():
+        cells[('dict_equipment_all', wpn_name, '')] = value
+    for key in ('population_alive', 'army_soldiers', 'army_reservists'):
+        cells[('army', key, '')] = results[key]
+    economy = results['economy']
+    for key in ('budget_percent', 'maintenance_percent_sum'):
+        cells[('economy', key, '')] = economy[key]
+    for table in ('ammunition_needs', 'ammunition_coverage', 'budget_troops_types',
+            'maintenance_troops_types', 'maintenance_percent_troops_types'):
+        for key, value in economy[table].items():
+            cells[(table, key, '')] = value
+    return cells
+
+
+def compare_cells(cells_reference, cells_candidate, tolerance=0):
+    """Несовпадения по таблицам: словарь таблица -> клеток, ошибок, наибольшая разница, примеры.
+
+    tolerance — допустимая относительная разница (от большего из 1
+    и модуля эталона), ноль — только точное совпадение.
+    """
+    tables = {}
+    for cell in sorted(set(cells_reference) | set(cells_candidate), key=repr):
+        table = tables.setdefault(cell[0], {'cells':0, 'mismatches':0, 'max_diff':0, 'examples':[]})
+        table['cells'] = table['cells'] + 1
+        value_reference = cells_reference.get(cell)
+        value_candidate = cells_candidate.get(cell)
+        if (value_reference == value_candidate):
+            continue
+        if (value_reference is None or value_candidate is None):
+            diff = float('inf')
+        else:
+            diff = abs(value_candidate - value_reference)
+            if (diff <= tolerance * max(1, abs(value_reference))):
+                continue
+        table['mismatches'] = table['mismatches'] + 1
+        table['max_diff'] = max(table['max_diff'], diff)
+        if (len(table['examples']) < EQUIVALENCE_EXAMPLES):
+            table['examples'].append((cell[1:], value_reference, value_candidate))
+    return tables
+
+
+def compare_report(scenario, results, example_path):
+    """Сравнение отчёта по таблицам движка с файлом отчёта, строка за строкой."""
+    output = io.StringIO()
+    war_economy.print_report(scenario, results, output)
+    lines = output.getvalue().splitlines()
+    with open(example_path, encoding='utf-8') as example_file:
+        lines_example = example_file.read().splitlines()
+    table = {'cells':max(len(lines), len(lines_example)), 'mismatches':0, 'max_diff':0, 'examples':[]}
+    for number in range(table['cells']):
+        line = lines[number] if number < len(lines) else None
+        line_example = lines_example[number] if number < len(lines_example) else None
+        if (line != line_example):
+            table['mismatches'] = table['mismatches'] + 1
+            if (len(table['examples']) < EQUIVALENCE_EXAMPLES):
+                table['examples'].append(((number + 1,), line_example, line))
+    return table
+
+
+def timed(engine, scenario):
+    """Таблицы движка и время расчёта (кэши таблиц выживаемости очищаются)."""
+    war_economy.clear_caches()
+    time_start = time.perf_counter()
+    results = engine(scenario)
+    return results, time.perf_counter() - time_start
+
+
+def check_scenario(name, scenario, example_path, engines, tolerance=0, stream=sys.stdout):
+    """Проверка всех движков на одном сценарии. Возвращает число несовпадений."""
+    results_reference, seconds_reference = timed(engine_reference, scenario)
+    cells_reference = result_cells(scenario, results_reference)
+    mismatches_all = 0
+    checks = [('reference', results_reference, seconds_reference)]
+    for engine_name in engines:
+        results, seconds = timed(EQUIVALENCE_ENGINES[engine_name], scenario)
+        checks.append((engine_name, results, seconds))
+    for engine_name, results, seconds in checks:
+        if (engine_name == 'reference'):
+            # Эталон сверяется только с файлом отчёта, если он есть:
+            if not example_path:
+                continue
+            tables = {}
+        else:
+            tables = compare_cells(cells_reference, result_cells(scenario, results), tolerance)
+        cells = sum(table['cells'] for table in tables.values())
+        if example_path:
+            tables['report'] = compare_report(scenario, results, example_path)
+        mismatches = sum(table['mismatches'] for table in tables.values())
+        mismatches_all = mismatches_all + mismatches
+        speedup = seconds_reference / seconds if seconds else float('inf')
+        print('\t'.join([name, engine_name, 'ok' if not mismatches else 'РАЗЛИЧИЯ: ' + str(mismatches),
+            'клеток ' + str(cells), 'x' + str(round(speedup, 2))]), file=stream)
+        for table_name in sorted(tables):
+            table = tables[table_name]
+            if not table['mismatches']:
+                continue
+            print('    ', table_name, table['mismatches'], 'из', table['cells'],
+                    'наибольшая разница', table['max_diff'], file=stream)
+            for cell, value_reference, value_candidate in table['examples']:
+                print('        ', cell, value_reference, '->', value_candidate, file=stream)
+    return mismatches_all
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Проверка, что быстрые движки считают так же, как эталонный цикл.')
+    parser.add_argument('--engine', action='append', choices=sorted(EQUIVALENCE_ENGINES),
+            help='движок-кандидат (можно несколько раз), по умолчанию все')
+    parser.add_argument('--random', metavar='N', type=int, default=EQUIVALENCE_RANDOM,
+            help='число случайных сценариев')
+    parser.add_argument('--seed', type=int, default=None,
+            help='зерно случайных сценариев')
+    parser.add_argument('--tolerance', type=float, default=0,
+            help='допустимая относительная разница, по умолчанию — точное совпадение')
+    args = parser.parse_args()
+
+    engines = args.engine or sorted(EQUIVALENCE_ENGINES)
+    if war_economy.numpy is None:
+        engines = [engine for engine in engines if engine in ('python', 'incremental-python')]
+    mismatches = 0
+    for name, scenario, example_path in equivalence_scenarios(args.random, args.seed):
+        mismatches = mismatches + check_scenario(name, scenario, example_path, engines, args.tolerance)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
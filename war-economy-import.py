@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Конвертер базы данных оружия в двоичный файл.
+
+Берёт скрипт с базой данных (блоки dict_wpn = {...}), например
+war-economy-analyser.py или любую версию из old-versions/,
+и записывает metadict_wpn вместе с опциями и видами войск
+в компактный столбцовый файл. Потом его можно подать скрипту:
+
+    python war-economy-import.py war-economy-analyser.py equestria.wdb
+    python war-economy-analyser.py --wpn-database equestria.wdb
+
+Или загрузить в библиотеке, не выполняя скрипт:
+
+    scenario = war_economy.load_database('equestria.wdb')
+"""
+
+import argparse
+
+import war_economy
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Конвертер базы данных оружия в двоичный файл.')
+    parser.add_argument('script', help='скрипт с базой данных оружия')
+    parser.add_argument('output', help='двоичный файл базы данных')
+    args = parser.parse_args()
+
+    scenario = war_economy.load_script(args.script)
+    war_economy.write_wpn_database(args.output, scenario)
+    print('Записано оружия:', len(scenario.metadict_wpn), '—', args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Генератор синтетических сценариев для проверки на больших базах.
+
+Записывает в двоичный файл случайную, но правдоподобную базу данных
+оружия из N единиц: стоимости, бюджеты, параметры потерь, возрасты,
+до 9 боеприпасов на оружие (ссылки на сгенерированные боеприпасы)
+и топливо. Оружие распределено по видам войск, опции сценария
+(население, рост, ВВП) тоже случайные. Файл сразу подаётся скрипту:
+
+    python war-economy-synthetic.py 100000 synthetic.wdb --seed 1
+    python war-economy-analyser.py --wpn-database synthetic.wdb --summary-only
+
+Или в библиотеке, без файла:
+
+    scenario = war_economy.synthetic_scenario(100000, seed=1)
+"""
+
+import argparse
+
+import war_economy
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='Генератор синтетических сценариев для проверки на больших базах.')
+    parser.add_argument('size', type=int, help='число единиц оружия (с боеприпасами и топливом)')
+    parser.add_argument('output', help='двоичный файл базы данных')
+    parser.add_argument('--seed', type=int, default=None,
+            help='зерно случайных чисел, одинаковое зерно — одинаковая база')
+    parser.add_argument('--age-end', metavar='N', type=int,
+            help='AGE_END сценария (по умолчанию как в war-economy-analyser.py)')
+    args = parser.parse_args()
+
+    options = {}
+    if args.age_end is not None:
+        options['AGE_END'] = args.age_end
+    scenario = war_economy.synthetic_scenario(args.size, args.seed, options)
+    war_economy.write_wpn_database(args.output, scenario)
+    print('Записано оружия:', len(scenario.metadict_wpn), '—', args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Военная экономика: демография, армия и вооружение государства.
+
+Библиотека расчётов скрипта war-economy-analyser.py. При импорте
+ничего не вычисляется и ничего не выводится. Все расчёты делаются
+методами сценария (Scenario) и возвращают словари и таблицы.
+
+Пример:
+    import war_economy
+    scenario = war_economy.load_script('war-economy-analyser.py')
+    results = scenario.compute()
+    summary = scenario.replace(GDP_ARMY=0.1).summary()
+"""
+
+import array
+import collections
+import collections.abc
+import concurrent.futures
+import contextlib
+import csv
+import hashlib
+import io
+import itertools
+import json
+import math
+import mmap
+import os
+import pickle
+import random
+import runpy
+import struct
+import sys
+import time
+
+# NumPy не обязателен, без него таблицы считаются циклами:
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Пиковая память для профилировщика, модуля нет в Windows:
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+#-------------------------------------------------------------------------
+# Опции по умолчанию. Смотри описание опций в war-economy-analyser.py
+
+DEFAULT_OPTIONS = {
+        'YEAR_START':1977,
+        'AGE_END':100,
+        'POPULATION':120000000,
+        'POPULATION_YEAR':None,
+        'FERTILITY_RATE':0.03,
+        'MORTALITY_RATE':0.011,
+        'GDP_RATE':50000,
+        'GDP_GROWTH':0.03,
+        'GDP_ARMY':0.2,
+        'COMPONENT_A':0.003,
+        'COEFFICIENT_B':0.000350,
+        'COEFFICIENT_C':1.08,
+        'MORTALITY_LAW':None,
+        'MALE_NAME':'Жеребцы',
+        'MALE_PERCENT':0.4,
+        'FEMALE_NAME':'Кобылки',
+        'FEMALE_PERCENT':0.6,
+        'prof_percent':0.5,
+        'prof_hazard':0.01,
+        'prof_law':None,
+        'prof_male_switch':1,
+        'prof_female_switch':1,
+        'prof_age_apprentice':17,
+        'prof_age_expert':20,
+        'prof_age_retiree':40,
+        'prof_name_apprentice':'Срочники',
+        'prof_name_expert':'Резервисты',
+        'prof_name_retiree':'Отставники',
+        'NUMPY_SWITCH':1,
+        }
+
+# Строки оружия, которые можно заменить в сценарии, по названию оружия:
+# scenario.replace({'wpn_budget':{'Бронетранспортёры':0.01}})
+WPN_OVERRIDES = ('wpn_budget', 'wpn_cost', 'wpn_maintenance')
+
+
+#-------------------------------------------------------------------------
+# Функции, подпрограммы. Не зависят от опций сценария.
+
+# Предел кэша таблиц выживаемости, чисел во всех таблицах (примерно 32 байта на число):
+SURVIVAL_CACHE_CELLS = 2000000
+# Предел кэша таблиц qx из файлов, чисел во всех таблицах:
+MORTALITY_FILES_CELLS = 1000000
+
+
+class TableCache(object):
+    """Кэш таблиц (списков) с вытеснением давно не использованных.
+
+    Предел — сумма длин таблиц, cells_max. Таблица может расти
+    на месте, тогда её надо снова положить в кэш (put), чтобы
+    пересчитать размер. Без предела кэш рос бы с каждым новым
+    законом смертности, например в долгих перебирающих опции процессах.
+    """
+
+    def __init__(self, cells_max):
+        self.cells_max = cells_max
+        self.cells = 0
+        self._tables = collections.OrderedDict()
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._tables)
+
+    def __contains__(self, key):
+        return key in self._tables
+
+    def get(self, key, default=None):
+        """Таблица или default, таблица становится недавно использованной."""
+        table = self._tables.get(key)
+        if table is None:
+            return default
+        self._tables.move_to_end(key)
+        return table
+
+    def put(self, key, table):
+        """Запись таблицы, лишние давно не использованные удаляются."""
+        self.cells = self.cells - self._sizes.get(key, 0) + len(table)
+        self._tables[key] = table
+        self._tables.move_to_end(key)
+        self._sizes[key] = len(table)
+        # Последняя (только что записанная) таблица не удаляется:
+        while (self.cells > self.cells_max and len(self._tables) > 1):
+            key_old, table_old = self._tables.popitem(last=False)
+            self.cells = self.cells - self._sizes.pop(key_old)
+
+    def clear(self):
+        self._tables.clear()
+        self._sizes.clear()
+        self.cells = 0
+
+
+# Кэш таблиц выживаемости, ключи — законы смертности (смотри mortality_law):
+survival_tables = TableCache(SURVIVAL_CACHE_CELLS)
+# Кэш таблиц qx из файлов, ключи — пути и хэши содержимого:
+mortality_files = TableCache(MORTALITY_FILES_CELLS)
+
+
+def clear_caches():
+    """Очистка кэшей таблиц выживаемости и таблиц qx из файлов."""
+    survival_tables.clear()
+    mortality_files.clear()
+    mortality_digests.clear()
+
+
+def gompertz_distribution(a, b, c, age):
+    """Распределение Гомпертца. Риск смерти в зависимости от возраста.
+
+    Распределение Гомпертца-Мейкхама неплохо работает в
+    демографических расчётах для самых разных популяций.
+    Единственный недостаток — оно склонно занижать
+    смертность в начале и завышать в конце (экспонента, что поделать).
+    Для популяции людей даёт хорошие результаты в диапазоне — 30-70 лет.
+    Формула: p=a+b*(c^x)
+    Где:
+    p — вероятность смерти в процентах
+    a — независимый от возраста риск (0.002%)
+    b — коэффициент 2 (0.000350)
+    c — коэффициент 3 (1.08)
+    x — возраст в годах
+    Коэффициенты подобраны с учётом исследования:
+    "Parametric models for life insurance mortality data: gompertz's law over time".
+    """
+    chance_of_dying = a + b * (c ** age)
+    # Проверка. Если получилось больше 1, значит 100% смерть.
+    if (chance_of_dying > 1):
+        chance_of_dying = 1
+    return chance_of_dying
+
+
+# Законы смертности. Закон — кортеж: название ядра и параметры,
+# например ('gompertz', 0.003, 0.00035, 1.08) или ('weibull', 2.5, 60).
+# Ядро получает параметры и возрасты x и возвращает вероятности
+# умереть на шаге x (как gompertz_distribution). С NumPy возрасты —
+# массив, и все вероятности считаются одной операцией над ним.
+
+
+class ScalarMath(object):
+    """Функции math для одного числа, с именами как в NumPy.
+
+    Переполнение даёт бесконечность, а не исключение, как и в NumPy.
+    """
+
+    @staticmethod
+    def exp(x):
+        try:
+            return math.exp(x)
+        except OverflowError:
+            return float('inf')
+
+    @staticmethod
+    def log(x):
+        if (x == 0):
+            return float('-inf')
+        return math.log(x)
+
+    @staticmethod
+    def power(x, y):
+        try:
+            return x ** y
+        except (OverflowError, ZeroDivisionError):
+            return float('inf')
+
+
+def gompertz_hazard(params, x, xp):
+    """Гомпертц-Мейкхам: a + b * c^x, параметры (a, b, c)."""
+    a, b, c = params
+    try:
+        return gompertz_distribution(a, b, c, x)
+    except OverflowError:
+        return 1
+
+
+def weibull_hazard(params, x, xp):
+    """Вейбулл: накопленный риск (x / lambda)^k, параметры (k, lambda).
+
+    Вероятность умереть за шаг — 1 - exp(H(x) - H(x + 1)).
+    """
+    k, scale = params
+    return 1 - xp.exp(xp.power(x / scale, k) - xp.power((x + 1) / scale, k))
+
+
+def siler_hazard(params, x, xp):
+    """Силер: a1 * e^(-b1 * x) + a2 + a3 * e^(b3 * x), параметры (a1, b1, a2, a3, b3).
+
+    Детская смертность, постоянный риск и старение. Риск
+    интегрируется за шаг, поэтому b1 и b3 должны быть больше нуля.
+    """
+    a1, b1, a2, a3, b3 = params
+    hazard = a1 / b1 * (xp.exp(-b1 * x) - xp.exp(-b1 * (x + 1))) + a2 + \
+            a3 / b3 * (xp.exp(b3 * (x + 1)) - xp.exp(b3 * x))
+    return 1 - xp.exp(-hazard)
+
+
+def heligman_pollard_hazard(params, x, xp):
+    """Хелигман-Поллард: q / (1 - q) = A^((x+B)^C) + D * e^(-E * (ln x - ln F)^2) + G * H^x.
+
+    Параметры (A, B, C, D, E, F, G, H): детская смертность,
+    «горб» молодых взрослых и старение.
+    """
+    A, B, C, D, E, F, G, H = params
+    odds = xp.power(A, xp.power(x + B, C)) + \
+            D * xp.exp(-E * (xp.log(x) - math.log(F)) ** 2) + G * xp.power(H, x)
+    return 1 - 1 / (1 + odds)
+
+
+def table_hazard(params, x, xp):
+    """Таблица qx из файла (смотри mortality_table_file), параметры — путь и хэш файла.
+
+    Старше таблицы действует её последнее значение.
+    """
+    qx = mortality_table_file(params[0], params[1])
+    if (xp is numpy):
+        return numpy.array(qx)[numpy.minimum(x.astype(numpy.int64), len(qx) - 1)]
+    return qx[min(int(x), len(qx) - 1)]
+
+
+# Ядра законов смертности: функция риска, названия параметров
+# и можно ли считать её массивами NumPy. Степени Гомпертца считаются
+# питоном, как и прежде, чтобы отчёты совпадали до бита.
+# Закону 'table' mortality_law() добавляет хэш содержимого файла.
+MORTALITY_KERNELS = {
+        'gompertz':{'hazard':gompertz_hazard, 'params':('a', 'b', 'c'), 'vector':False},
+        'weibull':{'hazard':weibull_hazard, 'params':('k', 'lambda'), 'vector':True},
+        'siler':{'hazard':siler_hazard, 'params':('a1', 'b1', 'a2', 'a3', 'b3'), 'vector':True},
+        'heligman-pollard':{'hazard':heligman_pollard_hazard,
+            'params':('A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'), 'vector':True},
+        'table':{'hazard':table_hazard, 'params':('path',), 'vector':True},
+        }
+
+
+def mortality_law(law):
+    """Закон смертности кортежем: (ядро, параметры...).
+
+    Кроме кортежа подходят список (из JSON) и строка через пробелы,
+    например 'weibull 2.5 60' или 'table qx.csv' (путь — вся остальная
+    строка), так закон хранится в двоичной базе оружия.
+    Закон 'table' получает третий элемент — хэш содержимого файла
+    (mortality_file_digest), поэтому после правки файла это другой
+    закон: с другой таблицей выживаемости и другим хэшем сценария.
+    """
+    if isinstance(law, str):
+        name, _, rest = law.strip().partition(' ')
+        if (name == 'table'):
+            law = (name, rest.strip())
+        else:
+            law = [name] + [float(value) for value in rest.split()]
+    law = tuple(law)
+    if (not law or law[0] not in MORTALITY_KERNELS):
+        raise ValueError('Неизвестный закон смертности: ' + str(law))
+    params = MORTALITY_KERNELS[law[0]]['params']
+    if (law[0] == 'table' and len(law) == 3):
+        # Хэш уже добавлен, но файл мог измениться:
+        law = law[:2]
+    if (len(law) - 1 != len(params)):
+        raise ValueError('Закону ' + law[0] + ' нужны параметры: ' + ', '.join(params))
+    if (law[0] == 'table'):
+        law = law + (mortality_file_digest(law[1]),)
+    return law
+
+
+def mortality_law_string(law):
+    """Закон смертности строкой, обратное к mortality_law() (без хэша файла)."""
+    law = mortality_law(law)
+    if (law[0] == 'table'):
+        law = law[:2]
+    return ' '.join(str(value) for value in law)
+
+
+# Хэши файлов таблиц qx: путь -> (время изменения, размер, sha256).
+mortality_digests = {}
+
+
+def mortality_file_digest(path):
+    """Хэш sha256 содержимого файла таблицы qx.
+
+    Файл перечитывается, только если изменились время изменения
+    или размер, иначе хэш берётся из mortality_digests.
+    """
+    stat = os.stat(path)
+    stamp = mortality_digests.get(path)
+    if (stamp is not None and stamp[:2] == (stat.st_mtime_ns, stat.st_size)):
+        return stamp[2]
+    with open(path, 'rb') as table_file:
+        digest = hashlib.sha256(table_file.read()).hexdigest()
+    mortality_digests[path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def mortality_table_file(path, digest=None):
+    """Вероятности умереть qx по возрастам из текстового файла.
+
+    В строке — одно число (qx, возраст — номер строки) или два:
+    возраст и qx, через запятую, точку с запятой или пробелы.
+    Строки, начинающиеся с #, и строки не из чисел (заголовки)
+    пропускаются. Пропущенные возрасты получают прежнее значение.
+    Таблицы кэшируются по пути и хэшу содержимого (digest,
+    по умолчанию — хэш файла сейчас), правка файла даёт новую таблицу.
+    """
+    if digest is None:
+        digest = mortality_file_digest(path)
+    qx = mortality_files.get((path, digest))
+    if qx is not None:
+        return qx
+    with open(path, 'rb') as table_file:
+        data = table_file.read()
+    values = {}
+    for line in data.decode('utf-8').splitlines():
+        line = line.strip()
+        if (not line or line.startswith('#')):
+            continue
+        fields = line.replace(',', ' ').replace(';', ' ').split()
+        try:
+            numbers = [float(field) for field in fields]
+        except ValueError:
+            continue
+        if (len(numbers) == 1):
+            values[len(values)] = numbers[0]
+        elif (len(numbers) >= 2):
+            values[int(numbers[0])] = numbers[1]
+    if not values:
+        raise ValueError('В файле нет таблицы qx: ' + str(path))
+    qx = []
+    for age in range(max(values) + 1):
+        qx.append(values.get(age, qx[-1] if qx else values[min(values)]))
+    mortality_files.put((path, hashlib.sha256(data).hexdigest()), qx)
+    return qx
+
+
+def mortality_hazards(law, age_start, age_stop):
+    """Вероятности умереть на шагах от age_start до age_stop (не включая), списком.
+
+    С NumPy векторное ядро считается одной операцией над массивом
+    возрастов, без NumPy — по одному возрасту. Больше 1 и NaN
+    (переполнения) — это 1, верная смерть.
+    """
+    kernel = MORTALITY_KERNELS[law[0]]
+    params = law[1:]
+    if (kernel['vector'] and numpy is not None):
+        ages = numpy.arange(age_start, age_stop, dtype=float)
+        with numpy.errstate(all='ignore'):
+            hazards = numpy.asarray(kernel['hazard'](params, ages, numpy), dtype=float)
+        hazards = numpy.minimum(numpy.nan_to_num(hazards, nan=1, posinf=1), 1)
+        return hazards.tolist()
+    hazards = []
+    for age in range(age_start, age_stop):
+        hazard = kernel['hazard'](params, age if not kernel['vector'] else float(age), ScalarMath)
+        if (hazard != hazard or hazard > 1):
+            hazard = 1
+        hazards.append(hazard)
+    return hazards
+
+
+def survival_table(law, age_real):
+    """Таблица выживаемости для закона смертности law.
+
+    Элемент таблицы с индексом n, это доля выживших после n+1 шагов
+    закона смертности (возрасты от 0 до n включительно).
+    Таблица вычисляется один раз для каждого закона
+    и дополняется, если запрошен возраст больше уже посчитанного.
+    Вероятности смерти берутся кусками из mortality_hazards().
+    Если доля выживших обнулилась, дальше таблица не растёт — все мертвы.
+    """
+    table = survival_tables.get(law)
+    if table is None:
+        table = []
+    # Шаг таблицы соответствует шагу цикла в generation_alive:
+    # возраст 0 вычитается до цикла, затем возрасты от 1 до age_real + 1.
+    age_last = max(age_real + 1, 0)
+    if (table and table[-1] <= 0):
+        return table
+    table_len = len(table)
+    age = table_len
+    survivors = table[-1] if table else 1
+    while (age <= age_last and survivors > 0):
+        # Куски растут вдвое, чтобы не считать риски далеко за вымиранием:
+        age_stop = min(age_last + 1, age + max(age, 16))
+        for chance_of_dying in mortality_hazards(law, age, age_stop):
+            survivors = survivors - survivors * chance_of_dying
+            if (survivors <= 0):
+                table.append(0)
+                break
+            table.append(survivors)
+        age = age_stop
+    # Кэш пересчитывает размер выросшей таблицы:
+    if (not table_len or len(table) > table_len):
+        survival_tables.put(law, table)
+    return table
+
+
+def generation_alive(generation, law, age_real):
+    """Число живых в поколении.
+
+    Каждый год умирает некий процент из поколения.
+    Произведение долей выживших по годам берётся из таблицы
+    survival_table(), поэтому вычисление сводится к одному умножению.
+    """
+    table = survival_table(law, age_real)
+    age_last = max(age_real + 1, 0)
+    # Если таблица оборвалась раньше, значит поколение вымерло.
+    if (age_last < len(table)):
+        generation_survivors = generation * table[age_last]
+    else:
+        generation_survivors = 0
+    # Проверка. Если число выживших уходит в минус, значит все мертвы.
+    if (generation_survivors <= 0):
+        generation_survivors = 0
+    # Округляем число
+    generation_survivors = round(generation_survivors)
+    return generation_survivors
+
+
+def survival_cutoff(law, age_end, count):
+    """Сколько первых возрастов (от 0 до age_end) могут дать живых.
+
+    Если в поколении не больше count, то с возраста, где
+    count * доля выживших <= 0.5, округлённое число живых — ноль
+    (доля выживших с возрастом не растёт). Таблица выживаемости
+    растёт только до этого возраста, а не до age_end.
+    """
+    # Таблица наращивается кусками, пока последний элемент не даст ноль:
+    age = 16
+    while True:
+        table = survival_table(law, min(age, age_end))
+        if (age >= age_end or count * table[-1] <= 0.5):
+            break
+        age = age * 2
+    # Двоичный поиск первого возраста с нулём (элемент таблицы age + 1):
+    age_low = 0
+    age_high = min(age_end + 1, len(table) - 1)
+    while (age_low < age_high):
+        age = (age_low + age_high) // 2
+        if (count * table[age + 1] <= 0.5):
+            age_high = age
+        else:
+            age_low = age + 1
+    return age_low
+
+
+def survival_column(law, age_end, age_cutoff=None):
+    """Доли выживших для возрастов от 0 до age_end, столбцом NumPy.
+
+    Индекс столбца — возраст. Значения берутся из survival_table(),
+    поэтому умножение на столбец совпадает с generation_alive() до бита.
+    Если задан age_cutoff (смотри survival_cutoff), доли с этого
+    возраста остаются нулями.
+    """
+    if age_cutoff is None:
+        age_cutoff = age_end + 1
+    table = survival_table(law, min(age_end, age_cutoff - 1))
+    column = numpy.zeros(age_end + 1)
+    # Возрасту age_real соответствует элемент таблицы age_real + 1:
+    column_len = min(len(table) - 1, age_end + 1, age_cutoff)
+    column[:column_len] = table[1:column_len + 1]
+    return column
+
+
+def survival_steps(law, age_end):
+    """Доли доживших до следующего возраста, для возрастов от 0 до age_end.
+
+    Элемент x — доля тех, кто за год перешёл из возраста x-1 в x
+    (в таблице выживаемости это отношение элементов x+1 и x).
+    Нулевой элемент не используется: новорождённые считаются отдельно.
+    """
+    return [1 - chance_of_dying for chance_of_dying in mortality_hazards(law, 1, age_end + 2)]
+
+
+def shift_state(state, steps, newborn):
+    """Сдвиг возрастов на год вперёд: одно умножение на доли доживших.
+
+    Возраст x+1 получает возраст x, умноженный на steps[x+1],
+    старший возраст уходит, в нулевой встают новорождённые.
+    Состояние — список или массив NumPy (возраст × столбцы).
+    """
+    if (numpy is not None and isinstance(state, numpy.ndarray)):
+        state_next = numpy.empty_like(state)
+        state_next[0] = newborn
+        state_next[1:] = state[:-1] * steps[1:]
+        return state_next
+    return [newborn] + [value * step for value, step in zip(state[:-1], steps[1:])]
+
+
+def metadict_from_columns(columns):
+    """Словарь поколений metadict[возраст] из столбцов таблицы.
+
+    Нужен для совместимости: выводу и модулю оружия
+    привычнее обращаться к данным по возрасту.
+    """
+    metadict = {}
+    columns_lists = {}
+    for key in columns:
+        columns_lists[key] = columns[key].tolist()
+    for age in range(len(columns_lists['age_real']) - 1, -1, -1):
+        dict_population = {}
+        for key in columns_lists:
+            dict_population[key] = columns_lists[key][age]
+        metadict[age] = dict_population
+    return metadict
+
+
+def wpn_munitions(dict_wpn):
+    """Боеприпасы и топливо оружия: список словарей name, capacity, expense...
+
+    Оружие перечисляет их строкой 'wpn_ammo' — списком любой длины.
+    Старые пронумерованные строки (wpn_ammo_1_name, wpn_ammo_1_expense...
+    и wpn_fuel_name...) переводятся в такой же список, топливо последним.
+    """
+    if 'wpn_ammo' in dict_wpn:
+        return [munition for munition in dict_wpn['wpn_ammo'] if munition.get('name')]
+    slots = {}
+    fuel = {}
+    for key, value in dict_wpn.items():
+        if key.startswith('wpn_ammo_'):
+            number, _, field = key[len('wpn_ammo_'):].partition('_')
+            if (number.isdigit() and field):
+                slots.setdefault(int(number), {})[field] = value
+        elif key.startswith('wpn_fuel_'):
+            fuel[key[len('wpn_fuel_'):]] = value
+    munitions = [slots[number] for number in sorted(slots)]
+    munitions.append(fuel)
+    return [munition for munition in munitions if munition.get('name')]
+
+
+def wpn_numbered(dict_wpn):
+    """Словарь оружия, где список 'wpn_ammo' разложен в строки wpn_ammo_N_...
+
+    Так оружие хранится в двоичной базе: столбцы там только
+    из чисел или строк, а число боеприпасов не ограничено.
+    """
+    if 'wpn_ammo' not in dict_wpn:
+        return dict_wpn
+    dict_numbered = {}
+    for key, value in dict_wpn.items():
+        if (key != 'wpn_ammo'):
+            dict_numbered[key] = value
+    for number, munition in enumerate(dict_wpn['wpn_ammo'], 1):
+        for field, value in munition.items():
+            dict_numbered['wpn_ammo_' + str(number) + '_' + field] = value
+    return dict_numbered
+
+
+# Оптимизация бюджета: шагов двойственного спуска и попыток уточнения
+# после точного расчёта боеприпасов (смотри Scenario.optimize_budgets):
+OPTIMIZE_ITERATIONS = 2000
+OPTIMIZE_ATTEMPTS = 3
+# Поправок бюджета по полному расчёту в обратной задаче (Scenario.solve_budgets):
+SOLVE_PASSES = 2
+
+# Калибровка демографии (смотри Scenario.calibrate): подбираемые опции,
+# их нижние границы (по умолчанию ноль), предел шагов Нелдера-Мида,
+# перезапусков и точность. CALIBRATION_PRIOR — вес отступа от исходных
+# параметров: из многих решений выбирается ближайшее.
+CALIBRATION_PARAMETERS = ('FERTILITY_RATE', 'MORTALITY_RATE', 'COMPONENT_A', 'COEFFICIENT_B', 'COEFFICIENT_C')
+CALIBRATION_LOWER = {'COEFFICIENT_C':1}
+CALIBRATION_ITERATIONS = 2000
+CALIBRATION_RESTARTS = 3
+CALIBRATION_TOLERANCE = 1e-14
+CALIBRATION_PRIOR = 1e-6
+# Цели калибровки, кроме долей возрастов ('0-14' — доля живых от 0 до 14 лет):
+CALIBRATION_TARGETS = ('population_alive', 'life_expectancy', 'army_soldiers')
+# До какого возраста считается ожидаемая продолжительность жизни (не меньше AGE_END):
+CALIBRATION_AGE_MAX = 150
+
+
+def calibration_age_group(name):
+    """Возрасты доли '0-14' (от и до, включительно) для калибровки."""
+    age_from, separator, age_to = str(name).partition('-')
+    try:
+        return int(age_from), int(age_to)
+    except ValueError:
+        raise ValueError('Неизвестная цель калибровки: ' + str(name))
+
+
+def nelder_mead(function, start, step=0.1, iterations=CALIBRATION_ITERATIONS,
+        tolerance=CALIBRATION_TOLERANCE):
+    """Минимум функции методом Нелдера-Мида, без производных.
+
+    function получает список точек (списков чисел) и возвращает
+    список значений — так она считает все точки шага одной
+    операцией над массивом. На каждом шаге сразу считаются
+    отражение, растяжение и оба сжатия. Останавливается, когда
+    значения в вершинах симплекса различаются меньше tolerance.
+    Возвращает лучшую точку, её значение, число шагов и точек.
+    """
+    size = len(start)
+    simplex = [list(start)]
+    for number in range(size):
+        point = list(start)
+        point[number] = point[number] + step
+        simplex.append(point)
+    values = function(simplex)
+    evaluations = len(simplex)
+    iteration = 0
+    for iteration in range(1, iterations + 1):
+        order = sorted(range(size + 1), key=lambda vertex: values[vertex])
+        simplex = [simplex[vertex] for vertex in order]
+        values = [values[vertex] for vertex in order]
+        if (abs(values[-1] - values[0]) <= tolerance):
+            break
+        centroid = [sum(point[number] for point in simplex[:-1]) / size for number in range(size)]
+        worst = simplex[-1]
+        # Отражение, растяжение, внешнее и внутреннее сжатие:
+        candidates = [[center + factor * (center - coordinate)
+            for center, coordinate in zip(centroid, worst)] for factor in (1, 2, 0.5, -0.5)]
+        reflected, expanded, outside, inside = function(candidates)
+        evaluations = evaluations + len(candidates)
+        if (reflected < values[0]):
+            if (expanded < reflected):
+                simplex[-1], values[-1] = candidates[1], expanded
+            else:
+                simplex[-1], values[-1] = candidates[0], reflected
+        elif (reflected < values[-2]):
+            simplex[-1], values[-1] = candidates[0], reflected
+        elif (reflected < values[-1] and outside <= reflected):
+            simplex[-1], values[-1] = candidates[2], outside
+        elif (reflected >= values[-1] and inside < values[-1]):
+            simplex[-1], values[-1] = candidates[3], inside
+        else:
+            # Сжатие всего симплекса к лучшей вершине:
+            best = simplex[0]
+            simplex = [best] + [[center + 0.5 * (coordinate - center)
+                for center, coordinate in zip(best, point)] for point in simplex[1:]]
+            values = [values[0]] + function(simplex[1:])
+            evaluations = evaluations + size
+    vertex = min(range(size + 1), key=lambda vertex: values[vertex])
+    return simplex[vertex], values[vertex], iteration, evaluations
+
+
+#-------------------------------------------------------------------------
+# Сценарий: опции, виды войск и база данных оружия.
+
+class Scenario(object):
+    """Сценарий расчёта.
+
+    Опции доступны как атрибуты с теми же именами, что и в скрипте:
+    scenario.POPULATION, scenario.prof_percent и так далее.
+    Виды войск — scenario.dict_troops_types, оружие — scenario.metadict_wpn.
+    Сценарий не меняется после создания, для изменений есть replace().
+    """
+
+    def __init__(self, options=None, metadict_wpn=None, dict_troops_types=None):
+        self.options = dict(DEFAULT_OPTIONS)
+        if options:
+            for key in options:
+                if key not in DEFAULT_OPTIONS:
+                    raise KeyError('Неизвестная опция: ' + str(key))
+            self.options.update(options)
+        for key, value in self.options.items():
+            setattr(self, key, value)
+        # Сдвиг прогрессий: на сколько лет YEAR_START позже POPULATION_YEAR.
+        self.year_shift = 0 if self.POPULATION_YEAR is None else self.YEAR_START - self.POPULATION_YEAR
+        self.metadict_wpn = metadict_wpn if metadict_wpn is not None else {}
+        self.dict_troops_types = dict_troops_types if dict_troops_types is not None else {}
+
+    def replace(self, overrides=None, **options):
+        """Новый сценарий с заменёнными опциями.
+
+        Кроме опций можно заменить 'dict_troops_types' и 'metadict_wpn',
+        например: scenario.replace({'GDP_ARMY':0.1, 'dict_troops_types':{...}}),
+        и строки оружия из WPN_OVERRIDES — словарём по названиям оружия:
+        scenario.replace({'wpn_budget':{'Бронетранспортёры':0.01}})
+        """
+        options_new = dict(self.options)
+        metadict_wpn = self.metadict_wpn
+        dict_troops_types = self.dict_troops_types
+        wpn_overrides = {}
+        overrides_all = dict(overrides or {})
+        overrides_all.update(options)
+        for key, value in overrides_all.items():
+            if (key == 'metadict_wpn'):
+                metadict_wpn = value
+            elif (key == 'dict_troops_types'):
+                dict_troops_types = value
+            elif key in WPN_OVERRIDES:
+                wpn_overrides[key] = value
+            else:
+                options_new[key] = value
+        if wpn_overrides:
+            metadict_wpn_new = {}
+            for wpn_key, dict_wpn in metadict_wpn.items():
+                wpn_name = dict_wpn['wpn_name']
+                changes = dict((key, values[wpn_name]) for key, values in wpn_overrides.items()
+                        if wpn_name in values)
+                if changes:
+                    dict_wpn = dict(dict_wpn)
+                    dict_wpn.update(changes)
+                metadict_wpn_new[wpn_key] = dict_wpn
+            metadict_wpn = metadict_wpn_new
+        return Scenario(options_new, metadict_wpn, dict_troops_types)
+
+    def numpy_backend(self):
+        """Считать ли таблицы с помощью NumPy."""
+        return (numpy is not None and self.NUMPY_SWITCH != 0)
+
+    def wpn_values(self, wpn_columns, key, default=None):
+        """Значения одного поля базы оружия, по порядку wpn_columns.
+
+        Двоичная база (WeaponDatabase) отдаёт столбец целиком,
+        не собирая словари оружия по одному.
+        """
+        column_values = getattr(self.metadict_wpn, 'column_values', None)
+        if column_values is not None:
+            return column_values(wpn_columns, key, default)
+        return [self.metadict_wpn[wpn_key].get(key, default) for wpn_key in wpn_columns]
+
+    def fingerprint(self):
+        """Хэш сценария (sha256): опции, виды войск и база данных оружия.
+
+        Одинаковые сценарии дают одинаковый хэш, порядок ключей
+        в словарях и вид записи боеприпасов на него не влияют.
+        Законы смертности 'table' входят в хэш с хэшем содержимого
+        файла, так что после правки файла qx сценарий считается заново.
+        """
+        wpn_columns = sorted(self.metadict_wpn.keys())
+        laws = [self.population_law(), self.profession_law()] + self.wpn_laws(wpn_columns)
+        scenario_data = {
+                'version':CACHE_VERSION,
+                'mortality_tables':sorted(set(law[1:] for law in laws if law[0] == 'table')),
+                'options':self.options,
+                'dict_troops_types':self.dict_troops_types,
+                'metadict_wpn':[[wpn_key, wpn_numbered(self.metadict_wpn[wpn_key])]
+                    for wpn_key in sorted(self.metadict_wpn.keys())],
+                }
+        data = json.dumps(scenario_data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    #---------------------------------------------------------------------
+    # Демография.
+
+    def population_size(self, year):
+        """Вычисляем численность популяции.
+
+        Рост популяции, это геометрическая прогрессия, например:
+        100000*1.002^(100-1)=121872
+        Начальная численность, годовой прирост, период в сто лет.
+        Функция вычисляет исходную численность, зная конечную:
+        121872*1.002^(1-100)=100000
+        """
+        population = self.POPULATION * ((self.FERTILITY_RATE - self.MORTALITY_RATE + 1) ** (self.year_shift - year))
+        # Округляем число
+        population = round (population)
+        return population
+
+    def generation_size(self, year, percent):
+        """Определяем численность поколения.
+
+        Поколение, это процент от популяции, например, если рождаемость 0.02:
+        121872*1.002^(1-100)*0.02=2000 (2% новорожденных в популяции)
+        Точно так же можно определить число умерших, прирост населения, состав:
+        121872*1.002^(1-100)*0.02*0.5=1000 (50% новорожденных мужского пола)
+        """
+        generation = round(self.population_size(year) * percent)
+        return generation
+
+    def GDP_size(self, year):
+        """ВВП страны в определённый год.
+
+        Рост благосостояния, это та же геометрическая прогрессия:
+        10000*1.03^(1-100)=536
+        В данном случае от 536$ за столетие ВВП вырос до 10 000$
+        """
+        GDP_in_year = self.GDP_RATE * ((self.GDP_GROWTH + 1) ** (self.year_shift - year)) * self.population_size(year)
+        GDP_in_year = round (GDP_in_year)
+        return GDP_in_year
+
+    def population_law(self):
+        """Закон смертности населения: MORTALITY_LAW или Гомпертц-Мейкхам с COMPONENT_A."""
+        if self.MORTALITY_LAW is not None:
+            return mortality_law(self.MORTALITY_LAW)
+        return ('gompertz', self.COMPONENT_A, self.COEFFICIENT_B, self.COEFFICIENT_C)
+
+    def profession_law(self, prof_hazard=None):
+        """Закон смертности профессии, от возраста призыва.
+
+        Это prof_law или Гомпертц-Мейкхам, где компонент Мейкхама
+        заменён профессиональным риском prof_hazard.
+        """
+        if self.prof_law is not None:
+            return mortality_law(self.prof_law)
+        if prof_hazard is None:
+            prof_hazard = self.prof_hazard
+        return ('gompertz', prof_hazard, self.COEFFICIENT_B, self.COEFFICIENT_C)
+
+    def wpn_laws(self, wpn_columns):
+        """Законы потерь оружия, по порядку wpn_columns.
+
+        Строка 'wpn_law' оружия или Гомпертц-Мейкхам с (wpn_a, wpn_b, wpn_c).
+        """
+        wpn_laws = []
+        for law, a, b, c in zip(self.wpn_values(wpn_columns, 'wpn_law'),
+                self.wpn_values(wpn_columns, 'wpn_a'),
+                self.wpn_values(wpn_columns, 'wpn_b'),
+                self.wpn_values(wpn_columns, 'wpn_c')):
+            if law is not None:
+                wpn_laws.append(mortality_law(law))
+            else:
+                wpn_laws.append(('gompertz', a, b, c))
+        return wpn_laws
+
+    def wpn_loss_rates(self, wpn_columns):
+        """Доли потерь оружия за год без учёта старения, по порядку wpn_columns.
+
+        Для Гомпертца-Мейкхама это независимый от возраста риск a,
+        для прочих законов (смотри wpn_laws) — риск первого года.
+        """
+        loss_rates = []
+        for law in self.wpn_laws(wpn_columns):
+            if (law[0] == 'gompertz'):
+                loss_rates.append(law[1])
+            else:
+                loss_rates.append(mortality_hazards(law, 0, 1)[0])
+        return loss_rates
+
+    def generation_profession(self, prof_percent, prof_hazard, dict_population):
+        """Число представителей определённой профессии, с учётом риска.
+
+        Данные о поколении берутся из словаря dict_population одного возраста.
+        """
+        age_real = dict_population['age_real']
+        law = self.profession_law(prof_hazard)
+        prof_number = 0
+        if (self.prof_male_switch != 0):
+            # Берём из словаря численность живых в нужном поколении
+            # и пропускаем через ещё один цикл, чтобы учесть риск профессии.
+            prof_number = prof_number + \
+                    generation_alive(dict_population['generation_alive'] * self.MALE_PERCENT * prof_percent,
+                            # Отчёт начинается с возраста профессии.
+                            law, age_real - self.prof_age_apprentice)
+        if (self.prof_female_switch != 0):
+            prof_number = prof_number + \
+                    generation_alive(dict_population['generation_alive'] * self.FEMALE_PERCENT * prof_percent,
+                            law, age_real - self.prof_age_apprentice)
+        return prof_number
+
+    def cohort_columns(self):
+        """Таблица поколений столбцами NumPy, сразу для всех возрастов.
+
+        То же самое, что и главный цикл, но каждый показатель
+        вычисляется одной операцией над массивом. Индекс массива — возраст.
+        Округления повторяют population_size(), generation_size(),
+        generation_alive() и GDP_size() шаг в шаг.
+        """
+        AGE_END = self.AGE_END
+        fert = self.FERTILITY_RATE
+        ages = numpy.arange(AGE_END + 1)
+        # Степени считаются питоном, чтобы совпадать с функциями до бита:
+        population_growth = numpy.array([(self.FERTILITY_RATE - self.MORTALITY_RATE + 1) ** (self.year_shift - year)
+            for year in range(AGE_END + 1)])
+        GDP_growth = numpy.array([(self.GDP_GROWTH + 1) ** (self.year_shift - year)
+            for year in range(AGE_END + 1)])
+        survival = survival_column(self.population_law(), AGE_END)
+        population = numpy.round(self.POPULATION * population_growth)
+        generation = numpy.round(population * fert)
+        generation_alive_column = numpy.round(numpy.maximum(generation * survival, 0))
+        GDP = numpy.round(self.GDP_RATE * GDP_growth * population)
+        male = numpy.round(numpy.maximum(
+            numpy.round(population * (fert * self.MALE_PERCENT)) * survival, 0))
+        female = numpy.round(numpy.maximum(
+            numpy.round(population * (fert * self.FEMALE_PERCENT)) * survival, 0))
+        # Профессиональный риск отсчитывается от возраста призыва:
+        prof_survival = numpy.zeros(AGE_END + 1)
+        if (self.prof_age_apprentice <= AGE_END):
+            prof_survival[self.prof_age_apprentice:] = survival_column(self.profession_law(),
+                    AGE_END - self.prof_age_apprentice)
+        prof_number = numpy.zeros(AGE_END + 1)
+        if (self.prof_male_switch != 0):
+            prof_number = prof_number + numpy.round(numpy.maximum(
+                generation_alive_column * self.MALE_PERCENT * self.prof_percent * prof_survival, 0))
+        if (self.prof_female_switch != 0):
+            prof_number = prof_number + numpy.round(numpy.maximum(
+                generation_alive_column * self.FEMALE_PERCENT * self.prof_percent * prof_survival, 0))
+        apprentice_mask = (self.prof_age_apprentice <= ages) & (ages < self.prof_age_expert)
+        expert_mask = (self.prof_age_expert <= ages) & (ages < self.prof_age_retiree)
+        retiree_mask = (self.prof_age_retiree <= ages)
+        columns = {
+                'age_real':ages,
+                'year_real':self.YEAR_START - ages,
+                'population_size':population,
+                'generation_size':generation,
+                'generation_alive':generation_alive_column,
+                'GDP_size':GDP,
+                self.MALE_NAME:male,
+                self.FEMALE_NAME:female,
+                self.prof_name_apprentice:numpy.where(apprentice_mask, prof_number, 0),
+                self.prof_name_expert:numpy.where(expert_mask, prof_number, 0),
+                self.prof_name_retiree:numpy.where(retiree_mask, prof_number, 0),
+                }
+        # Все показатели целые, как и после round() в функциях:
+        for key in columns:
+            columns[key] = columns[key].astype(numpy.int64)
+        return columns
+
+    def cohort_table(self):
+        """Таблица поколений: словарь metadict[возраст] и те же данные столбцами."""
+        # Эта база данных станет индексом для словарей.
+        metadict = {}
+        # Те же данные, но столбцами (индекс — возраст):
+        metadict_columns = {}
+
+        if self.numpy_backend():
+            # Быстрый путь, вся таблица поколений за раз:
+            metadict_columns = self.cohort_columns()
+            metadict = metadict_from_columns(metadict_columns)
+            return metadict, metadict_columns
+
+        AGE_END = self.AGE_END
+        fert = self.FERTILITY_RATE
+        law = self.population_law()
+        # Рабочие переменные:
+        age_real = AGE_END
+        progression_year = 0
+        year = 0
+        # Не моложе age_cutoff живых нет ни в одном поколении:
+        generation_max = round(max(self.population_size(0), self.population_size(AGE_END)) * \
+                fert * max(1, self.MALE_PERCENT, self.FEMALE_PERCENT))
+        age_cutoff = survival_cutoff(law, AGE_END, generation_max)
+
+        # Цикл перебирает годы, уходя в прошлое,
+        # пока возраст популяции не сравняется с возрастом конца исследования.
+        while (progression_year <= AGE_END):
+            # Определяем текущий год (для прогрессии роста населения).
+            year = AGE_END - progression_year
+            year_real = self.YEAR_START - year
+
+            # Создаём основной словарь (базу данных) для этого возраста:
+            dict_population = {
+                    'age_real':age_real,
+                    'year_real':year_real,
+                    'population_size':self.population_size(year),
+                    'generation_size':self.generation_size(year, fert),
+                    'generation_alive':0,
+                    'GDP_size':self.GDP_size(year)
+                    }
+            if (age_real >= age_cutoff):
+                # Поколение вымерло, живых, мужчин, женщин и профессий — ноль:
+                dict_population.update(dict.fromkeys([self.MALE_NAME, self.FEMALE_NAME,
+                    self.prof_name_apprentice, self.prof_name_expert, self.prof_name_retiree], 0))
+                metadict[age_real] = dict_population
+                progression_year = progression_year + 1
+                age_real = age_real - 1
+                continue
+            dict_population['generation_alive'] = generation_alive(
+                    self.generation_size(year, fert), law, age_real)
+
+            # Определяем численность призывников:
+            prof_number_apprentice = 0
+            if (self.prof_age_apprentice <= age_real < self.prof_age_expert):
+                prof_number_apprentice = prof_number_apprentice + \
+                        self.generation_profession(self.prof_percent, self.prof_hazard, dict_population)
+            # Определяем численность резервистов:
+            prof_number_expert = 0
+            if (self.prof_age_expert <= age_real < self.prof_age_retiree):
+                prof_number_expert = prof_number_expert + \
+                        self.generation_profession(self.prof_percent, self.prof_hazard, dict_population)
+            # И, наконец, пенсионеры:
+            prof_number_retiree = 0
+            if (self.prof_age_retiree <= age_real):
+                prof_number_retiree = prof_number_retiree + \
+                        self.generation_profession(self.prof_percent, self.prof_hazard, dict_population)
+
+            # Создаём временный словарь гендеров и профессий:
+            dict_demography = {
+                    self.MALE_NAME:generation_alive(
+                        self.generation_size(year, fert * self.MALE_PERCENT), law, age_real),
+                    self.FEMALE_NAME:generation_alive(
+                        self.generation_size(year, fert * self.FEMALE_PERCENT), law, age_real),
+                    self.prof_name_apprentice:prof_number_apprentice,
+                    self.prof_name_expert:prof_number_expert,
+                    self.prof_name_retiree:prof_number_retiree,
+                    }
+
+            # Дополняем первый словарь вторым
+            dict_population.update(dict_demography)
+            # Создаём объединённый словарь,
+            # он будет пополняться при каждом проходе цикла:
+            metadict[age_real] = dict_population
+
+            # Завершение главного цикла:
+            progression_year = progression_year + 1
+            age_real = age_real - 1
+
+        # Столбцы собираются из готового словаря:
+        for key in metadict[AGE_END]:
+            metadict_columns[key] = [metadict[age][key] for age in range(AGE_END + 1)]
+        return metadict, metadict_columns
+
+    #---------------------------------------------------------------------
+    # Производство и количество оружия в войсках.
+
+    def equipment_matrices(self, wpn_columns, metadict, metadict_columns, wpn_cutoffs=None):
+        """Матрицы произведённого и уцелевшего оружия.
+
+        Строки матриц — возраст оружия (он же год выпуска),
+        столбцы — оружие из базы данных в порядке списка wpn_columns.
+        С NumPy производство считается одним умножением бюджета на ВВП,
+        а потери — умножением на матрицу выживаемости оружия.
+        Без NumPy матрицы — списки строк, заполняемые циклами.
+        Клетки не моложе wpn_cutoffs (смотри wpn_cutoffs()) — заведомо
+        нули, они не считаются.
+        """
+        metadict_wpn = self.metadict_wpn
+        if wpn_cutoffs is None:
+            wpn_cutoffs = self.wpn_cutoffs(wpn_columns, metadict_columns)
+        if self.numpy_backend():
+            GDP = metadict_columns['GDP_size']
+            wpn_budget = numpy.array(self.wpn_values(wpn_columns, 'wpn_budget'), dtype=float)
+            wpn_cost = numpy.array(self.wpn_values(wpn_columns, 'wpn_cost'), dtype=float)
+            equipment_create = numpy.round(GDP[:, numpy.newaxis] * self.GDP_ARMY * wpn_budget / wpn_cost)
+            # Уцелевшие считаются только в строках, где кто-то может уцелеть:
+            age_alive_end = max(wpn_cutoffs, default=0)
+            wpn_survival = self.wpn_survival_matrix(wpn_columns, wpn_cutoffs)
+            equipment_alive = numpy.zeros(equipment_create.shape)
+            equipment_alive[:age_alive_end] = numpy.round(numpy.maximum(
+                equipment_create[:age_alive_end] * wpn_survival[:age_alive_end], 0))
+            return equipment_create.astype(numpy.int64), equipment_alive.astype(numpy.int64)
+        wpn_cutoff = dict(zip(wpn_columns, wpn_cutoffs))
+        wpn_law = dict(zip(wpn_columns, self.wpn_laws(wpn_columns)))
+        equipment_create = []
+        equipment_alive = []
+        for age in range(self.AGE_END + 1):
+            row_create = []
+            row_alive = []
+            for wpn_key in wpn_columns:
+                # Количество созданных машин, это бюджет на них, делённый на стоимость.
+                wpn_create = round(metadict[age]['GDP_size'] * self.GDP_ARMY * \
+                        metadict_wpn[wpn_key]['wpn_budget'] / metadict_wpn[wpn_key]['wpn_cost'])
+                wpn_alive = 0
+                if (age < wpn_cutoff[wpn_key]):
+                    wpn_alive = generation_alive(wpn_create, wpn_law[wpn_key], age)
+                row_create.append(wpn_create)
+                row_alive.append(wpn_alive)
+            equipment_create.append(row_create)
+            equipment_alive.append(row_alive)
+        return equipment_create, equipment_alive
+
+    def wpn_survival_matrix(self, wpn_columns, wpn_cutoffs=None):
+        """Матрица выживаемости оружия (возраст × оружие), массив NumPy.
+
+        Одинаковые законы потерь (смотри wpn_laws) считаются один раз.
+        Если заданы wpn_cutoffs, доли не моложе них остаются нулями.
+        """
+        wpn_survival = numpy.zeros((self.AGE_END + 1, len(wpn_columns)))
+        if wpn_cutoffs is None:
+            wpn_cutoffs = [self.AGE_END + 1] * len(wpn_columns)
+        survival_columns = {}
+        for column, key in enumerate(zip(self.wpn_laws(wpn_columns), wpn_cutoffs)):
+            if key not in survival_columns:
+                survival_columns[key] = survival_column(key[0], self.AGE_END, key[1])
+            wpn_survival[:, column] = survival_columns[key]
+        return wpn_survival
+
+    def wpn_cutoffs(self, wpn_columns, metadict_columns):
+        """Для каждого оружия — сколько первых возрастов могут дать уцелевших.
+
+        Больше всего оружия выпускается в год с наибольшим ВВП,
+        начиная с survival_cutoff() для этого выпуска уцелевших
+        после округления — ноль при любом годе выпуска.
+        """
+        GDP_max = max(metadict_columns['GDP_size'])
+        wpn_cutoffs = []
+        for wpn_budget, wpn_cost, law in zip(self.wpn_values(wpn_columns, 'wpn_budget'),
+                self.wpn_values(wpn_columns, 'wpn_cost'),
+                self.wpn_laws(wpn_columns)):
+            count = round(GDP_max * self.GDP_ARMY * wpn_budget / wpn_cost)
+            wpn_cutoffs.append(survival_cutoff(law, self.AGE_END, count))
+        return wpn_cutoffs
+
+    def equipment_sum(self, equipment_alive):
+        """Сумма по столбцам матрицы оружия — всё оружие на складах."""
+        if self.numpy_backend():
+            return equipment_alive.sum(axis=0).tolist()
+        equipment_all = [0] * len(self.metadict_wpn)
+        for row in equipment_alive:
+            for column, wpn_alive in enumerate(row):
+                equipment_all[column] = equipment_all[column] + wpn_alive
+        return equipment_all
+
+    def equipment_tables(self, metadict, metadict_columns):
+        """Базы данных оружия: матрицы, словари по годам и сумма на складах."""
+        metadict_wpn = self.metadict_wpn
+        # Столбцы матриц оружия — ключи базы данных по порядку:
+        wpn_columns = sorted(metadict_wpn.keys())
+
+        # Матрицы (возраст × оружие) произведённого и уцелевшего оружия:
+        wpn_cutoffs = self.wpn_cutoffs(wpn_columns, metadict_columns)
+        equipment_create_matrix, equipment_alive_matrix = \
+                self.equipment_matrices(wpn_columns, metadict, metadict_columns, wpn_cutoffs)
+        equipment = self.equipment_from_matrices(wpn_columns, metadict,
+                equipment_create_matrix, equipment_alive_matrix)
+        # Не моложе этого возраста уцелевшего оружия нет (для вывода по годам):
+        equipment['age_alive_end'] = max(wpn_cutoffs, default=0)
+        return equipment
+
+    def equipment_from_matrices(self, wpn_columns, metadict,
+            equipment_create_matrix, equipment_alive_matrix):
+        """Словари оружия по годам и сумма на складах из готовых матриц."""
+        wpn_names = self.wpn_values(wpn_columns, 'wpn_name')
+        # Произведённое оружие, словарь по годам (для совместимости):
+        metadict_equipment_create = {}
+        # Уцелевшее оружие:
+        metadict_equipment_alive = {}
+        if self.numpy_backend():
+            equipment_create_rows = equipment_create_matrix.tolist()
+            equipment_alive_rows = equipment_alive_matrix.tolist()
+        else:
+            equipment_create_rows = equipment_create_matrix
+            equipment_alive_rows = equipment_alive_matrix
+        for meta_key in sorted(metadict.keys(), reverse=True):
+            metadict_equipment_create[meta_key] = dict(zip(wpn_names, equipment_create_rows[meta_key]))
+            metadict_equipment_alive[meta_key] = dict(zip(wpn_names, equipment_alive_rows[meta_key]))
+
+        # Далее, вычисляем общее число вооружений на складах, это сумма столбцов:
+        dict_equipment_all = dict(zip(wpn_names, self.equipment_sum(equipment_alive_matrix)))
+
+        equipment = {
+                'wpn_columns':wpn_columns,
+                'equipment_create_matrix':equipment_create_matrix,
+                'equipment_alive_matrix':equipment_alive_matrix,
+                'metadict_equipment_create':metadict_equipment_create,
+                'metadict_equipment_alive':metadict_equipment_alive,
+                'dict_equipment_all':dict_equipment_all,
+                }
+        return equipment
+
+    #---------------------------------------------------------------------
+    # Итоги: армия, бюджет, обслуживание и боеприпасы.
+
+    def army_summary(self, metadict):
+        """Численность популяции, срочников и резервистов."""
+        population_alive = 0
+        army_soldiers= 0
+        army_reservists = 0
+        for meta_key in sorted(metadict.keys()):
+            population_alive = population_alive + metadict[meta_key]['generation_alive']
+            army_soldiers = army_soldiers + metadict[meta_key][self.prof_name_apprentice]
+            army_reservists = army_reservists + metadict[meta_key][self.prof_name_expert]
+        return population_alive, army_soldiers, army_reservists
+
+    def munition_matrix(self, wpn_columns):
+        """Разреженная матрица расхода боеприпасов (оружие × боеприпас).
+
+        Хранятся только ненулевые ячейки, тройками: номер оружия
+        в wpn_columns, номер боеприпаса в ammo_names и расход в год.
+        """
+        ammo_names = []
+        ammo_numbers = {}
+        rows = []
+        columns = []
+        expenses = []
+        for row, wpn_key in enumerate(wpn_columns):
+            for munition in wpn_munitions(self.metadict_wpn[wpn_key]):
+                if munition['name'] not in ammo_numbers:
+                    ammo_numbers[munition['name']] = len(ammo_names)
+                    ammo_names.append(munition['name'])
+                rows.append(row)
+                columns.append(ammo_numbers[munition['name']])
+                expenses.append(munition.get('expense', 0))
+        munitions = {
+                'ammo_names':ammo_names,
+                'rows':rows,
+                'columns':columns,
+                'expenses':expenses,
+                }
+        return munitions
+
+    def ammunition_needs(self, munitions, equipment_all):
+        """Потребность в боеприпасах: матрица расхода на вектор оружия.
+
+        equipment_all — оружие на складах, по порядку строк матрицы.
+        Возвращает словарь: боеприпас -> расход в год.
+        """
+        ammo_names = munitions['ammo_names']
+        if (self.numpy_backend() and munitions['rows']):
+            weights = numpy.array(munitions['expenses'], dtype=float) * \
+                    numpy.array(equipment_all, dtype=float)[munitions['rows']]
+            needs = numpy.bincount(munitions['columns'], weights=weights,
+                    minlength=len(ammo_names)).tolist()
+            # Целые расходы остаются целыми, как и без NumPy:
+            needs_float = [False] * len(ammo_names)
+            for column, expense in zip(munitions['columns'], munitions['expenses']):
+                if not isinstance(expense, int):
+                    needs_float[column] = True
+            needs = [value if needs_float[column] else int(value)
+                    for column, value in enumerate(needs)]
+        else:
+            needs = [0] * len(ammo_names)
+            for row, column, expense in zip(munitions['rows'], munitions['columns'],
+                    munitions['expenses']):
+                needs[column] = needs[column] + expense * equipment_all[row]
+        return dict(zip(ammo_names, needs))
+
+    def economy_summary(self, dict_equipment_all, munitions=None):
+        """Суммируем всё вооружение: боеприпасы, бюджет и обслуживание.
+
+        Вычисляется потребность армии в боеприпасах,
+        а также суммарный бюджет на вооружения и бюджеты по видам войск.
+        munitions — готовая матрица расхода боеприпасов (munition_matrix),
+        если её не нужно строить заново.
+        """
+        metadict_wpn = self.metadict_wpn
+        budget_percent = 0
+        # Оружие на складах, но не меньше одного экземпляра:
+        equipment_all_dict = {}
+        # База данных бюджета по видам войск:
+        # Создаётся рабочий словарь, обнуляются значения:
+        budget_troops_types = {}
+        budget_troops_types.update(self.dict_troops_types)
+        for troop_key in budget_troops_types:
+            budget_troops_types[troop_key] = 0
+        # База данных стоимости обслуживания по видам войск:
+        # Создаётся рабочий словарь, обнуляются значения:
+        maintenance_troops_types = {}
+        maintenance_troops_types.update(self.dict_troops_types)
+        for troop_key in budget_troops_types:
+            maintenance_troops_types[troop_key] = 0
+
+        # Перебор столбцов в базе данных оружия:
+        for wpn_key in sorted(metadict_wpn.keys()):
+            # Сумма оружия за все годы уже посчитана:
+            equipment_all = dict_equipment_all[metadict_wpn[wpn_key]['wpn_name']]
+            # Если есть проект, значит есть оружие, хотя бы один экземпляр:
+            if (equipment_all < 1):
+                equipment_all = 1
+            equipment_all_dict[wpn_key] = equipment_all
+            # Считаем общий бюджет и бюджет по родам войск:
+            budget_percent = budget_percent + metadict_wpn[wpn_key]['wpn_budget']
+            for troop_key in budget_troops_types:
+                if troop_key == metadict_wpn[wpn_key]['wpn_troops_type']:
+                    budget_troops_types[troop_key] = budget_troops_types[troop_key] + \
+                            metadict_wpn[wpn_key]['wpn_budget'] * 100
+            # Считаем расходы на обслуживание данного вида оружия:
+            # Стоимость оружия * процент обслуживания * штук на складах
+            # Если строка 'wpn_maintenance' не указана, тогда обслуживание бесплатно
+            wpn_maintenance_all = metadict_wpn[wpn_key]['wpn_cost'] * \
+                    metadict_wpn.get(wpn_key, 0).get('wpn_maintenance', 0)  * \
+                    dict_equipment_all.get(metadict_wpn[wpn_key]['wpn_name'])
+            # Теперь распределяем расходы на обслуживание по родам войск:
+            for troop_key in maintenance_troops_types:
+                if troop_key == metadict_wpn[wpn_key]['wpn_troops_type']:
+                    maintenance_troops_types[troop_key] = maintenance_troops_types[troop_key] + \
+                            wpn_maintenance_all
+
+        # Потребность в боеприпасах и топливе, одним умножением матрицы:
+        wpn_columns = sorted(metadict_wpn.keys())
+        if munitions is None:
+            munitions = self.munition_matrix(wpn_columns)
+        ammunition_needs = self.ammunition_needs(munitions,
+                [equipment_all_dict[wpn_key] for wpn_key in wpn_columns])
+
+        # Доля расходов на обслуживание в бюджете армии:
+        maintenance_percent_sum = 0
+        maintenance_percent_troops_types = {}
+        for troop_key in sorted(maintenance_troops_types.keys()):
+            maintenance_percent = maintenance_troops_types[troop_key] / (self.GDP_size(0) * self.GDP_ARMY)
+            maintenance_percent_sum = maintenance_percent_sum + maintenance_percent
+            maintenance_percent_troops_types[troop_key] = maintenance_percent
+
+        # Соотношение производства боеприпасов и потребности в них:
+        ammunition_coverage = {}
+        for ammo_key in sorted(ammunition_needs.keys()):
+            # (ammo_key, 0) — значит, если нет ключа, брать ноль.
+            ammunition_coverage[ammo_key] = \
+                    dict_equipment_all.get(ammo_key, ammunition_needs[ammo_key]) / \
+                    ammunition_needs[ammo_key]
+
+        economy = {
+                'equipment_all':equipment_all_dict,
+                'ammunition_needs':ammunition_needs,
+                'ammunition_coverage':ammunition_coverage,
+                'budget_percent':budget_percent,
+                'budget_troops_types':budget_troops_types,
+                'maintenance_troops_types':maintenance_troops_types,
+                'maintenance_percent_troops_types':maintenance_percent_troops_types,
+                'maintenance_percent_sum':maintenance_percent_sum,
+                }
+        return economy
+
+    #---------------------------------------------------------------------
+    # Расчёт целиком.
+
+    def compute(self, cache=None):
+        """Все таблицы сценария: поколения, оружие, армия и экономика.
+
+        cache — кэш результатов (ResultCache). Если сценарий уже
+        считался, результаты берутся из кэша, иначе туда записываются.
+        """
+        if cache is not None:
+            fingerprint = self.fingerprint()
+            results = cache.get(fingerprint)
+            if results is not None:
+                return results
+        metadict, metadict_columns = self.cohort_table()
+        equipment = self.equipment_tables(metadict, metadict_columns)
+        population_alive, army_soldiers, army_reservists = self.army_summary(metadict)
+        economy = self.economy_summary(equipment['dict_equipment_all'])
+        results = {
+                'metadict':metadict,
+                'metadict_columns':metadict_columns,
+                'equipment':equipment,
+                'population_alive':population_alive,
+                'army_soldiers':army_soldiers,
+                'army_reservists':army_reservists,
+                'economy':economy,
+                }
+        if cache is not None:
+            cache.put(fingerprint, results)
+        return results
+
+    def summary(self, results=None, cache=None):
+        """Итоги расчёта для сценария, без вывода на экран."""
+        if results is None:
+            results = self.compute(cache)
+        economy = results['economy']
+        summary = {
+                'population_alive':results['population_alive'],
+                'army_soldiers':results['army_soldiers'],
+                'army_reservists':results['army_reservists'],
+                'budget_percent':economy['budget_percent'],
+                'maintenance_percent_sum':economy['maintenance_percent_sum'],
+                'ammunition_coverage':economy['ammunition_coverage'],
+                }
+        return summary
+
+    #---------------------------------------------------------------------
+    # Прогноз: шаг за шагом вперёд по годам.
+
+    def forecast(self, years):
+        """Прогноз на years лет вперёд от YEAR_START.
+
+        Начальное состояние — таблица поколений этого сценария.
+        Дальше каждый год живые поколения, профессионалы и оружие
+        по возрастам сдвигаются на год и умножаются на долю доживших,
+        а в нулевой возраст встают новорождённые и новое оружие.
+        Поколения не пересчитываются от рождения, поэтому прогноз
+        стоит O(лет × возрастов), а не years полных расчётов.
+
+        Возвращает список итогов по годам (нулевой — сам YEAR_START):
+        численность популяции и армии, ВВП, оружие на складах
+        и экономику (economy_summary) этого года.
+        """
+        AGE_END = self.AGE_END
+        fert = self.FERTILITY_RATE
+        law = self.population_law()
+        prof_law = self.profession_law()
+        app = self.prof_age_apprentice
+        use_numpy = self.numpy_backend()
+        metadict_wpn = self.metadict_wpn
+        wpn_columns = sorted(metadict_wpn.keys())
+        wpn_names = self.wpn_values(wpn_columns, 'wpn_name')
+        wpn_budget = self.wpn_values(wpn_columns, 'wpn_budget')
+        wpn_cost = self.wpn_values(wpn_columns, 'wpn_cost')
+        wpn_law_keys = self.wpn_laws(wpn_columns)
+
+        # Доли доживших: население, профессия и оружие.
+        # Профессиональный риск отсчитывается от возраста призыва.
+        steps = survival_steps(law, AGE_END)
+        table = survival_table(law, AGE_END)
+        survival = [table[age + 1] if age + 1 < len(table) else 0 for age in range(AGE_END + 1)]
+        prof_table = survival_table(prof_law, AGE_END - app)
+        prof_survival = [prof_table[max(age - app + 1, 0)] if max(age - app + 1, 0) < len(prof_table) else 0
+                for age in range(AGE_END + 1)]
+        # Элемент x — доля доживших шаг x + 1 профессии, от возраста призыва:
+        prof_own_steps = survival_steps(prof_law, AGE_END - app)
+        prof_steps = [step * prof_own_steps[age - app]
+            if age - app + 1 >= 1 else step for age, step in enumerate(steps)]
+        wpn_steps = {}
+        wpn_survival = {}
+        for key in wpn_law_keys:
+            if key not in wpn_steps:
+                wpn_steps[key] = survival_steps(key, AGE_END)
+                wpn_table = survival_table(key, AGE_END)
+                wpn_survival[key] = [wpn_table[age + 1] if age + 1 < len(wpn_table) else 0
+                        for age in range(AGE_END + 1)]
+
+        # Начальное состояние, год YEAR_START. Поколения не округлены,
+        # профессии считаются от округлённых живых, как в таблице поколений:
+        alive = [self.generation_size(age, fert) * survival[age] for age in range(AGE_END + 1)]
+        male = [self.generation_size(age, fert * self.MALE_PERCENT) * survival[age]
+                for age in range(AGE_END + 1)]
+        female = [self.generation_size(age, fert * self.FEMALE_PERCENT) * survival[age]
+                for age in range(AGE_END + 1)]
+        prof_male = [round(alive[age]) * self.MALE_PERCENT * self.prof_percent * prof_survival[age]
+                for age in range(AGE_END + 1)]
+        prof_female = [round(alive[age]) * self.FEMALE_PERCENT * self.prof_percent * prof_survival[age]
+                for age in range(AGE_END + 1)]
+        # Оружие: строки — возраст, столбцы — оружие из wpn_columns.
+        equipment = [[round(self.GDP_size(age) * self.GDP_ARMY * budget / cost) * wpn_survival[key][age]
+            for budget, cost, key in zip(wpn_budget, wpn_cost, wpn_law_keys)]
+            for age in range(AGE_END + 1)]
+        equipment_steps = [[wpn_steps[key][age] for key in wpn_law_keys] for age in range(AGE_END + 1)]
+        if use_numpy:
+            steps = numpy.array(steps)
+            prof_steps = numpy.array(prof_steps)
+            alive, male, female, prof_male, prof_female = [numpy.array(state)
+                    for state in (alive, male, female, prof_male, prof_female)]
+            equipment = numpy.array(equipment, dtype=float).reshape(AGE_END + 1, len(wpn_columns))
+            equipment_steps = numpy.array(equipment_steps, dtype=float).reshape(AGE_END + 1, len(wpn_columns))
+        else:
+            # Без NumPy оружие хранится столбцами, каждый сдвигается отдельно:
+            equipment = [list(column) for column in zip(*equipment)] or [[] for key in wpn_law_keys]
+            equipment_steps = [list(column) for column in zip(*equipment_steps)]
+
+        ages = range(AGE_END + 1)
+        apprentice_ages = [age for age in ages if self.prof_age_apprentice <= age < self.prof_age_expert]
+        expert_ages = [age for age in ages if self.prof_age_expert <= age < self.prof_age_retiree]
+        forecast = []
+        for year in range(years + 1):
+            if (year > 0):
+                # Новое поколение и новое оружие этого года:
+                born = self.generation_size(-year, fert) * survival[0]
+                alive = shift_state(alive, steps, born)
+                male = shift_state(male, steps,
+                        self.generation_size(-year, fert * self.MALE_PERCENT) * survival[0])
+                female = shift_state(female, steps,
+                        self.generation_size(-year, fert * self.FEMALE_PERCENT) * survival[0])
+                prof_male = shift_state(prof_male, prof_steps,
+                        round(born) * self.MALE_PERCENT * self.prof_percent * prof_survival[0])
+                prof_female = shift_state(prof_female, prof_steps,
+                        round(born) * self.FEMALE_PERCENT * self.prof_percent * prof_survival[0])
+                GDP_army = self.GDP_size(-year) * self.GDP_ARMY
+                equipment_born = [round(GDP_army * budget / cost) * wpn_survival[key][0]
+                        for budget, cost, key in zip(wpn_budget, wpn_cost, wpn_law_keys)]
+                if use_numpy:
+                    equipment = shift_state(equipment, equipment_steps, equipment_born)
+                else:
+                    equipment = [shift_state(column, column_steps, born_wpn)
+                            for column, column_steps, born_wpn
+                            in zip(equipment, equipment_steps, equipment_born)]
+
+            # Итоги года, с округлением по возрастам, как в таблице поколений:
+            if use_numpy:
+                alive_rounded = numpy.round(alive).astype(numpy.int64).tolist()
+                prof_rounded = (numpy.round(prof_male) + numpy.round(prof_female)).astype(numpy.int64).tolist()
+                equipment_all = numpy.round(equipment).astype(numpy.int64).sum(axis=0).tolist()
+            else:
+                alive_rounded = [round(value) for value in alive]
+                prof_rounded = [round(value_male) + round(value_female)
+                        for value_male, value_female in zip(prof_male, prof_female)]
+                equipment_all = [sum(round(value) for value in column) for column in equipment]
+            dict_equipment_all = dict(zip(wpn_names, equipment_all))
+            # Экономика года: тот же сценарий, сдвинутый на year лет вперёд.
+            scenario_year = self.replace(YEAR_START=self.YEAR_START + year,
+                    POPULATION_YEAR=self.YEAR_START - self.year_shift)
+            economy = scenario_year.economy_summary(dict_equipment_all)
+            dict_year = {
+                    'year_real':self.YEAR_START + year,
+                    'population_size':self.population_size(-year),
+                    'generation_size':self.generation_size(-year, fert),
+                    'GDP_size':self.GDP_size(-year),
+                    'population_alive':sum(alive_rounded),
+                    'army_soldiers':sum(prof_rounded[age] for age in apprentice_ages),
+                    'army_reservists':sum(prof_rounded[age] for age in expert_ages),
+                    'dict_equipment_all':dict_equipment_all,
+                    'budget_percent':economy['budget_percent'],
+                    'maintenance_percent_sum':economy['maintenance_percent_sum'],
+                    'ammunition_coverage':economy['ammunition_coverage'],
+                    'economy':economy,
+                    }
+            forecast.append(dict_year)
+        return forecast
+
+    #---------------------------------------------------------------------
+    # Окно лет начала отсчёта: снимки для многих YEAR_START за раз.
+
+    def start_year_scenario(self, year_start):
+        """Тот же сценарий, но с отсчётом от year_start.
+
+        Численность и ВВП по-прежнему заданы для года POPULATION_YEAR
+        (или нынешнего YEAR_START), поэтому население и ВВП снимка —
+        те же прогрессии, сдвинутые на year_start - YEAR_START лет.
+        """
+        return self.replace(YEAR_START=year_start, POPULATION_YEAR=self.YEAR_START - self.year_shift)
+
+    def start_years(self, years):
+        """Итоги для каждого года начала отсчёта из years, за один проход.
+
+        Поколение возраста x в снимке года YEAR_START + d — то же
+        поколение, что в возрасте x - d в этом сценарии: при сдвиге
+        прогрессии только переносятся. Поэтому численность поколений,
+        ВВП и выпуск оружия считаются один раз на все годы рождения
+        окна, а каждый снимок — это срез этих столбцов, умноженный
+        на доли уцелевших по возрасту. Итоги совпадают с
+        start_year_scenario(год).summary() до единицы.
+
+        Возвращает список итогов, как у summary(), с ключом 'YEAR_START'.
+        """
+        AGE_END = self.AGE_END
+        fert = self.FERTILITY_RATE
+        law = self.population_law()
+        app = self.prof_age_apprentice
+        years = list(years)
+        if not years:
+            return []
+        shifts = [year - self.YEAR_START for year in years]
+        # Годы рождения окна, индекс k — возраст в этом сценарии (от year_min):
+        year_min = -max(shifts)
+        year_max = AGE_END - min(shifts)
+        births = range(year_min, year_max + 1)
+        wpn_columns = sorted(self.metadict_wpn.keys())
+        wpn_names = self.wpn_values(wpn_columns, 'wpn_name')
+        wpn_budget = self.wpn_values(wpn_columns, 'wpn_budget')
+        wpn_cost = self.wpn_values(wpn_columns, 'wpn_cost')
+        munitions = self.munition_matrix(wpn_columns)
+
+        # Столбцы по годам рождения, с теми же округлениями, что в таблице поколений:
+        generation = [self.generation_size(year, fert) for year in births]
+        male = [self.generation_size(year, fert * self.MALE_PERCENT) for year in births]
+        female = [self.generation_size(year, fert * self.FEMALE_PERCENT) for year in births]
+        GDP = [self.GDP_size(year) for year in births]
+        # Доли уцелевших по возрасту: население, профессия и оружие.
+        table = survival_table(law, AGE_END)
+        survival = [table[age + 1] if age + 1 < len(table) else 0 for age in range(AGE_END + 1)]
+        prof_table = survival_table(self.profession_law(), AGE_END - app)
+        prof_survival = [prof_table[age - app + 1] if 0 <= age - app + 1 < len(prof_table) else 0
+                for age in range(AGE_END + 1)]
+        ages = range(AGE_END + 1)
+        apprentice_ages = [age for age in ages if self.prof_age_apprentice <= age < self.prof_age_expert]
+        expert_ages = [age for age in ages if self.prof_age_expert <= age < self.prof_age_retiree]
+        use_numpy = self.numpy_backend()
+        if use_numpy:
+            generation = numpy.array(generation, dtype=float)
+            GDP = numpy.array(GDP, dtype=float)
+            survival = numpy.array(survival)
+            prof_survival = numpy.array(prof_survival)
+            equipment_create = numpy.round(GDP[:, numpy.newaxis] * self.GDP_ARMY
+                    * numpy.array(wpn_budget, dtype=float) / numpy.array(wpn_cost, dtype=float))
+            wpn_survival = self.wpn_survival_matrix(wpn_columns)
+        else:
+            equipment_create = [[round(GDP_year * self.GDP_ARMY * budget / cost)
+                for budget, cost in zip(wpn_budget, wpn_cost)] for GDP_year in GDP]
+            wpn_tables = [survival_table(wpn_law, AGE_END) for wpn_law in self.wpn_laws(wpn_columns)]
+
+        summaries = []
+        for year, shift in zip(years, shifts):
+            # Возрасты снимка 0..AGE_END — годы рождения start..start + AGE_END:
+            start = -shift - year_min
+            if use_numpy:
+                alive = numpy.round(numpy.maximum(generation[start:start + AGE_END + 1] * survival, 0))
+                prof = numpy.zeros(AGE_END + 1)
+                if (self.prof_male_switch != 0):
+                    prof = prof + numpy.round(numpy.maximum(
+                        alive * self.MALE_PERCENT * self.prof_percent * prof_survival, 0))
+                if (self.prof_female_switch != 0):
+                    prof = prof + numpy.round(numpy.maximum(
+                        alive * self.FEMALE_PERCENT * self.prof_percent * prof_survival, 0))
+                population_alive = int(alive.sum())
+                army_soldiers = int(prof[apprentice_ages].sum())
+                army_reservists = int(prof[expert_ages].sum())
+                equipment_all = numpy.round(numpy.maximum(
+                    equipment_create[start:start + AGE_END + 1] * wpn_survival, 0)).sum(axis=0)
+                equipment_all = equipment_all.astype(numpy.int64).tolist()
+            else:
+                alive = [generation_alive(generation[start + age], law, age) for age in ages]
+                prof = []
+                for age in ages:
+                    prof_number = 0
+                    if (self.prof_male_switch != 0):
+                        prof_number = prof_number + round(max(alive[age] * self.MALE_PERCENT
+                            * self.prof_percent * prof_survival[age], 0))
+                    if (self.prof_female_switch != 0):
+                        prof_number = prof_number + round(max(alive[age] * self.FEMALE_PERCENT
+                            * self.prof_percent * prof_survival[age], 0))
+                    prof.append(prof_number)
+                population_alive = sum(alive)
+                army_soldiers = sum(prof[age] for age in apprentice_ages)
+                army_reservists = sum(prof[age] for age in expert_ages)
+                equipment_all = []
+                for column, wpn_table in enumerate(wpn_tables):
+                    wpn_alive = 0
+                    for age in range(min(AGE_END + 1, len(wpn_table) - 1)):
+                        wpn_alive = wpn_alive + round(max(equipment_create[start + age][column]
+                            * wpn_table[age + 1], 0))
+                    equipment_all.append(wpn_alive)
+            economy = self.start_year_scenario(year).economy_summary(
+                    dict(zip(wpn_names, equipment_all)), munitions)
+            summaries.append({
+                    'YEAR_START':year,
+                    'population_alive':population_alive,
+                    'army_soldiers':army_soldiers,
+                    'army_reservists':army_reservists,
+                    'budget_percent':economy['budget_percent'],
+                    'maintenance_percent_sum':economy['maintenance_percent_sum'],
+                    'ammunition_coverage':economy['ammunition_coverage'],
+                    })
+        return summaries
+
+    #---------------------------------------------------------------------
+    # Чувствительность итогов к параметрам.
+
+    def sensitivity(self):
+        """Производные итогов по параметрам оружия и по GDP_ARMY, за один проход.
+
+        Запасы оружия считаются без округлений: сумма по возрастам
+        выпуска (ВВП * GDP_ARMY * wpn_budget / wpn_cost) на долю уцелевших.
+        Доля уцелевших — произведение (1 - q) по годам, q = a + b * c^k,
+        поэтому её производные — суммы по тем же годам:
+        dlnS/da = -Σ 1/(1-q), dlnS/db = -Σ c^k/(1-q), dlnS/dc = -Σ b*k*c^(k-1)/(1-q)
+        Если у оружия свой закон потерь (wpn_law), производные
+        по wpn_a, wpn_b и wpn_c нулевые.
+
+        Возвращает параметры (список словарей: wpn_key, wpn_name,
+        parameter, value) и итоги: metrics[название] = {'value':значение,
+        'gradient':{номер параметра: производная}}. Итоги — это запасы
+        оружия, budget_percent, maintenance_percent_sum и обеспеченность
+        каждым боеприпасом.
+        """
+        metadict_wpn = self.metadict_wpn
+        AGE_END = self.AGE_END
+        GDP_ARMY = self.GDP_ARMY
+        wpn_columns = sorted(metadict_wpn.keys())
+        GDP = [self.GDP_size(age) for age in range(AGE_END + 1)]
+        parameters = [{'wpn_key':None, 'wpn_name':None, 'parameter':'GDP_ARMY', 'value':GDP_ARMY}]
+        metrics = collections.OrderedDict()
+
+        def add_gradient(gradient, gradient_add, factor):
+            for number, derivative in gradient_add.items():
+                gradient[number] = gradient.get(number, 0) + derivative * factor
+
+        # Запасы оружия и их производные:
+        equipment = {}
+        wpn_numbers = {}
+        for wpn_key, law in zip(wpn_columns, self.wpn_laws(wpn_columns)):
+            dict_wpn = metadict_wpn[wpn_key]
+            number = len(parameters)
+            wpn_numbers[wpn_key] = number
+            a = dict_wpn.get('wpn_a')
+            b = dict_wpn.get('wpn_b')
+            c = dict_wpn.get('wpn_c')
+            # Производные по a, b, c — только если потери считаются по ним:
+            law_abc = (law == ('gompertz', a, b, c))
+            wpn_parameters = ['wpn_budget', 'wpn_cost']
+            if law_abc:
+                wpn_parameters = wpn_parameters + ['wpn_a', 'wpn_b', 'wpn_c']
+            for parameter in wpn_parameters:
+                parameters.append({'wpn_key':wpn_key, 'wpn_name':dict_wpn['wpn_name'],
+                    'parameter':parameter, 'value':dict_wpn[parameter]})
+            budget = dict_wpn['wpn_budget']
+            cost = dict_wpn['wpn_cost']
+            table = survival_table(law, AGE_END)
+            hazards = mortality_hazards(law, 0, len(table))
+            # Уцелевшие при единичном выпуске на рубль ВВП и производные по a, b, c:
+            unit = 0
+            unit_a = 0
+            unit_b = 0
+            unit_c = 0
+            sum_a = 0
+            sum_b = 0
+            sum_c = 0
+            # Элемент таблицы k — произведение (1 - q) по годам от 0 до k,
+            # возрасту age соответствует элемент age + 1.
+            for k in range(AGE_END + 2):
+                if (k >= len(table) or table[k] <= 0):
+                    break
+                if law_abc:
+                    q_rest = 1 - hazards[k]
+                    sum_a = sum_a + 1 / q_rest
+                    sum_b = sum_b + (c ** k) / q_rest
+                    sum_c = sum_c + b * k * (c ** (k - 1)) / q_rest
+                if (k >= 1):
+                    alive = GDP[k - 1] * table[k]
+                    unit = unit + alive
+                    unit_a = unit_a - alive * sum_a
+                    unit_b = unit_b - alive * sum_b
+                    unit_c = unit_c - alive * sum_c
+            scale = GDP_ARMY * budget / cost
+            equipment[wpn_key] = {
+                    'value':unit * scale,
+                    'gradient':{
+                        0:unit * budget / cost,
+                        number:unit * GDP_ARMY / cost,
+                        number + 1:-unit * scale / cost,
+                        },
+                    }
+            if law_abc:
+                equipment[wpn_key]['gradient'].update({
+                    number + 2:unit_a * scale,
+                    number + 3:unit_b * scale,
+                    number + 4:unit_c * scale,
+                    })
+            metrics['equipment_all: ' + dict_wpn['wpn_name']] = equipment[wpn_key]
+
+        # Бюджет — просто сумма долей:
+        metrics['budget_percent'] = {
+                'value':sum(metadict_wpn[wpn_key]['wpn_budget'] for wpn_key in wpn_columns),
+                'gradient':dict((number, 1) for number, parameter in enumerate(parameters)
+                    if parameter['parameter'] == 'wpn_budget'),
+                }
+
+        # Обслуживание: стоимость * процент обслуживания * запасы, доля бюджета армии.
+        GDP_army = self.GDP_size(0) * GDP_ARMY
+        maintenance = 0
+        gradient = {}
+        for wpn_key in wpn_columns:
+            dict_wpn = metadict_wpn[wpn_key]
+            factor = dict_wpn['wpn_cost'] * dict_wpn.get('wpn_maintenance', 0) / GDP_army
+            maintenance = maintenance + factor * equipment[wpn_key]['value']
+            add_gradient(gradient, equipment[wpn_key]['gradient'], factor)
+            # Стоимость входит и множителем:
+            number = wpn_numbers[wpn_key] + 1
+            gradient[number] = gradient[number] + factor * equipment[wpn_key]['value'] / dict_wpn['wpn_cost']
+        gradient[0] = gradient.get(0, 0) - maintenance / GDP_ARMY
+        metrics['maintenance_percent_sum'] = {'value':maintenance, 'gradient':gradient}
+
+        # Обеспеченность боеприпасами: запасы / потребность.
+        munitions = self.munition_matrix(wpn_columns)
+        needs = [0] * len(munitions['ammo_names'])
+        needs_gradient = [{} for ammo_name in munitions['ammo_names']]
+        for row, column, expense in zip(munitions['rows'], munitions['columns'], munitions['expenses']):
+            wpn_equipment = equipment[wpn_columns[row]]
+            # Меньше одного экземпляра не бывает, там производная нулевая:
+            if (wpn_equipment['value'] < 1):
+                needs[column] = needs[column] + expense
+            else:
+                needs[column] = needs[column] + expense * wpn_equipment['value']
+                add_gradient(needs_gradient[column], wpn_equipment['gradient'], expense)
+        wpn_stock = {}
+        for wpn_key in wpn_columns:
+            wpn_stock[metadict_wpn[wpn_key]['wpn_name']] = equipment[wpn_key]
+        for column, ammo_name in sorted(enumerate(munitions['ammo_names']), key=lambda item: item[1]):
+            if (ammo_name not in wpn_stock or needs[column] == 0):
+                metrics['ammunition_coverage: ' + ammo_name] = {'value':1, 'gradient':{}}
+                continue
+            stock = wpn_stock[ammo_name]
+            gradient = {}
+            add_gradient(gradient, stock['gradient'], 1 / needs[column])
+            add_gradient(gradient, needs_gradient[column], -stock['value'] / needs[column] ** 2)
+            metrics['ammunition_coverage: ' + ammo_name] = {
+                    'value':stock['value'] / needs[column],
+                    'gradient':gradient,
+                    }
+
+        sensitivity = {
+                'parameters':parameters,
+                'metrics':metrics,
+                }
+        return sensitivity
+
+    #---------------------------------------------------------------------
+    # Обратная задача: бюджет под нужные запасы.
+
+    def stock_per_budget(self, wpn_columns):
+        """Запасы оружия на единицу доли бюджета (wpn_budget = 1), без округлений.
+
+        Запасы линейны по бюджету: выпуск каждого года — ВВП * GDP_ARMY
+        * wpn_budget / wpn_cost, а доля уцелевших от бюджета не зависит.
+        """
+        GDP = [self.GDP_size(age) for age in range(self.AGE_END + 1)]
+        stock_units = []
+        for wpn_key, law in zip(wpn_columns, self.wpn_laws(wpn_columns)):
+            dict_wpn = self.metadict_wpn[wpn_key]
+            table = survival_table(law, self.AGE_END)
+            unit = 0
+            for age in range(min(self.AGE_END + 1, len(table) - 1)):
+                unit = unit + GDP[age] * table[age + 1]
+            stock_units.append(unit * self.GDP_ARMY / dict_wpn['wpn_cost'])
+        return stock_units
+
+    def linear_response(self, wpn_columns):
+        """Отклик запасов оружия: сколько их на единицу ВВП * GDP_ARMY * wpn_budget / wpn_cost.
+
+        Без промежуточных округлений запасы оружия — это
+        GDP_RATE * POPULATION * GDP_ARMY * wpn_budget / wpn_cost * отклик,
+        а отклик — сумма по возрастам роста ВВП на душу, роста населения
+        и доли уцелевших. Он зависит только от закона потерь оружия,
+        AGE_END и темпов роста, поэтому считается один раз на перебор
+        бюджетов, ВВП и населения (смотри linear_sweep).
+        """
+        AGE_END = self.AGE_END
+        # Степени считаются питоном, как в population_size() и GDP_size():
+        growth = [((self.GDP_GROWTH + 1) ** (self.year_shift - year))
+                * ((self.FERTILITY_RATE - self.MORTALITY_RATE + 1) ** (self.year_shift - year))
+                for year in range(AGE_END + 1)]
+        wpn_law_keys = self.wpn_laws(wpn_columns)
+        if self.numpy_backend():
+            return numpy.dot(numpy.array(growth), self.wpn_survival_matrix(wpn_columns)).tolist()
+        responses = {}
+        for key in wpn_law_keys:
+            if key not in responses:
+                table = survival_table(key, AGE_END)
+                responses[key] = sum(growth[age] * table[age + 1]
+                        for age in range(min(AGE_END + 1, len(table) - 1)))
+        return [responses[key] for key in wpn_law_keys]
+
+    def solve_budgets(self, targets=None, coverage=1):
+        """Доли бюджета (wpn_budget), дающие нужные запасы, все сразу.
+
+        targets — словарь: название оружия -> нужные запасы на складах.
+        coverage — нужная обеспеченность боеприпасами (1 — это 100%),
+        словарь боеприпас -> обеспеченность, или None, чтобы боеприпасы
+        не трогать. Бюджет подбирается оружию, чьё название совпадает
+        с названием боеприпаса. Потребность в боеприпасах сама зависит
+        от запасов оружия (ракеты возят на ракетоносцах), поэтому
+        запасы уточняются по цепочкам, пока не перестанут меняться.
+
+        Возвращает словарь: 'wpn_budget' — новые доли бюджета по ключам
+        оружия, 'scenario' — сценарий с ними, 'budget_percent' — общая
+        доля бюджета до и после.
+        """
+        metadict_wpn = self.metadict_wpn
+        wpn_columns = sorted(metadict_wpn.keys())
+        wpn_names = self.wpn_values(wpn_columns, 'wpn_name')
+        wpn_budget = self.wpn_values(wpn_columns, 'wpn_budget')
+        stock_units = self.stock_per_budget(wpn_columns)
+        # Запасы оружия, бюджет которого не меняется, берутся из полного
+        # расчёта: у малых серий округление выпуска по годам заметно.
+        equipment = self.compute()['equipment']
+        stock = self.equipment_sum(equipment['equipment_alive_matrix'])
+        # Номер столбца по названию (при повторах — последний, как в dict_equipment_all):
+        wpn_numbers = dict((name, column) for column, name in enumerate(wpn_names))
+        targets = dict(targets or {})
+        for wpn_name in targets:
+            if wpn_name not in wpn_numbers:
+                raise KeyError('Нет такого оружия: ' + str(wpn_name))
+        munitions = self.munition_matrix(wpn_columns)
+        ammo_coverage = {}
+        if coverage is not None:
+            for ammo_name in munitions['ammo_names']:
+                if (ammo_name in wpn_numbers and ammo_name not in targets):
+                    ammo_coverage[ammo_name] = coverage.get(ammo_name) \
+                            if isinstance(coverage, dict) else coverage
+            ammo_coverage = dict((key, value) for key, value in ammo_coverage.items()
+                    if value is not None)
+        solved = set(wpn_numbers[name] for name in targets) | \
+                set(wpn_numbers[name] for name in ammo_coverage)
+
+        # Запасы подбираются итерациями: цепочка боеприпасов не длиннее
+        # числа боеприпасов, поэтому итераций нужно не больше.
+        for column in solved:
+            stock[column] = wpn_budget[column] * stock_units[column]
+        for wpn_name, target in targets.items():
+            stock[wpn_numbers[wpn_name]] = target
+        for iteration in range(len(munitions['ammo_names']) + 1):
+            needs = [0] * len(munitions['ammo_names'])
+            for row, column, expense in zip(munitions['rows'], munitions['columns'],
+                    munitions['expenses']):
+                needs[column] = needs[column] + expense * max(stock[row], 1)
+            stock_changed = False
+            for column, ammo_name in enumerate(munitions['ammo_names']):
+                if ammo_name not in ammo_coverage:
+                    continue
+                stock_new = ammo_coverage[ammo_name] * needs[column]
+                if (stock[wpn_numbers[ammo_name]] != stock_new):
+                    stock_changed = True
+                stock[wpn_numbers[ammo_name]] = stock_new
+            if not stock_changed:
+                break
+
+        budgets_new = {}
+        for column in sorted(solved):
+            budgets_new[wpn_columns[column]] = stock[column] / stock_units[column] \
+                    if stock_units[column] else 0
+        # Полный расчёт с округлениями немного отличается от линейного,
+        # бюджеты поправляются по тому, что получилось:
+        for solve_pass in range(SOLVE_PASSES + 1):
+            metadict_wpn_new = dict(metadict_wpn)
+            for wpn_key, budget in budgets_new.items():
+                dict_wpn = dict(metadict_wpn[wpn_key])
+                dict_wpn['wpn_budget'] = budget
+                metadict_wpn_new[wpn_key] = dict_wpn
+            scenario_new = self.replace(metadict_wpn=metadict_wpn_new)
+            if (solve_pass == SOLVE_PASSES):
+                break
+            results = scenario_new.compute()
+            dict_equipment_all = results['equipment']['dict_equipment_all']
+            ammunition_coverage = results['economy']['ammunition_coverage']
+            for column in sorted(solved):
+                wpn_name = wpn_names[column]
+                if wpn_name in targets:
+                    target, result = targets[wpn_name], dict_equipment_all[wpn_name]
+                else:
+                    target, result = ammo_coverage[wpn_name], ammunition_coverage[wpn_name]
+                if (result > 0):
+                    budgets_new[wpn_columns[column]] = budgets_new[wpn_columns[column]] * target / result
+        budget_new = [budgets_new.get(wpn_key, budget) for wpn_key, budget in zip(wpn_columns, wpn_budget)]
+        solution = {
+                'wpn_budget':budgets_new,
+                'targets':targets,
+                'coverage':ammo_coverage,
+                'scenario':scenario_new,
+                'budget_percent':(sum(wpn_budget), sum(budget_new)),
+                }
+        return solution
+
+    #---------------------------------------------------------------------
+    # Оптимизация: распределение бюджета по всему каталогу оружия.
+
+    def optimize_budgets(self, objective='capability', weights=None, ratios=None,
+            coverage=1, budget_limit=1, iterations=None):
+        """Доли бюджета оружия (wpn_budget), лучшие по заданной цели.
+
+        Бюджеты боеприпасов не подбираются отдельно: их даёт обратный
+        расчёт (solve_budgets) под обеспеченность coverage. Ограничения:
+        закупки и обслуживание вместе — не больше budget_limit бюджета
+        армии, а расходы каждого вида войск — не больше его доли
+        в dict_troops_types. Цели:
+        'capability' — сумма weights[название] * ln(запасы), по умолчанию
+            веса единичные (убывающая польза от каждой новой машины);
+        'ratio' — сумма квадратов ln(запасы / нужные запасы), где нужные
+            запасы — солдаты вида войск на ratios[название] солдат
+            на машину; у прочего оружия нужные запасы — нынешние.
+
+        Расчёт идёт по линейной модели: запасы линейны по бюджету,
+        боеприпасы линейны по запасам оружия. Задача решается через
+        двойственную: для цен ограничений бюджет каждого оружия
+        находится сразу, цены уточняются градиентным спуском.
+        Возвращает словарь как у solve_budgets и значения цели.
+        """
+        if iterations is None:
+            iterations = OPTIMIZE_ITERATIONS
+        if objective not in ('capability', 'ratio'):
+            raise ValueError('Неизвестная цель: ' + str(objective))
+        metadict_wpn = self.metadict_wpn
+        dict_troops_types = self.dict_troops_types
+        wpn_columns = sorted(metadict_wpn.keys())
+        wpn_names = self.wpn_values(wpn_columns, 'wpn_name')
+        wpn_troops = self.wpn_values(wpn_columns, 'wpn_troops_type')
+        wpn_budget = self.wpn_values(wpn_columns, 'wpn_budget')
+        stock_units = self.stock_per_budget(wpn_columns)
+        # Обслуживание на единицу бюджета, доля бюджета армии:
+        GDP_army = self.GDP_size(0) * self.GDP_ARMY
+        maintenance_units = [metadict_wpn[wpn_key]['wpn_cost'] * metadict_wpn[wpn_key].get('wpn_maintenance', 0) \
+                * unit / GDP_army for wpn_key, unit in zip(wpn_columns, stock_units)]
+
+        # Оружие-боеприпасы (запасы для ammunition_needs) и боевое оружие:
+        munitions = self.munition_matrix(wpn_columns)
+        wpn_numbers = dict((name, column) for column, name in enumerate(wpn_names))
+        supply = set(wpn_numbers[name] for name in munitions['ammo_names'] if name in wpn_numbers)
+        combat = [column for column in range(len(wpn_columns))
+                if column not in supply and stock_units[column] > 0]
+        wpn_ammo = [[] for column in wpn_columns]
+        for row, column, expense in zip(munitions['rows'], munitions['columns'], munitions['expenses']):
+            wpn_ammo[row].append((column, expense))
+
+        # Расходы видов войск на единицу бюджета боевого оружия:
+        # само оружие, его обслуживание и боеприпасы по цепочкам.
+        troops_keys = sorted(dict_troops_types.keys())
+        constraints = [budget_limit] + [dict_troops_types[troop_key] * budget_limit
+                for troop_key in troops_keys]
+        costs = []
+        for column in combat:
+            stock = {column:stock_units[column]}
+            for iteration in range(len(munitions['ammo_names']) + 1):
+                needs = {}
+                for row, row_stock in stock.items():
+                    for ammo_column, expense in wpn_ammo[row]:
+                        needs[ammo_column] = needs.get(ammo_column, 0) + expense * row_stock
+                stock_new = {column:stock_units[column]}
+                for ammo_column, ammo_needs in needs.items():
+                    ammo_name = munitions['ammo_names'][ammo_column]
+                    if ammo_name in wpn_numbers:
+                        row = wpn_numbers[ammo_name]
+                        stock_new[row] = stock_new.get(row, 0) + coverage * ammo_needs
+                if (stock_new == stock):
+                    break
+                stock = stock_new
+            cost = [0] * len(constraints)
+            for row, row_stock in stock.items():
+                row_cost = row_stock / stock_units[row] + maintenance_units[row] * row_stock / stock_units[row] \
+                        if stock_units[row] else 0
+                cost[0] = cost[0] + row_cost
+                if wpn_troops[row] in dict_troops_types:
+                    number = troops_keys.index(wpn_troops[row]) + 1
+                    cost[number] = cost[number] + row_cost
+            costs.append(cost)
+
+        # Цель и её оптимум при ценах ограничений (бюджет — для каждого оружия сразу):
+        weights = weights or {}
+        ratios = ratios or {}
+        if (objective == 'ratio'):
+            population_alive, army_soldiers, army_reservists = self.army_summary(self.cohort_table()[0])
+            targets = []
+            for column in combat:
+                if wpn_names[column] in ratios:
+                    targets.append(max(army_soldiers * dict_troops_types.get(wpn_troops[column], 0) \
+                            / ratios[wpn_names[column]], 1))
+                else:
+                    targets.append(max(wpn_budget[column] * stock_units[column], 1))
+        wpn_weights = [weights.get(wpn_names[column], 1) for column in combat]
+
+        def objective_value(budgets):
+            value = 0
+            for number, column in enumerate(combat):
+                stock = max(budgets[number] * stock_units[column], 1e-300)
+                if (objective == 'capability'):
+                    value = value + wpn_weights[number] * math.log(stock)
+                else:
+                    value = value - math.log(stock / targets[number]) ** 2
+            return value
+
+        def budgets_for_prices(prices):
+            budgets = []
+            for number, column in enumerate(combat):
+                price = max(sum(price * cost for price, cost in zip(prices, costs[number])), 1e-300)
+                if (objective == 'capability'):
+                    budgets.append(wpn_weights[number] / price)
+                    continue
+                # Максимум -(y + L)^2 - цена * e^y по y = ln(бюджета), методом Ньютона:
+                shift = math.log(stock_units[column] / targets[number])
+                y = -shift
+                for step in range(50):
+                    exp_y = math.exp(min(y, 700))
+                    y_new = y - (2 * (y + shift) + price * exp_y) / (2 + price * exp_y)
+                    if (abs(y_new - y) < 1e-12):
+                        break
+                    y = y_new
+                budgets.append(math.exp(min(y, 700)))
+            return budgets
+
+        def spending(budgets):
+            return [sum(budget * cost[number] for budget, cost in zip(budgets, costs))
+                    for number in range(len(constraints))]
+
+        # Двойственный спуск: цены растут у нарушенных ограничений.
+        if (objective == 'capability'):
+            price_scale = sum(wpn_weights) / budget_limit
+        else:
+            price_scale = len(combat) / budget_limit
+        prices = [price_scale] + [0] * len(troops_keys)
+        budgets_best = None
+        value_best = None
+        for iteration in range(iterations):
+            budgets = budgets_for_prices(prices)
+            spent = spending(budgets)
+            # Допустимое решение — то же, сжатое под самое жёсткое ограничение:
+            scale = min([1] + [limit / value for limit, value in zip(constraints, spent) if value > 0])
+            budgets_feasible = [budget * scale for budget in budgets]
+            value = objective_value(budgets_feasible)
+            if (value_best is None or value > value_best):
+                value_best = value
+                budgets_best = budgets_feasible
+            step = 1 / math.sqrt(iteration + 1)
+            prices = [max(0, price + price_scale * step * (value / limit - 1))
+                    for price, value, limit in zip(prices, spent, constraints)]
+            prices[0] = max(prices[0], price_scale * 1e-9)
+
+        # Бюджеты боеприпасов — точным обратным расчётом. Округления по годам
+        # могут чуть сдвинуть итог, тогда боевое оружие пропорционально сжимается.
+        scenario_new = self
+        for attempt in range(OPTIMIZE_ATTEMPTS):
+            metadict_wpn_new = dict(metadict_wpn)
+            for budget, column in zip(budgets_best or [], combat):
+                dict_wpn = dict(metadict_wpn[wpn_columns[column]])
+                dict_wpn['wpn_budget'] = budget
+                metadict_wpn_new[wpn_columns[column]] = dict_wpn
+            solution = self.replace(metadict_wpn=metadict_wpn_new).solve_budgets(coverage=coverage)
+            scenario_new = solution['scenario']
+            economy = scenario_new.compute()['economy']
+            spent = [economy['budget_percent'] + economy['maintenance_percent_sum']]
+            for troop_key in troops_keys:
+                spent.append(economy['budget_troops_types'][troop_key] / 100 \
+                        + economy['maintenance_percent_troops_types'][troop_key])
+            scale = min([1] + [limit / value for limit, value in zip(constraints, spent) if value > 0])
+            if (scale >= 1 or not budgets_best):
+                break
+            budgets_best = [budget * scale for budget in budgets_best]
+
+        budgets_new = {}
+        for wpn_key in wpn_columns:
+            budgets_new[wpn_key] = scenario_new.metadict_wpn[wpn_key]['wpn_budget']
+        economy_old = self.compute()['economy']
+        solution = {
+                'wpn_budget':budgets_new,
+                'scenario':scenario_new,
+                'objective':(objective_value([wpn_budget[column] for column in combat]),
+                    objective_value(budgets_best or [])),
+                'budget_percent':(economy_old['budget_percent'], economy['budget_percent']),
+                'maintenance_percent_sum':(economy_old['maintenance_percent_sum'],
+                    economy['maintenance_percent_sum']),
+                'budget_troops_types':(economy_old['budget_troops_types'], economy['budget_troops_types']),
+                'maintenance_percent_troops_types':(economy_old['maintenance_percent_troops_types'],
+                    economy['maintenance_percent_troops_types']),
+                }
+        return solution
+
+    #---------------------------------------------------------------------
+    # Калибровка демографии под нужные итоги.
+
+    def calibration_values(self, points, parameters, age_groups=()):
+        """Итоги демографии для многих наборов параметров сразу, массивы NumPy.
+
+        points — наборы значений опций parameters (строка — набор).
+        Все наборы считаются вместе, одними операциями над массивами
+        (набор × возраст), без округлений и без таблиц survival_table().
+        Итоги: population_alive, army_soldiers, life_expectancy (сумма
+        долей доживших до каждого возраста, до CALIBRATION_AGE_MAX)
+        и доли возрастов age_groups ('0-14' — доля живых от 0 до 14 лет).
+        Возвращает словарь: итог -> массив по наборам.
+        """
+        AGE_END = self.AGE_END
+        age_max = max(AGE_END, CALIBRATION_AGE_MAX)
+        app = self.prof_age_apprentice
+        points = numpy.array(points, dtype=float).reshape(-1, len(parameters))
+        options = {}
+        for key in CALIBRATION_PARAMETERS:
+            if key in parameters:
+                options[key] = points[:, list(parameters).index(key), numpy.newaxis]
+            else:
+                options[key] = numpy.full((len(points), 1), float(self.options[key]))
+        b = options['COEFFICIENT_B']
+        c = options['COEFFICIENT_C']
+        # Шаги таблицы выживаемости, возрасту x соответствует шаг x + 1:
+        steps = numpy.arange(age_max + 2)
+        with numpy.errstate(all='ignore'):
+            if self.MORTALITY_LAW is None:
+                chance_of_dying = numpy.minimum(options['COMPONENT_A'] + b * c ** steps, 1)
+                survival = numpy.cumprod(1 - numpy.nan_to_num(chance_of_dying, nan=1), axis=1)[:, 1:]
+            else:
+                survival = survival_column(self.population_law(), age_max)[numpy.newaxis, :]
+            if self.prof_law is None:
+                chance_of_dying = numpy.minimum(self.prof_hazard + b * c ** steps, 1)
+                prof_survival = numpy.cumprod(1 - numpy.nan_to_num(chance_of_dying, nan=1), axis=1)[:, 1:]
+            else:
+                prof_survival = survival_column(self.profession_law(), age_max)[numpy.newaxis, :]
+            fert = options['FERTILITY_RATE']
+            growth = (fert - options['MORTALITY_RATE'] + 1) ** (self.year_shift - numpy.arange(AGE_END + 1))
+            alive = self.POPULATION * growth * fert * survival[:, :AGE_END + 1]
+            population_alive = alive.sum(axis=1)
+        # Профессия — доля живых от возраста призыва до перехода в резервисты:
+        prof_share = 0
+        if (self.prof_male_switch != 0):
+            prof_share = prof_share + self.MALE_PERCENT
+        if (self.prof_female_switch != 0):
+            prof_share = prof_share + self.FEMALE_PERCENT
+        apprentice_end = min(self.prof_age_expert, AGE_END + 1)
+        army_soldiers = numpy.zeros(len(points))
+        if (app < apprentice_end):
+            army_soldiers = (alive[:, app:apprentice_end] * prof_share * self.prof_percent
+                    * prof_survival[:, :apprentice_end - app]).sum(axis=1)
+        values = {
+                'population_alive':population_alive,
+                'army_soldiers':army_soldiers,
+                'life_expectancy':numpy.broadcast_to(survival.sum(axis=1), (len(points),)),
+                }
+        for age_group in age_groups:
+            age_from, age_to = calibration_age_group(age_group)
+            with numpy.errstate(all='ignore'):
+                values[age_group] = alive[:, age_from:age_to + 1].sum(axis=1) / population_alive
+        return values
+
+    def calibrate(self, targets, parameters=None, iterations=None):
+        """Опции демографии, при которых итоги ближе всего к targets.
+
+        targets — словарь: итог -> нужное значение. Итоги —
+        CALIBRATION_TARGETS и доли возрастов, например
+        {'population_alive':120000000, 'life_expectancy':70, '0-14':0.25}.
+        parameters — подбираемые опции из CALIBRATION_PARAMETERS
+        (по умолчанию все; с MORTALITY_LAW только рост населения).
+        Цель — сумма квадратов относительных отклонений итогов
+        (у долей возрастов — абсолютных) и малый штраф CALIBRATION_PRIOR
+        за уход от исходных опций. Опции подбираются методом
+        Нелдера-Мида в логарифмах (значение минус нижняя граница
+        из CALIBRATION_LOWER), итоги считает calibration_values().
+        Возвращает новые опции, сценарий с ними и итоги до и после.
+        """
+        if numpy is None:
+            raise ImportError('Для калибровки нужен NumPy')
+        if iterations is None:
+            iterations = CALIBRATION_ITERATIONS
+        if parameters is None:
+            parameters = [key for key in CALIBRATION_PARAMETERS if self.MORTALITY_LAW is None
+                    or key in ('FERTILITY_RATE', 'MORTALITY_RATE')]
+        parameters = list(parameters)
+        for key in parameters:
+            if key not in CALIBRATION_PARAMETERS:
+                raise ValueError('Опция не калибруется: ' + str(key))
+            if (self.MORTALITY_LAW is not None and key not in ('FERTILITY_RATE', 'MORTALITY_RATE')):
+                raise ValueError('С MORTALITY_LAW опция не влияет на смертность: ' + str(key))
+        age_groups = [name for name in targets if name not in CALIBRATION_TARGETS]
+        for age_group in age_groups:
+            calibration_age_group(age_group)
+        names = sorted(targets)
+        target_values = numpy.array([float(targets[name]) for name in names])
+        # Относительные отклонения, у долей возрастов — абсолютные:
+        target_scales = numpy.array([(abs(float(targets[name])) or 1) if name in CALIBRATION_TARGETS else 1
+            for name in names])
+        lower = numpy.array([CALIBRATION_LOWER.get(key, 0) for key in parameters], dtype=float)
+        start = numpy.log(numpy.maximum(
+            numpy.array([self.options[key] for key in parameters], dtype=float) - lower, 1e-12))
+
+        def point_values(points):
+            values = self.calibration_values(lower + numpy.exp(points), parameters, age_groups)
+            return numpy.array([values[name] for name in names]).T
+
+        def objective(points):
+            points = numpy.array(points, dtype=float)
+            with numpy.errstate(all='ignore'):
+                deviations = (point_values(points) - target_values) / target_scales
+                losses = (deviations ** 2).sum(axis=1) + \
+                        CALIBRATION_PRIOR * ((points - start) ** 2).sum(axis=1)
+            return numpy.where(numpy.isfinite(losses), losses, numpy.inf).tolist()
+
+        point = start.tolist()
+        loss = objective([point])[0]
+        iterations_all = 0
+        evaluations_all = 1
+        # Перезапуски с нового симплекса вокруг лучшей точки:
+        for restart in range(CALIBRATION_RESTARTS + 1):
+            point_new, loss_new, iterations_done, evaluations = nelder_mead(objective, point,
+                    iterations=iterations)
+            iterations_all = iterations_all + iterations_done
+            evaluations_all = evaluations_all + evaluations
+            improved = (loss - loss_new > CALIBRATION_TOLERANCE)
+            if (loss_new < loss):
+                point, loss = point_new, loss_new
+            if not improved:
+                break
+
+        options_new = dict(zip(parameters, (lower + numpy.exp(point)).tolist()))
+        values_old = point_values(start[numpy.newaxis, :])[0].tolist()
+        values_new = point_values(numpy.array([point]))[0].tolist()
+        calibration = {
+                'options':options_new,
+                'scenario':self.replace(options_new),
+                'targets':dict(targets),
+                'values':dict((name, (value_old, value_new))
+                    for name, value_old, value_new in zip(names, values_old, values_new)),
+                'loss':loss,
+                'iterations':iterations_all,
+                'evaluations':evaluations_all,
+                }
+        return calibration
+
+
+#-------------------------------------------------------------------------
+# Пересчёт по изменениям: правим одно оружие — считаем только его.
+
+class IncrementalScenario(object):
+    """Сценарий, который пересчитывает только то, что изменилось.
+
+    Расчёт разбит на этапы, каждый зависит от предыдущих:
+    поколения и профессии -> столбцы оружия (создано/уцелело)
+    -> оружие на складах -> потребность в боеприпасах
+    -> бюджет и обслуживание по видам войск.
+    Правка одного оружия (set_wpn) пересчитывает его столбец,
+    потребность в его боеприпасах и итоги его вида войск.
+    Правка опций пересчитывает всё, кроме поколений, если поменялась
+    только доля армии в ВВП (GDP_ARMY).
+
+    Результаты совпадают с Scenario.compute() того же сценария.
+    """
+
+    def __init__(self, scenario):
+        metadict_wpn = {}
+        for wpn_key in scenario.metadict_wpn:
+            metadict_wpn[wpn_key] = dict(scenario.metadict_wpn[wpn_key])
+        self.scenario = scenario.replace(metadict_wpn=metadict_wpn)
+        # Этапы расчёта, None — этап нужно пересчитать:
+        self._cohorts = None
+        self._wpn_stages = {}
+        self._economy = None
+        # Оружие, изменённое после последнего расчёта:
+        self._wpn_dirty = set(metadict_wpn)
+        # Старые названия, виды войск и боеприпасы изменённого оружия:
+        self._wpn_changed = []
+
+    def set_options(self, overrides=None, **options):
+        """Замена опций (и видов войск), как в Scenario.replace()."""
+        options_all = dict(overrides or {})
+        options_all.update(options)
+        if 'metadict_wpn' in options_all:
+            raise KeyError('Оружие меняется через set_wpn()')
+        scenario_old = self.scenario
+        self.scenario = self.scenario.replace(options_all)
+        options_changed = set(key for key in scenario_old.options
+                if scenario_old.options[key] != self.scenario.options[key])
+        if (options_changed - {'GDP_ARMY'}):
+            self._cohorts = None
+        if options_changed:
+            self._wpn_dirty.update(self.scenario.metadict_wpn)
+        self._economy = None
+
+    def set_wpn(self, wpn_key, dict_wpn=None, **fields):
+        """Новое оружие или правка старого.
+
+        dict_wpn — словарь оружия целиком, fields — отдельные строки,
+        например: set_wpn(0, wpn_budget=0.01)
+        """
+        metadict_wpn = self.scenario.metadict_wpn
+        if dict_wpn is None:
+            dict_wpn = metadict_wpn[wpn_key]
+        dict_wpn = dict(dict_wpn)
+        dict_wpn.update(fields)
+        self._wpn_touch(wpn_key)
+        metadict_wpn[wpn_key] = dict_wpn
+
+    def remove_wpn(self, wpn_key):
+        """Удаление оружия из базы данных."""
+        self._wpn_touch(wpn_key)
+        del self.scenario.metadict_wpn[wpn_key]
+
+    def _wpn_touch(self, wpn_key):
+        self._wpn_dirty.add(wpn_key)
+        wpn_stage = self._wpn_stages.pop(wpn_key, None)
+        if wpn_stage is not None:
+            self._wpn_changed.append(wpn_stage)
+
+    #---------------------------------------------------------------------
+    # Этапы расчёта.
+
+    def _update_cohorts(self):
+        """Поколения, профессии и итоги по армии."""
+        scenario = self.scenario
+        metadict, metadict_columns = scenario.cohort_table()
+        self._cohorts = {
+                'metadict':metadict,
+                'metadict_columns':metadict_columns,
+                'army':scenario.army_summary(metadict),
+                }
+        # Столбцы оружия зависят от ВВП по годам, их тоже заново:
+        self._wpn_dirty.update(scenario.metadict_wpn)
+        self._economy = None
+
+    def _update_wpn(self, wpn_key):
+        """Столбцы одного оружия: создано и уцелело по возрастам."""
+        dict_wpn = self.scenario.metadict_wpn[wpn_key]
+        scenario_wpn = self.scenario.replace(metadict_wpn={wpn_key:dict_wpn})
+        equipment_create, equipment_alive = scenario_wpn.equipment_matrices([wpn_key],
+                self._cohorts['metadict'], self._cohorts['metadict_columns'])
+        if scenario_wpn.numpy_backend():
+            column_create = equipment_create[:, 0]
+            column_alive = equipment_alive[:, 0]
+        else:
+            column_create = [row[0] for row in equipment_create]
+            column_alive = [row[0] for row in equipment_alive]
+        self._wpn_stages[wpn_key] = {
+                'create':column_create,
+                'alive':column_alive,
+                'equipment_all':scenario_wpn.equipment_sum(equipment_alive)[0],
+                'wpn_name':dict_wpn['wpn_name'],
+                'wpn_troops_type':dict_wpn['wpn_troops_type'],
+                'munitions':[munition['name'] for munition in wpn_munitions(dict_wpn)],
+                }
+
+    def _update_economy(self, wpn_changed):
+        """Склады, боеприпасы, бюджет и обслуживание.
+
+        Если поменялось несколько видов оружия, пересчитываются
+        только их боеприпасы и виды войск, остальное берётся готовым.
+        """
+        scenario = self.scenario
+        metadict_wpn = scenario.metadict_wpn
+        wpn_columns = sorted(metadict_wpn.keys())
+        dict_equipment_all = {}
+        for wpn_key in wpn_columns:
+            dict_equipment_all[self._wpn_stages[wpn_key]['wpn_name']] = \
+                    self._wpn_stages[wpn_key]['equipment_all']
+        if self._economy is None:
+            self._economy = scenario.economy_summary(dict_equipment_all)
+            return
+        economy = self._economy
+        # Что задето изменениями: боеприпасы, названия и виды войск.
+        ammo_changed = set()
+        names_changed = set()
+        troops_changed = set()
+        for wpn_stage in wpn_changed:
+            ammo_changed.update(wpn_stage['munitions'])
+            names_changed.add(wpn_stage['wpn_name'])
+            troops_changed.add(wpn_stage['wpn_troops_type'])
+        for wpn_key in wpn_columns:
+            if self._wpn_stages[wpn_key]['wpn_name'] in names_changed:
+                troops_changed.add(self._wpn_stages[wpn_key]['wpn_troops_type'])
+
+        # Оружие на складах, но не меньше одного экземпляра:
+        equipment_all_dict = {}
+        for wpn_key in wpn_columns:
+            equipment_all_dict[wpn_key] = max(self._wpn_stages[wpn_key]['equipment_all'], 1)
+
+        # Потребность в боеприпасах, только для задетых:
+        wpn_ammo = [wpn_key for wpn_key in wpn_columns
+                if ammo_changed.intersection(self._wpn_stages[wpn_key]['munitions'])]
+        munitions = scenario.munition_matrix(wpn_ammo)
+        needs_changed = scenario.ammunition_needs(munitions,
+                [equipment_all_dict[wpn_key] for wpn_key in wpn_ammo])
+        ammunition_needs = dict(economy['ammunition_needs'])
+        for ammo_key in ammo_changed:
+            ammunition_needs.pop(ammo_key, None)
+            if ammo_key in needs_changed:
+                ammunition_needs[ammo_key] = needs_changed[ammo_key]
+
+        # Бюджет и обслуживание, только для задетых видов войск:
+        budget_percent = 0
+        budget_troops_types = dict(economy['budget_troops_types'])
+        maintenance_troops_types = dict(economy['maintenance_troops_types'])
+        for troop_key in troops_changed:
+            if troop_key in budget_troops_types:
+                budget_troops_types[troop_key] = 0
+                maintenance_troops_types[troop_key] = 0
+        for wpn_key in wpn_columns:
+            dict_wpn = metadict_wpn[wpn_key]
+            budget_percent = budget_percent + dict_wpn['wpn_budget']
+            troop_key = dict_wpn['wpn_troops_type']
+            if (troop_key not in troops_changed or troop_key not in budget_troops_types):
+                continue
+            budget_troops_types[troop_key] = budget_troops_types[troop_key] + \
+                    dict_wpn['wpn_budget'] * 100
+            maintenance_troops_types[troop_key] = maintenance_troops_types[troop_key] + \
+                    dict_wpn['wpn_cost'] * dict_wpn.get('wpn_maintenance', 0) * \
+                    dict_equipment_all.get(dict_wpn['wpn_name'])
+
+        # Доли бюджета и обеспеченность — короткие циклы, считаются целиком:
+        maintenance_percent_sum = 0
+        maintenance_percent_troops_types = {}
+        for troop_key in sorted(maintenance_troops_types.keys()):
+            maintenance_percent = maintenance_troops_types[troop_key] / \
+                    (scenario.GDP_size(0) * scenario.GDP_ARMY)
+            maintenance_percent_sum = maintenance_percent_sum + maintenance_percent
+            maintenance_percent_troops_types[troop_key] = maintenance_percent
+        ammunition_coverage = {}
+        for ammo_key in sorted(ammunition_needs.keys()):
+            ammunition_coverage[ammo_key] = \
+                    dict_equipment_all.get(ammo_key, ammunition_needs[ammo_key]) / \
+                    ammunition_needs[ammo_key]
+
+        self._economy = {
+                'equipment_all':equipment_all_dict,
+                'ammunition_needs':ammunition_needs,
+                'ammunition_coverage':ammunition_coverage,
+                'budget_percent':budget_percent,
+                'budget_troops_types':budget_troops_types,
+                'maintenance_troops_types':maintenance_troops_types,
+                'maintenance_percent_troops_types':maintenance_percent_troops_types,
+                'maintenance_percent_sum':maintenance_percent_sum,
+                }
+
+    def update(self):
+        """Пересчёт изменившихся этапов."""
+        if self._cohorts is None:
+            self._update_cohorts()
+        wpn_changed = self._wpn_changed
+        for wpn_key in sorted(self._wpn_dirty):
+            if wpn_key in self.scenario.metadict_wpn:
+                self._update_wpn(wpn_key)
+                wpn_changed.append(self._wpn_stages[wpn_key])
+        if (wpn_changed or self._economy is None):
+            self._update_economy(wpn_changed)
+        self._wpn_dirty = set()
+        self._wpn_changed = []
+
+    #---------------------------------------------------------------------
+    # Результаты.
+
+    def summary(self):
+        """Итоги, как Scenario.summary(), без сборки матриц оружия."""
+        self.update()
+        population_alive, army_soldiers, army_reservists = self._cohorts['army']
+        summary = {
+                'population_alive':population_alive,
+                'army_soldiers':army_soldiers,
+                'army_reservists':army_reservists,
+                'budget_percent':self._economy['budget_percent'],
+                'maintenance_percent_sum':self._economy['maintenance_percent_sum'],
+                'ammunition_coverage':self._economy['ammunition_coverage'],
+                }
+        return summary
+
+    def compute(self):
+        """Все таблицы, как Scenario.compute(), из готовых этапов."""
+        self.update()
+        scenario = self.scenario
+        metadict = self._cohorts['metadict']
+        wpn_columns = sorted(scenario.metadict_wpn.keys())
+        columns_create = [self._wpn_stages[wpn_key]['create'] for wpn_key in wpn_columns]
+        columns_alive = [self._wpn_stages[wpn_key]['alive'] for wpn_key in wpn_columns]
+        if scenario.numpy_backend():
+            shape = (scenario.AGE_END + 1, 0)
+            equipment_create_matrix = numpy.column_stack(columns_create) \
+                    if columns_create else numpy.zeros(shape, dtype=numpy.int64)
+            equipment_alive_matrix = numpy.column_stack(columns_alive) \
+                    if columns_alive else numpy.zeros(shape, dtype=numpy.int64)
+        else:
+            equipment_create_matrix = [list(row) for row in zip(*columns_create)] \
+                    if columns_create else [[] for age in range(scenario.AGE_END + 1)]
+            equipment_alive_matrix = [list(row) for row in zip(*columns_alive)] \
+                    if columns_alive else [[] for age in range(scenario.AGE_END + 1)]
+        equipment = scenario.equipment_from_matrices(wpn_columns, metadict,
+                equipment_create_matrix, equipment_alive_matrix)
+        population_alive, army_soldiers, army_reservists = self._cohorts['army']
+        results = {
+                'metadict':metadict,
+                'metadict_columns':self._cohorts['metadict_columns'],
+                'equipment':equipment,
+                'population_alive':population_alive,
+                'army_soldiers':army_soldiers,
+                'army_reservists':army_reservists,
+                'economy':self._economy,
+                }
+        return results
+
+
+#-------------------------------------------------------------------------
+# Вывод результатов.
+
+class ReportWriter(object):
+    """Буферизованный вывод отчёта.
+
+    Строки копятся в памяти и уходят в поток (файл или stdout)
+    большими кусками, по buffer_size символов. Метод line() повторяет
+    print(): значения переводятся в строки и разделяются пробелом.
+    """
+
+    def __init__(self, stream=None, buffer_size=1 << 16):
+        self.stream = stream if stream is not None else sys.stdout
+        self.buffer_size = buffer_size
+        self._chunks = []
+        self._size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._size = self._size + len(text)
+        if (self._size >= self.buffer_size):
+            self.flush()
+
+    def line(self, *values, sep=' ', end='\n'):
+        self.write(sep.join([str(value) for value in values]) + end)
+
+    def flush(self):
+        if self._chunks:
+            self.stream.write(''.join(self._chunks))
+            self._chunks = []
+            self._size = 0
+        self.stream.flush()
+
+
+def report_years(writer, scenario, results):
+    """Вывод по годам: население, солдаты и вооружение.
+
+    Строки собираются прямо из столбцов таблицы поколений и матриц
+    оружия, в отчёт попадает только уцелевшее оружие.
+    """
+    metadict_columns = results['metadict_columns']
+    equipment = results['equipment']
+    wpn_columns = equipment['wpn_columns']
+    equipment_create_matrix = equipment['equipment_create_matrix']
+    equipment_alive_matrix = equipment['equipment_alive_matrix']
+    wpn_name_new = scenario.wpn_values(wpn_columns, 'wpn_name_new')
+    wpn_name_mid = scenario.wpn_values(wpn_columns, 'wpn_name_mid')
+    wpn_name_old = scenario.wpn_values(wpn_columns, 'wpn_name_old')
+    wpn_age_mid = scenario.wpn_values(wpn_columns, 'wpn_age_mid')
+    wpn_age_old = scenario.wpn_values(wpn_columns, 'wpn_age_old')
+    # Столбцы поколений списками, чтобы не трогать массивы поштучно:
+    columns = {}
+    for key in ('age_real', 'year_real', 'generation_size', 'generation_alive',
+            scenario.MALE_NAME, scenario.FEMALE_NAME, scenario.prof_name_apprentice,
+            scenario.prof_name_expert, scenario.prof_name_retiree):
+        column = metadict_columns[key]
+        columns[key] = column.tolist() if hasattr(column, 'tolist') else column
+    line_wpn = '%s (Создано: %d) Уцелело: %d\n'
+    # Не моложе age_alive_end оружия нет, эти строки матриц не просматриваются:
+    age_alive_end = equipment.get('age_alive_end', len(columns['age_real']))
+    # Матрицы — массивы NumPy или списки строк, смотря каким движком посчитаны:
+    matrix_numpy = (numpy is not None and isinstance(equipment_alive_matrix, numpy.ndarray))
+    for age in range(len(columns['age_real']) - 1, -1, -1):
+        age_real = columns['age_real'][age]
+        # Вывод данных о населении:
+        writer.line('Год:', columns['year_real'][age],
+                'Возраст:', age_real,
+                'Родившиеся:', columns['generation_size'][age],
+                'Живые:', columns['generation_alive'][age])
+        writer.line(scenario.MALE_NAME, columns[scenario.MALE_NAME][age],
+                scenario.FEMALE_NAME, columns[scenario.FEMALE_NAME][age])
+        # Вывод данных о солдатах:
+        if (scenario.prof_age_apprentice <= age_real < scenario.prof_age_expert):
+            writer.line(scenario.prof_name_apprentice, columns[scenario.prof_name_apprentice][age])
+        if (scenario.prof_age_expert <= age_real < scenario.prof_age_retiree):
+            writer.line(scenario.prof_name_expert, columns[scenario.prof_name_expert][age])
+        if (scenario.prof_age_retiree <= age_real):
+            writer.line(scenario.prof_name_retiree, columns[scenario.prof_name_retiree][age])
+        # Вывод данных о вооружении, только где число машинок не по нулям:
+        if (age >= age_alive_end):
+            wpn_nonzero = wpn_create = wpn_alive = []
+        elif matrix_numpy:
+            wpn_nonzero = numpy.flatnonzero(equipment_alive_matrix[age]).tolist()
+            wpn_create = equipment_create_matrix[age, wpn_nonzero].tolist()
+            wpn_alive = equipment_alive_matrix[age, wpn_nonzero].tolist()
+        else:
+            wpn_nonzero = [column for column, value in enumerate(equipment_alive_matrix[age])
+                    if value != 0]
+            wpn_create = [equipment_create_matrix[age][column] for column in wpn_nonzero]
+            wpn_alive = [equipment_alive_matrix[age][column] for column in wpn_nonzero]
+        for column, create, alive in zip(wpn_nonzero, wpn_create, wpn_alive):
+            if (age_real < wpn_age_mid[column]):
+                writer.write(line_wpn % (wpn_name_new[column], create, alive))
+            if (wpn_age_mid[column] <= age_real < wpn_age_old[column]):
+                writer.write(line_wpn % (wpn_name_mid[column], create, alive))
+            if (wpn_age_old[column] <= age_real):
+                writer.write(line_wpn % (wpn_name_old[column], create, alive))
+        writer.write('------------------------------------------------------------\n')
+
+
+def report_army(writer, scenario, population_alive, army_soldiers, army_reservists):
+    """Подведение итогов: популяция и армия по видам войск."""
+    dict_troops_types = scenario.dict_troops_types
+    writer.line('Ожидаемая численность:', scenario.POPULATION)
+    writer.line('Численность популяции:', population_alive)
+    writer.line(scenario.prof_name_apprentice, 'и', scenario.prof_name_expert, 'по видам войск:')
+    for troop_key in sorted(dict_troops_types.keys()):
+        writer.line('    ', troop_key, ' (', round(dict_troops_types[troop_key] * 100), '%) ',
+                round(army_soldiers * dict_troops_types[troop_key]),
+                ' — ', round((army_soldiers + army_reservists) * dict_troops_types[troop_key]), sep='')
+    writer.line('Несчастные случаи (в год):', round(scenario.POPULATION * scenario.COMPONENT_A))
+    writer.line('Военные потери: ', round(army_soldiers * scenario.prof_hazard),
+            ' (', round(army_soldiers * scenario.prof_hazard / (scenario.POPULATION * scenario.COMPONENT_A) * 100),
+            '% от несчастных случаев)', sep='')
+    writer.line('------------------------------------------------------------')
+
+
+def report_economy(writer, scenario, economy, dict_equipment_all, army_soldiers, army_reservists):
+    """Вывод вооружения, бюджета, обслуживания и запасов боеприпасов."""
+    metadict_wpn = scenario.metadict_wpn
+    dict_troops_types = scenario.dict_troops_types
+    prof_name_apprentice = scenario.prof_name_apprentice
+    prof_name_expert = scenario.prof_name_expert
+    GDP_army = scenario.GDP_size(0) * scenario.GDP_ARMY
+    wpn_columns = sorted(metadict_wpn.keys())
+    # Доли потерь по законам потерь оружия:
+    loss_rates = scenario.wpn_loss_rates(wpn_columns)
+    # Перебор столбцов в базе данных оружия:
+    for wpn_key, loss_rate in zip(wpn_columns, loss_rates):
+        dict_wpn = metadict_wpn[wpn_key]
+        equipment_all = economy['equipment_all'][wpn_key]
+        if (dict_equipment_all[dict_wpn['wpn_name']] < 1):
+            writer.line('Не хватает бюджета на', dict_wpn['wpn_name'])
+        # Вывод суммы оружия, сохранившегося за все годы:
+        writer.line(dict_wpn['wpn_troops_type'], dict_wpn['wpn_name'], '—' , equipment_all, end=' ')
+        # Вывод отношения числа вооружений к числу солдат определённых видов войск:
+        army_type_percent = dict_troops_types[dict_wpn['wpn_troops_type']]
+        writer.line('на', round(army_soldiers * army_type_percent / equipment_all),
+                prof_name_apprentice, dict_wpn['wpn_troops_type'],
+                'или на', round((army_reservists + army_soldiers) * army_type_percent / equipment_all),
+                prof_name_apprentice, '+',
+                prof_name_expert, dict_wpn['wpn_troops_type'])
+        # Вывод описания вооружения:
+        writer.line('    ', dict_wpn['wpn_name_comment'])
+        # Подсчитываем, сколько оружия создано за год:
+        wpn_create = round(GDP_army * dict_wpn['wpn_budget'] / dict_wpn['wpn_cost'])
+        # Расходы на проект:
+        writer.line('        Расходы: ',
+                round(dict_wpn['wpn_budget'] * 100, 3),'% бюджета ',
+                '(', dict_wpn['wpn_cost'] * wpn_create / (10 ** 9),
+                ' млрд ', dict_wpn['wpn_cost_currency'], ') ', sep='')
+        # Подсчитываем потери (без учёта старения оружия):
+        writer.line('        Создано:', wpn_create)
+        writer.line('        Потери:', round(wpn_create * loss_rate + \
+                equipment_all * loss_rate))
+        writer.line('        ---')
+
+    # Сумма бюджета всех проектов из базы данных оружия:
+    writer.line('Расходы военного бюджета на закупки и производство:')
+    for troop_key in sorted(economy['budget_troops_types'].keys()):
+        writer.line('    ', troop_key, ' (', round(dict_troops_types[troop_key] * 100), '%)',
+                ' — ', round(economy['budget_troops_types'][troop_key], 2), '%', sep='')
+    writer.line('Использовано ', round(economy['budget_percent'] * 100, 2), '% бюджета армии',
+            ' (или ', round(scenario.GDP_ARMY * economy['budget_percent'] * 100, 2), '% ВВП страны)',
+            sep='')
+    writer.line('        ---')
+
+    # Расходы на обслуживание оружия по видам войск:
+    writer.line('Расходы военного бюджета на техническое обслуживание:')
+    for troop_key in sorted(economy['maintenance_percent_troops_types'].keys()):
+        writer.line('    ', troop_key, ' (', round(dict_troops_types[troop_key] * 100), '%)',
+                ' — ', round(economy['maintenance_percent_troops_types'][troop_key] * 100, 2), '%', sep='')
+    writer.line('Использовано ', round(economy['maintenance_percent_sum'] * 100, 2), '% бюджета армии',
+            ' (или ', round(economy['maintenance_percent_sum'] * scenario.GDP_ARMY * 100, 2), '% ВВП страны)',
+            sep='')
+    writer.line('        ---')
+
+    # Соотношение производства боеприпасов и потребности в них:
+    writer.line('Боеприпасы на складах (на год войны):')
+    for ammo_key in sorted(economy['ammunition_needs'].keys()):
+        # (ammo_key, 0) — значит, если нет ключа, брать ноль.
+        writer.line('   ', ammo_key, ' — ', dict_equipment_all.get(ammo_key, 0), ' (',
+                round(economy['ammunition_coverage'][ammo_key] * 100), '%)', sep='')
+
+
+def print_report(scenario, results=None, stream=None, summary_only=False):
+    """Полный отчёт сценария, как его выводит скрипт.
+
+    stream — куда писать (по умолчанию stdout),
+    summary_only — пропустить вывод по годам, оставив только итоги.
+    """
+    if results is None:
+        results = scenario.compute()
+    equipment = results['equipment']
+    with ReportWriter(stream) as writer:
+        if not summary_only:
+            report_years(writer, scenario, results)
+        report_army(writer, scenario, results['population_alive'],
+                results['army_soldiers'], results['army_reservists'])
+        report_economy(writer, scenario, results['economy'], equipment['dict_equipment_all'],
+                results['army_soldiers'], results['army_reservists'])
+
+
+def print_forecast(forecast, stream=None):
+    """Прогноз по годам (Scenario.forecast) таблицей, через табуляцию."""
+    ammo_keys = sorted(set(ammo_key for dict_year in forecast
+        for ammo_key in dict_year['ammunition_coverage']))
+    with ReportWriter(stream) as writer:
+        writer.line('year_real', 'population_size', 'population_alive',
+                'army_soldiers', 'army_reservists', 'GDP_size',
+                'budget_percent', 'maintenance_percent_sum', 'ammunition_coverage_min',
+                *ammo_keys, sep='\t')
+        for dict_year in forecast:
+            coverage = dict_year['ammunition_coverage']
+            row = [
+                    dict_year['year_real'],
+                    dict_year['population_size'],
+                    dict_year['population_alive'],
+                    dict_year['army_soldiers'],
+                    dict_year['army_reservists'],
+                    dict_year['GDP_size'],
+                    round(dict_year['budget_percent'] * 100, 2),
+                    round(dict_year['maintenance_percent_sum'] * 100, 2),
+                    round(min(coverage.values()) * 100) if coverage else '',
+                    ]
+            row = row + [round(coverage[ammo_key] * 100) if ammo_key in coverage else ''
+                for ammo_key in ammo_keys]
+            writer.line(*row, sep='\t')
+
+
+def print_budget_solution(scenario, solution, stream=None):
+    """Новые доли бюджета и что получилось с ними в полном расчёте."""
+    scenario_new = solution['scenario']
+    results_new = scenario_new.compute()
+    dict_equipment_all = results_new['equipment']['dict_equipment_all']
+    ammunition_coverage = results_new['economy']['ammunition_coverage']
+    with ReportWriter(stream) as writer:
+        writer.line('wpn_name', 'wpn_budget', 'wpn_budget_new', 'target', 'result', sep='\t')
+        for wpn_key in sorted(solution['wpn_budget']):
+            wpn_name = scenario.metadict_wpn[wpn_key]['wpn_name']
+            if wpn_name in solution['targets']:
+                target = solution['targets'][wpn_name]
+                result = dict_equipment_all[wpn_name]
+            else:
+                target = str(round(solution['coverage'][wpn_name] * 100)) + '%'
+                result = str(round(ammunition_coverage[wpn_name] * 100)) + '%'
+            writer.line(wpn_name, scenario.metadict_wpn[wpn_key]['wpn_budget'],
+                    round(solution['wpn_budget'][wpn_key], 6), target, result, sep='\t')
+        budget_old, budget_new = solution['budget_percent']
+        writer.line('Использовано ', round(budget_old * 100, 2), '% бюджета армии, станет ',
+                round(budget_new * 100, 2), '% (или ',
+                round(scenario.GDP_ARMY * budget_new * 100, 2), '% ВВП страны)', sep='')
+
+
+def print_optimization(scenario, solution, stream=None):
+    """Бюджеты, подобранные optimize_budgets, и расходы по видам войск.
+
+    Расходы вида войск — закупки и обслуживание, в процентах бюджета
+    армии; рядом — предел из dict_troops_types.
+    """
+    scenario_new = solution['scenario']
+    dict_equipment_old = scenario.compute()['equipment']['dict_equipment_all']
+    dict_equipment_new = scenario_new.compute()['equipment']['dict_equipment_all']
+    with ReportWriter(stream) as writer:
+        writer.line('wpn_name', 'wpn_budget', 'wpn_budget_new', 'equipment_all', 'equipment_all_new', sep='\t')
+        for wpn_key in sorted(solution['wpn_budget']):
+            wpn_name = scenario.metadict_wpn[wpn_key]['wpn_name']
+            writer.line(wpn_name, scenario.metadict_wpn[wpn_key]['wpn_budget'],
+                    round(solution['wpn_budget'][wpn_key], 6),
+                    dict_equipment_old[wpn_name], dict_equipment_new[wpn_name], sep='\t')
+        writer.line()
+        writer.line('troops_type', 'spending', 'spending_new', 'limit', sep='\t')
+        budget_troops_old, budget_troops_new = solution['budget_troops_types']
+        maintenance_troops_old, maintenance_troops_new = solution['maintenance_percent_troops_types']
+        for troop_key in sorted(scenario.dict_troops_types.keys()):
+            spending_old = budget_troops_old[troop_key] + maintenance_troops_old[troop_key] * 100
+            spending_new = budget_troops_new[troop_key] + maintenance_troops_new[troop_key] * 100
+            writer.line(troop_key, str(round(spending_old, 2)) + '%', str(round(spending_new, 2)) + '%',
+                    str(round(scenario.dict_troops_types[troop_key] * 100, 2)) + '%', sep='\t')
+        writer.line()
+        objective_old, objective_new = solution['objective']
+        budget_old, budget_new = solution['budget_percent']
+        maintenance_old, maintenance_new = solution['maintenance_percent_sum']
+        writer.line('Цель: было ', round(objective_old, 4), ', стало ', round(objective_new, 4), sep='')
+        writer.line('Закупки и обслуживание: было ', round((budget_old + maintenance_old) * 100, 2),
+                '% бюджета армии, стало ', round((budget_new + maintenance_new) * 100, 2), '%', sep='')
+
+
+def print_calibration(scenario, calibration, stream=None):
+    """Опции, подобранные Scenario.calibrate, и итоги до и после.
+
+    Итоги калибровки — без округлений (calibration_values),
+    численность популяции и армии — ещё и по полному расчёту.
+    """
+    summary_old = scenario.summary()
+    summary_new = calibration['scenario'].summary()
+    with ReportWriter(stream) as writer:
+        writer.line('option', 'value', 'value_new', sep='\t')
+        for key in CALIBRATION_PARAMETERS:
+            if key in calibration['options']:
+                writer.line(key, scenario.options[key], round(calibration['options'][key], 8), sep='\t')
+        writer.line()
+        writer.line('target', 'goal', 'value', 'value_new', sep='\t')
+        for name in sorted(calibration['targets']):
+            value_old, value_new = calibration['values'][name]
+            writer.line(name, calibration['targets'][name], round(value_old, 4), round(value_new, 4), sep='\t')
+        writer.line()
+        for key in ('population_alive', 'army_soldiers'):
+            writer.line(key, ': было ', summary_old[key], ', стало ', summary_new[key], sep='')
+        writer.line('Ожидаемая численность:', scenario.POPULATION)
+        writer.line('Шагов:', calibration['iterations'], 'наборов параметров:', calibration['evaluations'],
+                'цель:', calibration['loss'])
+
+
+# Сколько параметров показывать для каждого итога и на сколько их менять:
+SENSITIVITY_TOP = 10
+SENSITIVITY_STEP = 0.1
+
+
+def print_sensitivity(sensitivity, metric_filter='', top=SENSITIVITY_TOP,
+        step=SENSITIVITY_STEP, stream=None):
+    """Диаграмма-торнадо: параметры, сильнее всего влияющие на итоги.
+
+    Для каждого итога (название содержит metric_filter) параметры
+    упорядочены по эластичности — на сколько процентов меняется итог
+    при изменении параметра на процент. Столбцы -10% и +10% — итог
+    при таком изменении параметра (линейная оценка). Запасы оружия
+    показываются, только если их запросить: metric_filter='equipment_all'.
+    """
+    parameters = sensitivity['parameters']
+    with ReportWriter(stream) as writer:
+        for name, metric in sensitivity['metrics'].items():
+            if (metric_filter not in name):
+                continue
+            if (name.startswith('equipment_all') and not metric_filter):
+                continue
+            value = metric['value']
+            rows = []
+            for number, derivative in metric['gradient'].items():
+                parameter_value = parameters[number]['value']
+                elasticity = derivative * parameter_value / value if value else 0
+                if (derivative != 0):
+                    rows.append((abs(elasticity), number, derivative, elasticity))
+            rows.sort(key=lambda row: (-row[0], row[1]))
+            writer.line(name, '=', round(value, 6))
+            writer.line('    parameter', 'value', 'derivative', 'elasticity',
+                    '-' + str(round(step * 100)) + '%', '+' + str(round(step * 100)) + '%', sep='\t')
+            for weight, number, derivative, elasticity in rows[:top]:
+                parameter = parameters[number]
+                label = parameter['parameter'] if parameter['wpn_name'] is None \
+                        else parameter['wpn_name'] + ': ' + parameter['parameter']
+                writer.line('    ' + label, parameter['value'], '%.6g' % derivative,
+                        round(elasticity, 4),
+                        round(value - value * elasticity * step, 6),
+                        round(value + value * elasticity * step, 6), sep='\t')
+
+
+#-------------------------------------------------------------------------
+# Таблицы отчёта для других программ: CSV, JSON Lines и файлы столбцов.
+
+# Разделы отчёта, в порядке вывода:
+REPORT_SECTIONS = ('years', 'equipment', 'army', 'weapons', 'budget', 'ammunition', 'summary')
+
+# Форматы и расширения файлов:
+REPORT_FORMATS = {
+        'csv':'.csv',
+        'jsonl':'.jsonl',
+        'columns':'.wcol',
+        }
+
+
+def column_list(column):
+    """Столбец списком значений питона (массивы NumPy переводятся)."""
+    return column.tolist() if hasattr(column, 'tolist') else list(column)
+
+
+def report_tables(scenario, results=None):
+    """Разделы отчёта таблицами, прямо из расчётных данных.
+
+    Возвращает упорядоченный словарь: раздел -> таблица,
+    а таблица — упорядоченный словарь: столбец -> список значений.
+    Разделы те же, что в текстовом отчёте (смотри REPORT_SECTIONS).
+    """
+    if results is None:
+        results = scenario.compute()
+    metadict_columns = results['metadict_columns']
+    equipment = results['equipment']
+    economy = results['economy']
+    dict_equipment_all = equipment['dict_equipment_all']
+    dict_troops_types = scenario.dict_troops_types
+    army_soldiers = results['army_soldiers']
+    army_reservists = results['army_reservists']
+    tables = collections.OrderedDict()
+
+    # Поколения, по возрастам:
+    years = collections.OrderedDict()
+    for key in ('year_real', 'age_real', 'population_size', 'generation_size',
+            'generation_alive', 'GDP_size', scenario.MALE_NAME, scenario.FEMALE_NAME,
+            scenario.prof_name_apprentice, scenario.prof_name_expert, scenario.prof_name_retiree):
+        years[key] = column_list(metadict_columns[key])
+    tables['years'] = years
+
+    # Уцелевшее оружие по возрастам, только ненулевые ячейки:
+    wpn_columns = equipment['wpn_columns']
+    wpn_name = scenario.wpn_values(wpn_columns, 'wpn_name')
+    wpn_name_new = scenario.wpn_values(wpn_columns, 'wpn_name_new')
+    wpn_name_mid = scenario.wpn_values(wpn_columns, 'wpn_name_mid')
+    wpn_name_old = scenario.wpn_values(wpn_columns, 'wpn_name_old')
+    wpn_age_mid = scenario.wpn_values(wpn_columns, 'wpn_age_mid')
+    wpn_age_old = scenario.wpn_values(wpn_columns, 'wpn_age_old')
+    equipment_create_matrix = equipment['equipment_create_matrix']
+    equipment_alive_matrix = equipment['equipment_alive_matrix']
+    table = collections.OrderedDict((key, []) for key in (
+        'year_real', 'age_real', 'wpn_key', 'wpn_name', 'wpn_name_age', 'create', 'alive'))
+    for age, age_real in enumerate(years['age_real']):
+        create_row = column_list(equipment_create_matrix[age])
+        alive_row = column_list(equipment_alive_matrix[age])
+        for column, alive in enumerate(alive_row):
+            if (alive == 0):
+                continue
+            if (age_real < wpn_age_mid[column]):
+                name_age = wpn_name_new[column]
+            elif (age_real < wpn_age_old[column]):
+                name_age = wpn_name_mid[column]
+            else:
+                name_age = wpn_name_old[column]
+            table['year_real'].append(years['year_real'][age])
+            table['age_real'].append(age_real)
+            table['wpn_key'].append(wpn_columns[column])
+            table['wpn_name'].append(wpn_name[column])
+            table['wpn_name_age'].append(name_age)
+            table['create'].append(create_row[column])
+            table['alive'].append(alive)
+    tables['equipment'] = table
+
+    # Солдаты и резервисты по видам войск:
+    table = collections.OrderedDict((key, []) for key in (
+        'troops_type', 'troops_percent', 'soldiers', 'soldiers_reservists'))
+    for troop_key in sorted(dict_troops_types.keys()):
+        table['troops_type'].append(troop_key)
+        table['troops_percent'].append(dict_troops_types[troop_key])
+        table['soldiers'].append(round(army_soldiers * dict_troops_types[troop_key]))
+        table['soldiers_reservists'].append(
+                round((army_soldiers + army_reservists) * dict_troops_types[troop_key]))
+    tables['army'] = table
+
+    # Вооружение: запасы, расходы, производство и потери:
+    metadict_wpn = scenario.metadict_wpn
+    GDP_army = scenario.GDP_size(0) * scenario.GDP_ARMY
+    table = collections.OrderedDict((key, []) for key in (
+        'wpn_key', 'troops_type', 'wpn_name', 'equipment_all', 'budget_shortage',
+        'soldiers_per_wpn', 'army_per_wpn', 'wpn_budget', 'cost', 'cost_currency',
+        'create', 'losses'))
+    wpn_columns = sorted(metadict_wpn.keys())
+    for wpn_key, loss_rate in zip(wpn_columns, scenario.wpn_loss_rates(wpn_columns)):
+        dict_wpn = metadict_wpn[wpn_key]
+        equipment_all = economy['equipment_all'][wpn_key]
+        army_type_percent = dict_troops_types[dict_wpn['wpn_troops_type']]
+        wpn_create = round(GDP_army * dict_wpn['wpn_budget'] / dict_wpn['wpn_cost'])
+        table['wpn_key'].append(wpn_key)
+        table['troops_type'].append(dict_wpn['wpn_troops_type'])
+        table['wpn_name'].append(dict_wpn['wpn_name'])
+        table['equipment_all'].append(equipment_all)
+        table['budget_shortage'].append(int(dict_equipment_all[dict_wpn['wpn_name']] < 1))
+        table['soldiers_per_wpn'].append(round(army_soldiers * army_type_percent / equipment_all))
+        table['army_per_wpn'].append(
+                round((army_reservists + army_soldiers) * army_type_percent / equipment_all))
+        table['wpn_budget'].append(dict_wpn['wpn_budget'])
+        table['cost'].append(dict_wpn['wpn_cost'] * wpn_create)
+        table['cost_currency'].append(dict_wpn['wpn_cost_currency'])
+        table['create'].append(wpn_create)
+        table['losses'].append(round(wpn_create * loss_rate + equipment_all * loss_rate))
+    tables['weapons'] = table
+
+    # Закупки и обслуживание по видам войск, доли бюджета армии:
+    table = collections.OrderedDict((key, []) for key in (
+        'troops_type', 'troops_percent', 'budget_percent', 'maintenance_percent'))
+    for troop_key in sorted(dict_troops_types.keys()):
+        table['troops_type'].append(troop_key)
+        table['troops_percent'].append(dict_troops_types[troop_key])
+        table['budget_percent'].append(economy['budget_troops_types'][troop_key] / 100)
+        table['maintenance_percent'].append(economy['maintenance_percent_troops_types'][troop_key])
+    tables['budget'] = table
+
+    # Боеприпасы на складах и потребность в них:
+    table = collections.OrderedDict((key, []) for key in (
+        'ammo_name', 'stock', 'needs', 'coverage'))
+    for ammo_key in sorted(economy['ammunition_needs'].keys()):
+        table['ammo_name'].append(ammo_key)
+        table['stock'].append(dict_equipment_all.get(ammo_key, 0))
+        table['needs'].append(economy['ammunition_needs'][ammo_key])
+        table['coverage'].append(economy['ammunition_coverage'][ammo_key])
+    tables['ammunition'] = table
+
+    # Итоги одной строкой:
+    table = collections.OrderedDict()
+    table['population_expected'] = [scenario.POPULATION]
+    table['population_alive'] = [results['population_alive']]
+    table['army_soldiers'] = [army_soldiers]
+    table['army_reservists'] = [army_reservists]
+    table['accidents'] = [round(scenario.POPULATION * scenario.COMPONENT_A)]
+    table['war_losses'] = [round(army_soldiers * scenario.prof_hazard)]
+    table['budget_percent'] = [economy['budget_percent']]
+    table['budget_percent_GDP'] = [scenario.GDP_ARMY * economy['budget_percent']]
+    table['maintenance_percent'] = [economy['maintenance_percent_sum']]
+    table['maintenance_percent_GDP'] = [economy['maintenance_percent_sum'] * scenario.GDP_ARMY]
+    tables['summary'] = table
+    return tables
+
+
+def write_csv_table(path, table):
+    """Запись таблицы в CSV, первая строка — имена столбцов."""
+    with open(path, 'w', encoding='utf-8', newline='') as table_file:
+        writer = csv.writer(table_file)
+        writer.writerow(table.keys())
+        writer.writerows(zip(*table.values()))
+
+
+def write_jsonl_table(path, table):
+    """Запись таблицы в JSON Lines: строка файла — словарь строки таблицы."""
+    keys = list(table.keys())
+    with open(path, 'w', encoding='utf-8') as table_file:
+        writer = ReportWriter(table_file)
+        for row in zip(*table.values()):
+            writer.write(json.dumps(dict(zip(keys, row)), ensure_ascii=False) + '\n')
+        writer.flush()
+
+
+def write_report_tables(scenario, directory, output_format='csv', results=None):
+    """Запись всех разделов отчёта, по файлу на раздел.
+
+    output_format — 'csv', 'jsonl' или 'columns' (двоичный файл
+    столбцов, читается через ColumnFile). Возвращает список путей.
+    """
+    if output_format not in REPORT_FORMATS:
+        raise ValueError('Неизвестный формат: ' + str(output_format))
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for section, table in report_tables(scenario, results).items():
+        path = os.path.join(directory, section + REPORT_FORMATS[output_format])
+        if (output_format == 'csv'):
+            write_csv_table(path, table)
+        elif (output_format == 'jsonl'):
+            write_jsonl_table(path, table)
+        else:
+            write_column_file(path, table, {'section':section})
+        paths.append(path)
+    return paths
+
+
+#-------------------------------------------------------------------------
+# Сценарии. Перебор опций, расчёты идут параллельно, в нескольких процессах.
+
+def evaluate_scenarios(scenario, scenarios, cache=None):
+    """Итоги для пачки сценариев, каждый — замена опций в scenario."""
+    return [scenario.replace(overrides).summary(cache=cache) for overrides in scenarios]
+
+
+# Опции, от которых запасы оружия зависят линейно (смотри linear_sweep):
+LINEAR_OPTIONS = ('GDP_ARMY', 'GDP_RATE', 'POPULATION') + WPN_OVERRIDES
+# Допустимая доля ошибки округлений в запасах оружия, больше — точный расчёт:
+LINEAR_TOLERANCE = 0.01
+
+
+def linear_sweep(scenario, scenarios, tolerance=LINEAR_TOLERANCE):
+    """Итоги сценариев по линейному отклику, без матриц оружия.
+
+    Сценарии могут менять только LINEAR_OPTIONS: GDP_ARMY, GDP_RATE,
+    POPULATION и строки оружия wpn_budget, wpn_cost, wpn_maintenance.
+    Отклик (Scenario.linear_response) считается один раз, запасы
+    каждого сценария — одно умножение на оружие, округление — в конце.
+
+    Округления по годам (выпуск и уцелевшие) дают ошибку не больше
+    половины машины на год жизни оружия, она не зависит от бюджета.
+    Если она больше tolerance от запасов (маленький флот дорогих машин),
+    запасы этого оружия считаются точно, по годам, как в полном расчёте.
+    Поколения и армия считаются точно (их меняет только POPULATION),
+    бюджет, обслуживание и боеприпасы — как в economy_summary().
+    """
+    for overrides in scenarios:
+        for key in overrides:
+            if key not in LINEAR_OPTIONS:
+                raise ValueError('Опция не линейна, нужен полный расчёт: ' + str(key))
+    AGE_END = scenario.AGE_END
+    wpn_columns = sorted(scenario.metadict_wpn.keys())
+    wpn_names = scenario.wpn_values(wpn_columns, 'wpn_name')
+    response = scenario.linear_response(wpn_columns)
+    # Расход боеприпасов от опций и бюджетов не зависит:
+    munitions = scenario.munition_matrix(wpn_columns)
+    # Таблицы выживаемости и наибольшая ошибка округлений оружия:
+    tables = []
+    errors = []
+    for law in scenario.wpn_laws(wpn_columns):
+        table = survival_table(law, AGE_END)
+        tables.append(table)
+        errors.append(sum(0.5 * table[age + 1] + 0.5
+            for age in range(min(AGE_END + 1, len(table) - 1)) if table[age + 1] > 0))
+    # Армия зависит только от POPULATION, ВВП по годам — ещё и от GDP_RATE:
+    army = {}
+    GDP_columns = {}
+    summaries = []
+    for overrides in scenarios:
+        scenario_new = scenario.replace(overrides)
+        if scenario_new.POPULATION not in army:
+            army[scenario_new.POPULATION] = scenario_new.army_summary(scenario_new.cohort_table()[0])
+        population_alive, army_soldiers, army_reservists = army[scenario_new.POPULATION]
+        scale = scenario_new.GDP_RATE * scenario_new.POPULATION * scenario_new.GDP_ARMY
+        wpn_budget = scenario_new.wpn_values(wpn_columns, 'wpn_budget')
+        wpn_cost = scenario_new.wpn_values(wpn_columns, 'wpn_cost')
+        dict_equipment_all = {}
+        for column, wpn_name in enumerate(wpn_names):
+            equipment_all = scale * wpn_budget[column] / wpn_cost[column] * response[column]
+            if (errors[column] <= tolerance * equipment_all):
+                dict_equipment_all[wpn_name] = round(equipment_all)
+                continue
+            # Точный расчёт, с округлениями по годам:
+            GDP_key = (scenario_new.POPULATION, scenario_new.GDP_RATE)
+            if GDP_key not in GDP_columns:
+                GDP_columns[GDP_key] = [scenario_new.GDP_size(age) for age in range(AGE_END + 1)]
+            GDP = GDP_columns[GDP_key]
+            table = tables[column]
+            equipment_all = 0
+            for age in range(min(AGE_END + 1, len(table) - 1)):
+                wpn_create = round(GDP[age] * scenario_new.GDP_ARMY * wpn_budget[column] / wpn_cost[column])
+                equipment_all = equipment_all + round(max(wpn_create * table[age + 1], 0))
+            dict_equipment_all[wpn_name] = equipment_all
+        economy = scenario_new.economy_summary(dict_equipment_all, munitions)
+        summaries.append({
+                'population_alive':population_alive,
+                'army_soldiers':army_soldiers,
+                'army_reservists':army_reservists,
+                'budget_percent':economy['budget_percent'],
+                'maintenance_percent_sum':economy['maintenance_percent_sum'],
+                'ammunition_coverage':economy['ammunition_coverage'],
+                })
+    return summaries
+
+
+def sweep_scenarios(sweep_options):
+    """Список сценариев из описания перебора.
+
+    Описание — это либо готовый список словарей с опциями,
+    либо сетка: словарь, где каждой опции дан список значений.
+    Из сетки получаются все сочетания значений.
+    """
+    if isinstance(sweep_options, list):
+        return sweep_options
+    keys = sorted(sweep_options.keys())
+    scenarios = []
+    for values in itertools.product(*[sweep_options[key] for key in keys]):
+        scenarios.append(dict(zip(keys, values)))
+    return scenarios
+
+
+def sweep(scenario, scenarios, workers=None, cache=None):
+    """Расчёт списка сценариев в пуле процессов.
+
+    Каждый сценарий — словарь замен опций базового сценария scenario.
+    Возвращает итоги в том же порядке, что и сценарии.
+    Если workers равно 1, расчёт идёт в этом же процессе.
+    cache — кэш результатов (ResultCache), общий для всех процессов.
+    """
+    if (workers == 1):
+        return evaluate_scenarios(scenario, scenarios, cache)
+    # Сценарии отдаются пачками, базовый сценарий пересылается раз на пачку:
+    chunksize = max(1, len(scenarios) // ((workers or os.cpu_count() or 1) * 4))
+    chunks = [scenarios[number:number + chunksize]
+            for number in range(0, len(scenarios), chunksize)]
+    summaries = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_summaries in executor.map(evaluate_scenarios,
+                itertools.repeat(scenario), chunks, itertools.repeat(cache)):
+            summaries.extend(chunk_summaries)
+    return summaries
+
+
+def print_sweep(scenarios, summaries):
+    """Таблица итогов сценариев, столбцы разделены табуляцией."""
+    option_keys = sorted(set(key for overrides in scenarios for key in overrides))
+    ammo_keys = sorted(set(ammo_key for summary in summaries
+        for ammo_key in summary['ammunition_coverage']))
+    header = ['№'] + option_keys + [
+            'population_alive', 'army_soldiers', 'army_reservists',
+            'budget_percent', 'maintenance_percent_sum', 'ammunition_coverage_min',
+            ] + ammo_keys
+    print(*header, sep='\t')
+    for number, (overrides, summary) in enumerate(zip(scenarios, summaries)):
+        row = [number]
+        for key in option_keys:
+            value = overrides.get(key, '')
+            if isinstance(value, dict):
+                value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+            row.append(value)
+        coverage = summary['ammunition_coverage']
+        row = row + [
+                summary['population_alive'],
+                summary['army_soldiers'],
+                summary['army_reservists'],
+                round(summary['budget_percent'] * 100, 2),
+                round(summary['maintenance_percent_sum'] * 100, 2),
+                round(min(coverage.values()) * 100) if coverage else '',
+                ]
+        row = row + [round(coverage[ammo_key] * 100) if ammo_key in coverage else ''
+            for ammo_key in ammo_keys]
+        print(*row, sep='\t')
+
+
+#-------------------------------------------------------------------------
+# Метод Монте-Карло: случайные потери, тысячи повторов сразу.
+
+# Повторов в одной пачке, не больше (пачка — массивы повтор × возраст × оружие):
+MONTE_CARLO_BATCH = 256
+# Предел клеток массива случайных потерь оружия (повтор × возраст × оружие,
+# по 8 байт). Пачка уменьшается, а возрасты разыгрываются кусками:
+MONTE_CARLO_CELLS = 2 ** 22
+# Процентили итогов:
+MONTE_CARLO_PERCENTILES = (5, 50, 95)
+
+
+def monte_carlo_inputs(scenario):
+    """Неслучайная часть расчёта: численность поколений, производство
+    оружия и вероятности дожить до своего возраста. Массивы NumPy.
+    """
+    # Таблицы считаются столбцами NumPy, даже если NUMPY_SWITCH выключен:
+    scenario = scenario.replace(NUMPY_SWITCH=1)
+    AGE_END = scenario.AGE_END
+    app = scenario.prof_age_apprentice
+    metadict_columns = scenario.cohort_columns()
+    ages = metadict_columns['age_real']
+    # Профессию выбирает доля живых, дальше действует риск профессии:
+    prof_share = 0
+    if (scenario.prof_male_switch != 0):
+        prof_share = prof_share + scenario.MALE_PERCENT
+    if (scenario.prof_female_switch != 0):
+        prof_share = prof_share + scenario.FEMALE_PERCENT
+    prof_survival = numpy.zeros(AGE_END + 1)
+    if (app <= AGE_END):
+        prof_survival[app:] = survival_column(scenario.profession_law(), AGE_END - app)
+    # Оружие и матрица расхода боеприпасов (оружие × боеприпас):
+    wpn_columns = sorted(scenario.metadict_wpn.keys())
+    wpn_names = scenario.wpn_values(wpn_columns, 'wpn_name')
+    wpn_create, wpn_alive = scenario.equipment_matrices(wpn_columns, None, metadict_columns)
+    munitions = scenario.munition_matrix(wpn_columns)
+    ammo_expense = numpy.zeros((len(wpn_columns), len(munitions['ammo_names'])))
+    numpy.add.at(ammo_expense, (munitions['rows'], munitions['columns']), munitions['expenses'])
+    # Запасы боеприпаса — это оружие с тем же названием (-1 — такого нет):
+    wpn_numbers = dict((name, column) for column, name in enumerate(wpn_names))
+    inputs = {
+            'generation_size':metadict_columns['generation_size'],
+            'survival':survival_column(scenario.population_law(), AGE_END),
+            'prof_probability':numpy.minimum(prof_share * scenario.prof_percent * prof_survival, 1),
+            'apprentice_mask':(app <= ages) & (ages < scenario.prof_age_expert),
+            'expert_mask':(scenario.prof_age_expert <= ages) & (ages < scenario.prof_age_retiree),
+            'wpn_names':wpn_names,
+            'wpn_create':numpy.maximum(wpn_create, 0),
+            'wpn_survival':scenario.wpn_survival_matrix(wpn_columns),
+            'ammo_names':munitions['ammo_names'],
+            'ammo_expense':ammo_expense,
+            'ammo_stock':numpy.array([wpn_numbers.get(name, -1) for name in munitions['ammo_names']],
+                dtype=numpy.int64),
+            }
+    return inputs
+
+
+def monte_carlo_batch_size(scenario):
+    """Повторов в пачке: MONTE_CARLO_BATCH, если массив потерь оружия
+    пачки укладывается в MONTE_CARLO_CELLS, иначе меньше (хотя бы один).
+    """
+    cells = (scenario.AGE_END + 1) * max(len(scenario.metadict_wpn), 1)
+    return max(1, min(MONTE_CARLO_BATCH, MONTE_CARLO_CELLS // cells))
+
+
+def monte_carlo_batch(inputs, replicas, seed_sequence):
+    """Пачка повторов со случайными потерями, свой поток случайных чисел.
+
+    Число выживших — биномиальное: каждый в поколении (и каждая
+    машина в выпуске года) доживает с вероятностью из таблицы
+    выживаемости, независимо от остальных. inputs — из monte_carlo_inputs().
+    Потери оружия разыгрываются кусками возрастов, не больше
+    MONTE_CARLO_CELLS клеток, и сразу суммируются.
+    """
+    generator = numpy.random.Generator(numpy.random.PCG64(seed_sequence))
+    alive = generator.binomial(inputs['generation_size'], inputs['survival'],
+            size=(replicas, len(inputs['survival'])))
+    prof = generator.binomial(alive, inputs['prof_probability'])
+    wpn_create = inputs['wpn_create']
+    wpn_survival = inputs['wpn_survival']
+    # Старше последнего возраста с живыми выпуск оружия не разыгрывается,
+    # там биномиальное число — всегда ноль (случайные числа не тратятся):
+    ages_alive = numpy.flatnonzero(((wpn_create > 0) & (wpn_survival > 0)).any(axis=1))
+    age_stop = ages_alive[-1] + 1 if len(ages_alive) else 0
+    ages_step = max(1, MONTE_CARLO_CELLS // (replicas * max(wpn_create.shape[1], 1)))
+    equipment_all = numpy.zeros((replicas, wpn_create.shape[1]), dtype=numpy.int64)
+    for age in range(0, age_stop, ages_step):
+        equipment_all += generator.binomial(wpn_create[age:age + ages_step],
+                wpn_survival[age:age + ages_step],
+                size=(replicas,) + wpn_create[age:age + ages_step].shape).sum(axis=1)
+    # Потребность в боеприпасах: хотя бы один экземпляр оружия на складах.
+    ammunition_needs = numpy.maximum(equipment_all, 1) @ inputs['ammo_expense']
+    ammo_stock = inputs['ammo_stock']
+    stock = numpy.where(ammo_stock >= 0, equipment_all[:, ammo_stock], ammunition_needs)
+    samples = {
+            'population_alive':alive.sum(axis=1),
+            'army_soldiers':(prof * inputs['apprentice_mask']).sum(axis=1),
+            'army_reservists':(prof * inputs['expert_mask']).sum(axis=1),
+            'equipment_all':equipment_all,
+            'ammunition_coverage':stock / ammunition_needs,
+            }
+    return samples
+
+
+def monte_carlo_batches(scenario, batches):
+    """Несколько пачек подряд: список пар (повторов, поток).
+
+    Неслучайная часть (monte_carlo_inputs) считается один раз на все пачки.
+    """
+    inputs = monte_carlo_inputs(scenario)
+    return [monte_carlo_batch(inputs, replicas, seed_sequence)
+            for replicas, seed_sequence in batches]
+
+
+def monte_carlo(scenario, replicas, seed=None, workers=None, percentiles=MONTE_CARLO_PERCENTILES):
+    """Расчёт сценария со случайными потерями, replicas повторов.
+
+    У каждой пачки свой поток случайных чисел (SeedSequence.spawn),
+    поэтому при одном seed результат не зависит от числа процессов.
+    Возвращает процентили численности популяции и армии, оружия
+    на складах и обеспеченности боеприпасами, рядом — неслучайный
+    расчёт (expected). Сами выборки лежат в 'samples'.
+    """
+    if numpy is None:
+        raise ImportError('Для метода Монте-Карло нужен NumPy')
+    seed_sequence = numpy.random.SeedSequence(seed)
+    batch_size = monte_carlo_batch_size(scenario)
+    batch_sizes = [min(batch_size, replicas - start)
+            for start in range(0, replicas, batch_size)]
+    batches = list(zip(batch_sizes, seed_sequence.spawn(len(batch_sizes))))
+    if (workers == 1):
+        batch_samples = monte_carlo_batches(scenario, batches)
+    else:
+        chunksize = max(1, len(batches) // ((workers or os.cpu_count() or 1) * 2))
+        chunks = [batches[number:number + chunksize]
+                for number in range(0, len(batches), chunksize)]
+        batch_samples = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_samples in executor.map(monte_carlo_batches,
+                    itertools.repeat(scenario), chunks):
+                batch_samples.extend(chunk_samples)
+    samples = {}
+    for key in batch_samples[0]:
+        samples[key] = numpy.concatenate([batch[key] for batch in batch_samples])
+
+    results_expected = scenario.compute()
+    economy = results_expected['economy']
+    wpn_columns = results_expected['equipment']['wpn_columns']
+    wpn_names = scenario.wpn_values(wpn_columns, 'wpn_name')
+    ammo_names = scenario.munition_matrix(wpn_columns)['ammo_names']
+
+    def percentile_list(values):
+        return numpy.percentile(values, percentiles, axis=0).tolist()
+
+    results = {
+            'replicas':replicas,
+            'seed':seed_sequence.entropy,
+            'percentiles':list(percentiles),
+            'samples':samples,
+            'population_alive':percentile_list(samples['population_alive']),
+            'army_soldiers':percentile_list(samples['army_soldiers']),
+            'army_reservists':percentile_list(samples['army_reservists']),
+            'equipment_all':collections.OrderedDict(),
+            'ammunition_coverage':collections.OrderedDict(),
+            'expected':{
+                'population_alive':results_expected['population_alive'],
+                'army_soldiers':results_expected['army_soldiers'],
+                'army_reservists':results_expected['army_reservists'],
+                'equipment_all':results_expected['equipment']['dict_equipment_all'],
+                'ammunition_coverage':economy['ammunition_coverage'],
+                },
+            }
+    equipment_percentiles = numpy.percentile(samples['equipment_all'], percentiles, axis=0)
+    for column, wpn_name in enumerate(wpn_names):
+        results['equipment_all'][wpn_name] = equipment_percentiles[:, column].tolist()
+    coverage_percentiles = numpy.percentile(samples['ammunition_coverage'], percentiles, axis=0)
+    for column, ammo_name in enumerate(ammo_names):
+        results['ammunition_coverage'][ammo_name] = coverage_percentiles[:, column].tolist()
+    return results
+
+
+def print_monte_carlo(results, stream=None):
+    """Процентили метода Монте-Карло таблицей, через табуляцию."""
+    expected = results['expected']
+    with ReportWriter(stream) as writer:
+        writer.line('# Повторов:', results['replicas'], 'seed:', results['seed'])
+        writer.line('name', 'expected', *['p' + str(percentile) for percentile in results['percentiles']],
+                sep='\t')
+        for key in ('population_alive', 'army_soldiers', 'army_reservists'):
+            writer.line(key, expected[key], *[round(value) for value in results[key]], sep='\t')
+        for wpn_name, values in results['equipment_all'].items():
+            writer.line(wpn_name, expected['equipment_all'].get(wpn_name, ''),
+                    *[round(value) for value in values], sep='\t')
+        for ammo_name in sorted(results['ammunition_coverage']):
+            values = results['ammunition_coverage'][ammo_name]
+            writer.line(ammo_name + ' (%)', round(expected['ammunition_coverage'][ammo_name] * 100),
+                    *[round(value * 100) for value in values], sep='\t')
+
+
+#-------------------------------------------------------------------------
+# Двоичные файлы столбцами. В них хранится база данных оружия.
+
+# Файл: сигнатура (8 байт), длина заголовка (8 байт), заголовок JSON,
+# затем столбцы. Числа — int64 или float64 (little-endian), строки —
+# номера в общей таблице строк (-1 — значения нет). Если у числового
+# столбца есть пропуски, рядом лежит байтовая маска (1 — значение есть).
+COLUMN_FILE_MAGIC = b'WARCOL01'
+
+
+def column_type(values):
+    """Тип столбца: 'q' — целые, 'd' — дробные, 's' — строки."""
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, str) for value in present):
+        return 's'
+    if all(isinstance(value, int) for value in present):
+        return 'q'
+    if all(isinstance(value, (int, float)) for value in present):
+        return 'd'
+    raise TypeError('Столбец должен содержать только числа или только строки')
+
+
+def array_bytes(typecode, values):
+    """Байты массива чисел в порядке little-endian."""
+    values_array = array.array(typecode, values)
+    if (sys.byteorder != 'little'):
+        values_array.byteswap()
+    return values_array.tobytes()
+
+
+def write_column_file(path, columns, header_extra=None):
+    """Запись столбцов в двоичный файл.
+
+    columns — упорядоченный словарь: имя столбца -> список значений
+    одинаковой длины, пропуски обозначаются None.
+    header_extra — словарь, который дописывается в заголовок (JSON).
+    """
+    rows = len(next(iter(columns.values()))) if columns else 0
+    blocks = []
+    data_size = 0
+    strings = collections.OrderedDict()
+    header_columns = collections.OrderedDict()
+
+    def add_block(block):
+        nonlocal data_size
+        offset = data_size
+        # Каждый столбец выравнивается по 8 байт:
+        padding = (-len(block)) % 8
+        blocks.append(block + b'\0' * padding)
+        data_size = data_size + len(block) + padding
+        return offset
+
+    for name, values in columns.items():
+        if (len(values) != rows):
+            raise ValueError('Столбцы разной длины: ' + str(name))
+        typecode = column_type(values)
+        column_header = {'type':typecode}
+        if (typecode == 's'):
+            indexes = []
+            for value in values:
+                if value is None:
+                    indexes.append(-1)
+                else:
+                    indexes.append(strings.setdefault(value, len(strings)))
+            column_header['offset'] = add_block(array_bytes('q', indexes))
+        else:
+            column_header['offset'] = add_block(array_bytes(typecode,
+                [0 if value is None else value for value in values]))
+            if any(value is None for value in values):
+                column_header['mask'] = add_block(bytes(
+                    [0 if value is None else 1 for value in values]))
+        header_columns[name] = column_header
+
+    # Таблица строк: смещения и сами строки в UTF-8 подряд.
+    strings_data = [string.encode('utf-8') for string in strings]
+    strings_offsets = [0]
+    for string_data in strings_data:
+        strings_offsets.append(strings_offsets[-1] + len(string_data))
+    header = {
+            'rows':rows,
+            'columns':header_columns,
+            'strings_count':len(strings_data),
+            'strings_offsets':add_block(array_bytes('q', strings_offsets)),
+            'strings_data':add_block(b''.join(strings_data)),
+            }
+    if header_extra:
+        header.update(header_extra)
+    header_data = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_data = header_data + b' ' * ((-len(header_data)) % 8)
+    with open(path, 'wb') as column_file:
+        column_file.write(COLUMN_FILE_MAGIC)
+        column_file.write(struct.pack('<Q', len(header_data)))
+        column_file.write(header_data)
+        for block in blocks:
+            column_file.write(block)
+
+
+class ColumnFile(object):
+    """Двоичный файл столбцов, отображённый в память (mmap).
+
+    Столбцы не читаются целиком при открытии: числа берутся прямо
+    из отображения файла, строки декодируются по мере обращения.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if (self._map[:8] != COLUMN_FILE_MAGIC):
+            raise ValueError('Это не файл столбцов: ' + str(path))
+        header_size = struct.unpack_from('<Q', self._map, 8)[0]
+        self.header = json.loads(self._map[16:16 + header_size].decode('utf-8'))
+        self.rows = self.header['rows']
+        self._data_start = 16 + header_size
+        self._strings = {}
+
+    def __getstate__(self):
+        # В другие процессы передаётся только путь к файлу:
+        return {'path':self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def columns(self):
+        """Имена столбцов в порядке записи."""
+        return list(self.header['columns'].keys())
+
+    def _numbers(self, typecode, offset, count):
+        """Массив чисел из файла, без копирования (memoryview или NumPy)."""
+        start = self._data_start + offset
+        if numpy is not None:
+            dtype = '<i8' if typecode == 'q' else '<f8'
+            return numpy.frombuffer(self._map, dtype=dtype, count=count, offset=start)
+        view = memoryview(self._map)[start:start + count * 8]
+        if (sys.byteorder != 'little'):
+            values_array = array.array(typecode, view.tobytes())
+            values_array.byteswap()
+            return values_array
+        return view.cast(typecode)
+
+    def string(self, index):
+        """Строка из таблицы строк по номеру."""
+        string = self._strings.get(index)
+        if string is None:
+            offsets = self._numbers('q', self.header['strings_offsets'],
+                    self.header['strings_count'] + 1)
+            start = self._data_start + self.header['strings_data']
+            string = self._map[start + int(offsets[index]):
+                    start + int(offsets[index + 1])].decode('utf-8')
+            self._strings[index] = string
+        return string
+
+    def raw_column(self, name):
+        """Столбец как есть: числа, а у строк — их номера."""
+        column_header = self.header['columns'][name]
+        typecode = 'q' if column_header['type'] == 's' else column_header['type']
+        return self._numbers(typecode, column_header['offset'], self.rows)
+
+    def mask(self, name):
+        """Маска пропусков числового столбца или None, если пропусков нет."""
+        column_header = self.header['columns'][name]
+        if 'mask' not in column_header:
+            return None
+        start = self._data_start + column_header['mask']
+        return self._map[start:start + self.rows]
+
+    def value(self, name, row):
+        """Одно значение столбца, None — если значения нет."""
+        column_header = self.header['columns'].get(name)
+        if column_header is None:
+            return None
+        value = self.raw_column(name)[row]
+        if (column_header['type'] == 's'):
+            return None if value < 0 else self.string(int(value))
+        mask = self.mask(name)
+        if (mask is not None and mask[row] == 0):
+            return None
+        return int(value) if column_header['type'] == 'q' else float(value)
+
+    def column(self, name):
+        """Столбец списком значений питона, пропуски — None."""
+        return [self.value(name, row) for row in range(self.rows)]
+
+
+class WeaponDatabase(collections.abc.Mapping):
+    """База данных оружия из двоичного файла.
+
+    Ведёт себя как словарь metadict_wpn: ключ — номер оружия,
+    значение — словарь его параметров. Словари собираются по запросу
+    и хранятся недолго (последние WPN_CACHE_SIZE штук), поэтому
+    память не растёт вместе с базой. Для расчётов есть column_values(),
+    отдающий столбец целиком.
+    """
+
+    WPN_CACHE_SIZE = 256
+
+    def __init__(self, path):
+        self.file = ColumnFile(path)
+        self.path = path
+        self._rows = {}
+        for row, wpn_key in enumerate(self.file.raw_column('wpn_key')):
+            self._rows[int(wpn_key)] = row
+        self._cache = collections.OrderedDict()
+
+    def __getstate__(self):
+        return {'path':self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __contains__(self, wpn_key):
+        return wpn_key in self._rows
+
+    def __getitem__(self, wpn_key):
+        dict_wpn = self._cache.get(wpn_key)
+        if dict_wpn is not None:
+            return dict_wpn
+        row = self._rows[wpn_key]
+        dict_wpn = {}
+        for name in self.file.columns():
+            if (name == 'wpn_key'):
+                continue
+            value = self.file.value(name, row)
+            if value is not None:
+                dict_wpn[name] = value
+        self._cache[wpn_key] = dict_wpn
+        if (len(self._cache) > self.WPN_CACHE_SIZE):
+            self._cache.popitem(last=False)
+        return dict_wpn
+
+    def column_values(self, wpn_columns, key, default=None):
+        """Значения одного поля для оружия из списка wpn_columns."""
+        if key not in self.file.header['columns']:
+            return [default] * len(wpn_columns)
+        column_header = self.file.header['columns'][key]
+        raw_column = self.file.raw_column(key)
+        rows = [self._rows[wpn_key] for wpn_key in wpn_columns]
+        if (column_header['type'] == 's'):
+            return [default if raw_column[row] < 0 else self.file.string(int(raw_column[row]))
+                    for row in rows]
+        mask = self.file.mask(key)
+        if (mask is None and numpy is not None):
+            return raw_column[rows].tolist()
+        return [default if (mask is not None and mask[row] == 0) else raw_column[row]
+                for row in rows]
+
+
+def write_wpn_database(path, scenario):
+    """Запись базы данных оружия сценария в двоичный файл.
+
+    Вместе с базой сохраняются опции и виды войск, так что
+    load_database() возвращает готовый сценарий.
+    """
+    metadict_wpn = scenario.metadict_wpn
+    wpn_keys = sorted(metadict_wpn.keys())
+    # Список боеприпасов 'wpn_ammo' хранится пронумерованными столбцами:
+    dicts_wpn = [wpn_numbered(metadict_wpn[wpn_key]) for wpn_key in wpn_keys]
+    # Закон потерь 'wpn_law' хранится строкой (смотри mortality_law):
+    for number, dict_wpn in enumerate(dicts_wpn):
+        if isinstance(dict_wpn.get('wpn_law'), (list, tuple)):
+            dicts_wpn[number] = dict(dict_wpn, wpn_law=mortality_law_string(dict_wpn['wpn_law']))
+    # Порядок столбцов — порядок первого появления строки в базе:
+    names = collections.OrderedDict()
+    for dict_wpn in dicts_wpn:
+        for name in dict_wpn:
+            if name not in names:
+                names[name] = None
+    columns = collections.OrderedDict()
+    columns['wpn_key'] = wpn_keys
+    for name in names:
+        columns[name] = [dict_wpn.get(name) for dict_wpn in dicts_wpn]
+    header_extra = {
+            'options':scenario.options,
+            'dict_troops_types':scenario.dict_troops_types,
+            }
+    write_column_file(path, columns, header_extra)
+
+
+def load_database(path):
+    """Сценарий из двоичной базы данных оружия (смотри write_wpn_database)."""
+    metadict_wpn = WeaponDatabase(path)
+    header = metadict_wpn.file.header
+    return Scenario(header.get('options'), metadict_wpn, header.get('dict_troops_types'))
+
+
+#-------------------------------------------------------------------------
+# Синтетические сценарии: случайные базы оружия любого размера.
+
+# Виды войск синтетических сценариев, как в war-economy-analyser.py:
+SYNTHETIC_TROOPS_TYPES = {
+        'ВПК':1,
+        'СВ':0.5,
+        'РВ':0.1,
+        'ВВС':0.15,
+        'ВМФ':0.1,
+        'ИВ':0.15,
+        }
+# Вид войск боеприпасов и топлива, их доля в базе и доля топлива среди них:
+SYNTHETIC_SUPPLY_TROOPS = 'ВПК'
+SYNTHETIC_SUPPLY_SHARE = 0.3
+SYNTHETIC_FUELS = 0.05
+# Средние (медианы) стоимости топлива, боеприпасов и оружия. Подобраны так,
+# что обеспеченность боеприпасами и топливом в среднем около 100%:
+SYNTHETIC_COSTS = {
+        'fuel':0.15,
+        'ammo':20,
+        'weapon':1000000,
+        }
+# Боеприпасов на оружие (от и до) и доля оружия с топливом:
+SYNTHETIC_AMMO_RANGE = (0, 9)
+SYNTHETIC_FUEL_SHARE = 0.6
+# Доля бюджета армии на закупки, делится между видами войск
+# пропорционально их долям в SYNTHETIC_TROOPS_TYPES:
+SYNTHETIC_BUDGET = 0.35
+
+
+def synthetic_options(rng):
+    """Опции сценария: население, рост, ВВП и смертность — случайные, правдоподобные."""
+    options = dict(DEFAULT_OPTIONS)
+    mortality_rate = rng.uniform(0.005, 0.02)
+    options.update({
+            'POPULATION':int(math.exp(rng.uniform(math.log(1e5), math.log(1e9)))),
+            'FERTILITY_RATE':mortality_rate + rng.uniform(0, 0.03),
+            'MORTALITY_RATE':mortality_rate,
+            'GDP_RATE':int(math.exp(rng.uniform(math.log(1000), math.log(60000)))),
+            'GDP_GROWTH':rng.uniform(0, 0.05),
+            'GDP_ARMY':rng.uniform(0.02, 0.3),
+            'COMPONENT_A':rng.uniform(0.001, 0.005),
+            'COEFFICIENT_B':rng.uniform(0.0002, 0.0005),
+            'COEFFICIENT_C':rng.uniform(1.07, 1.1),
+            })
+    return options
+
+
+def synthetic_wpn(rng, wpn_name, troops_type, cost_median, wear):
+    """Одно оружие: стоимость, обслуживание, возрасты и потери.
+
+    Стоимость — логнормальная вокруг cost_median, wear — во сколько
+    раз потери больше обычных (боеприпасы лежат на складах дольше).
+    """
+    wpn_age_mid = rng.randint(5, 20)
+    dict_wpn = {
+            'wpn_name':wpn_name,
+            'wpn_name_comment':'Синтетическое оружие.',
+            'wpn_troops_type':troops_type,
+            'wpn_cost':max(round(cost_median * rng.lognormvariate(0, 1.5), 2), 0.01),
+            'wpn_cost_currency':'Синтетические единицы',
+            'wpn_maintenance':round(rng.uniform(0, 0.05), 4),
+            'wpn_budget':0,
+            'wpn_name_new':wpn_name + ' новые',
+            'wpn_name_mid':wpn_name + ' устаревшие',
+            'wpn_name_old':wpn_name + ' под списание',
+            'wpn_age_mid':wpn_age_mid,
+            'wpn_age_old':wpn_age_mid + rng.randint(5, 20),
+            'wpn_a':round(rng.uniform(0.005, 0.05) * wear, 4),
+            'wpn_b':round(rng.lognormvariate(math.log(0.0002), 0.7), 6),
+            'wpn_c':round(rng.uniform(1.1, 1.6), 2),
+            }
+    return dict_wpn
+
+
+def synthetic_catalog(size, rng, troops_types=None):
+    """База данных оружия из size единиц, словарь как metadict_wpn.
+
+    Часть базы (SYNTHETIC_SUPPLY_SHARE) — боеприпасы и топливо вида войск
+    SYNTHETIC_SUPPLY_TROOPS, остальное — оружие прочих видов войск.
+    У оружия от 0 до 9 боеприпасов (список 'wpn_ammo') и, возможно,
+    топливо. Бюджеты делятся между видами войск по их долям,
+    внутри вида войск — случайно.
+    """
+    if troops_types is None:
+        troops_types = SYNTHETIC_TROOPS_TYPES
+    combat_troops = sorted(troop_key for troop_key in troops_types
+            if troop_key != SYNTHETIC_SUPPLY_TROOPS)
+    supply_size = min(max(int(size * SYNTHETIC_SUPPLY_SHARE), 1), size - 1) if size > 1 else 0
+    fuel_size = min(max(int(supply_size * SYNTHETIC_FUELS), 1), supply_size // 2)
+    metadict_wpn = {}
+    ammo_names = []
+    fuel_names = []
+    for number in range(size):
+        if (number < fuel_size):
+            dict_wpn = synthetic_wpn(rng, 'Топливо ' + str(number + 1), SYNTHETIC_SUPPLY_TROOPS,
+                    SYNTHETIC_COSTS['fuel'], 1)
+            fuel_names.append(dict_wpn['wpn_name'])
+        elif (number < supply_size):
+            dict_wpn = synthetic_wpn(rng, 'Боеприпасы ' + str(number - fuel_size + 1),
+                    SYNTHETIC_SUPPLY_TROOPS, SYNTHETIC_COSTS['ammo'], 2)
+            ammo_names.append(dict_wpn['wpn_name'])
+        else:
+            dict_wpn = synthetic_wpn(rng, 'Оружие ' + str(number - supply_size + 1),
+                    rng.choice(combat_troops), SYNTHETIC_COSTS['weapon'], 1)
+            wpn_ammo = []
+            if ammo_names:
+                for ammo_name in rng.sample(ammo_names, min(rng.randint(*SYNTHETIC_AMMO_RANGE), len(ammo_names))):
+                    capacity = max(1, int(rng.lognormvariate(math.log(100), 1)))
+                    wpn_ammo.append({'name':ammo_name, 'capacity':capacity,
+                        'expense':capacity * rng.randint(1, 10)})
+            if (fuel_names and rng.random() < SYNTHETIC_FUEL_SHARE):
+                capacity = max(1, int(rng.lognormvariate(math.log(1000), 1)))
+                wpn_ammo.append({'name':rng.choice(fuel_names), 'capacity':capacity,
+                    'consumption':max(1, capacity // 100), 'expense':capacity * rng.randint(10, 50)})
+            dict_wpn['wpn_ammo'] = wpn_ammo
+        dict_wpn['wpn_budget'] = rng.expovariate(1)
+        metadict_wpn[number] = dict_wpn
+    # Бюджеты: доля вида войск делится пропорционально случайным весам.
+    troops_shares = dict((troop_key, troops_types[troop_key]) for troop_key in combat_troops)
+    troops_shares[SYNTHETIC_SUPPLY_TROOPS] = sum(troops_shares.values()) * SYNTHETIC_SUPPLY_SHARE
+    troops_weights = {}
+    for dict_wpn in metadict_wpn.values():
+        troop_key = dict_wpn['wpn_troops_type']
+        troops_weights[troop_key] = troops_weights.get(troop_key, 0) + dict_wpn['wpn_budget']
+    troops_sum = sum(troops_shares[troop_key] for troop_key in troops_weights)
+    for dict_wpn in metadict_wpn.values():
+        troop_key = dict_wpn['wpn_troops_type']
+        dict_wpn['wpn_budget'] = dict_wpn['wpn_budget'] / troops_weights[troop_key] \
+                * troops_shares[troop_key] / troops_sum * SYNTHETIC_BUDGET
+    return metadict_wpn
+
+
+def synthetic_scenario(size, seed=None, options=None):
+    """Синтетический сценарий: опции, виды войск и база из size единиц оружия.
+
+    Одинаковое зерно seed даёт одинаковый сценарий. options
+    заменяют случайные опции, например {'AGE_END':500}.
+    """
+    rng = random.Random(seed)
+    scenario_options = synthetic_options(rng)
+    scenario_options.update(options or {})
+    metadict_wpn = synthetic_catalog(size, rng)
+    return Scenario(scenario_options, metadict_wpn, dict(SYNTHETIC_TROOPS_TYPES))
+
+
+#-------------------------------------------------------------------------
+# Профилирование: время и число вызовов по этапам и горячим функциям.
+
+# Функции модуля и методы сценария, которые замеряет Profiler:
+PROFILE_FUNCTIONS = [
+        'gompertz_distribution',
+        'mortality_hazards',
+        'survival_table',
+        'generation_alive',
+        'print_report',
+        ]
+PROFILE_METHODS = [
+        'population_size',
+        'GDP_size',
+        'generation_profession',
+        'cohort_table',
+        'equipment_matrices',
+        'equipment_from_matrices',
+        'army_summary',
+        'economy_summary',
+        ]
+
+
+class Profiler(object):
+    """Замеры времени и числа вызовов, пока профилировщик включён.
+
+    На входе в блок with функции PROFILE_FUNCTIONS и методы сценария
+    PROFILE_METHODS подменяются обёртками, на выходе возвращаются.
+    Без профилировщика код не меняется, замеры ничего не стоят.
+    Время вызовов включает вложенные вызовы. Считаются и шаги цикла
+    выживаемости (на сколько выросли таблицы survival_table) и пиковая
+    память процесса. Процессы сценариев (--workers) не замеряются.
+
+        with war_economy.Profiler() as profiler:
+            scenario.compute()
+        war_economy.print_profile(profiler.profile())
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self.survival_iterations = 0
+        self._originals = []
+        self._time_start = None
+        self._time_end = None
+
+    def _wrap(self, name, function):
+        calls = self.calls
+        seconds = self.seconds
+        calls[name] = 0
+        seconds[name] = 0
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            time_start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds[name] = seconds[name] + perf_counter() - time_start
+                calls[name] = calls[name] + 1
+        return wrapper
+
+    def _wrap_survival_table(self, function):
+        wrapper_timed = self._wrap('survival_table', function)
+
+        def wrapper(law, age_real):
+            table_len = len(survival_tables.get(law, ()))
+            table = wrapper_timed(law, age_real)
+            self.survival_iterations = self.survival_iterations + len(table) - table_len
+            return table
+        return wrapper
+
+    def __enter__(self):
+        module_globals = globals()
+        for name in PROFILE_FUNCTIONS:
+            function = module_globals[name]
+            self._originals.append((module_globals, name, function))
+            if (name == 'survival_table'):
+                module_globals[name] = self._wrap_survival_table(function)
+            else:
+                module_globals[name] = self._wrap(name, function)
+        for name in PROFILE_METHODS:
+            method = Scenario.__dict__[name]
+            self._originals.append((Scenario, name, method))
+            setattr(Scenario, name, self._wrap('Scenario.' + name, method))
+        self._time_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._time_end = time.perf_counter()
+        for namespace, name, function in reversed(self._originals):
+            if isinstance(namespace, dict):
+                namespace[name] = function
+            else:
+                setattr(namespace, name, function)
+        self._originals = []
+
+    def profile(self):
+        """Замеры словарем: по функциям — вызовы и секунды, и общие итоги."""
+        functions = {}
+        for name in self.calls:
+            functions[name] = {'calls':self.calls[name], 'seconds':self.seconds[name]}
+        time_end = self._time_end if self._time_end is not None else time.perf_counter()
+        profile = {
+                'seconds':time_end - self._time_start if self._time_start is not None else 0,
+                'functions':functions,
+                'survival_iterations':self.survival_iterations,
+                'max_rss_kb':max_rss_kb(),
+                }
+        return profile
+
+
+def max_rss_kb():
+    """Пиковая память процесса в килобайтах или None, если узнать нельзя."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В macOS ru_maxrss в байтах, в Linux — в килобайтах:
+    if (sys.platform == 'darwin'):
+        max_rss = max_rss // 1024
+    return max_rss
+
+
+def print_profile(profile, stream=None):
+    """Таблица замеров: вызовы, секунды всего и на вызов, доля от всего времени."""
+    seconds_all = profile['seconds']
+    with ReportWriter(stream) as writer:
+        writer.line('function', 'calls', 'seconds', 'per_call', 'percent', sep='\t')
+        functions = profile['functions']
+        for name in sorted(functions, key=lambda name: -functions[name]['seconds']):
+            calls = functions[name]['calls']
+            if not calls:
+                continue
+            seconds = functions[name]['seconds']
+            writer.line(name, calls, round(seconds, 6), '{:.3g}'.format(seconds / calls),
+                    str(round(seconds / seconds_all * 100, 1) if seconds_all else 0) + '%', sep='\t')
+        writer.line('Всего секунд:', round(seconds_all, 6))
+        writer.line('Шагов цикла выживаемости:', profile['survival_iterations'])
+        if profile['max_rss_kb'] is not None:
+            writer.line('Пиковая память:', round(profile['max_rss_kb'] / 1024, 1), 'МБ')
+
+
+#-------------------------------------------------------------------------
+# Кэш результатов на диске.
+
+# Каталог кэша по умолчанию:
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'war-economy')
+# Предельный размер кэша, байт:
+CACHE_SIZE = 256 * 2 ** 20
+# Версия расчётов. Входит в хэш сценария, меняется вместе с формулами,
+# чтобы старые результаты в кэше не подхватывались:
+CACHE_VERSION = 2
+
+
+class ResultCache(object):
+    """Кэш результатов расчёта (Scenario.compute) на диске.
+
+    Файл кэша — pickle результатов, имя файла — хэш сценария
+    (Scenario.fingerprint). При чтении время изменения файла обновляется,
+    и когда каталог вырастает больше max_size байт, удаляются файлы,
+    которые дольше всего не читали.
+    """
+
+    def __init__(self, directory=None, max_size=CACHE_SIZE):
+        self.directory = directory or CACHE_DIR
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, fingerprint + '.pickle')
+
+    def get(self, fingerprint):
+        """Результаты из кэша или None, если их там нет.
+
+        Испорченный файл (оборванный или записанный другой версией
+        кода) — тоже промах, такой файл удаляется.
+        """
+        path = self.path(fingerprint)
+        try:
+            cache_file = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            with cache_file:
+                results = pickle.load(cache_file)
+        except Exception:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return results
+
+    def put(self, fingerprint, results):
+        """Запись результатов в кэш, лишнее удаляется."""
+        path = self.path(fingerprint)
+        # Пишем во временный файл, чтобы другие процессы не прочли половину:
+        path_temp = path + '.' + str(os.getpid()) + '.tmp'
+        with open(path_temp, 'wb') as cache_file:
+            pickle.dump(results, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path_temp, path)
+        self.evict()
+
+    def evict(self):
+        """Удаление давно не читанных файлов, пока кэш больше max_size."""
+        cache_files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.pickle'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            cache_files.append((stat.st_mtime, stat.st_size, path))
+        cache_size = sum(size for mtime, size, path in cache_files)
+        for mtime, size, path in sorted(cache_files):
+            if (cache_size <= self.max_size):
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            cache_size = cache_size - size
+
+    def clear(self):
+        """Удаление всего кэша."""
+        for name in os.listdir(self.directory):
+            if name.endswith('.pickle'):
+                os.remove(os.path.join(self.directory, name))
+
+
+#-------------------------------------------------------------------------
+# Загрузка сценариев из скриптов.
+
+def script_scenario(script_globals):
+    """Сценарий из переменных скрипта: опций, видов войск и базы оружия."""
+    options = {}
+    for key in DEFAULT_OPTIONS:
+        if key in script_globals:
+            options[key] = script_globals[key]
+    return Scenario(options,
+            script_globals.get('metadict_wpn', {}),
+            script_globals.get('dict_troops_types', {}))
+
+
+def load_script(path):
+    """Сценарий из файла скрипта, например war-economy-analyser.py
+
+    Подходят и старые версии из old-versions/, они при загрузке
+    всё считают и печатают, поэтому их вывод подавляется.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        script_globals = runpy.run_path(path, run_name='war_economy_script')
+    return script_scenario(script_globals)